@@ -0,0 +1,675 @@
+"""GUI-independent acquisition and recording.
+
+``SerialAcquisition`` reads one serial port on its own thread, logs to the
+session file and hands samples to plain callbacks; ``Recorder`` runs one
+per port (merged on a shared clock when there are several) and fans the
+sample blocks out to listeners, or to asyncio code through
+``Recorder.batches()``. Nothing here imports Qt: the GUI is one listener,
+the headless recorder another.
+
+Record without a display and print live rates:
+
+    python main.py --headless --port /dev/ttyUSB0 --duration 3600
+"""
+import os
+import csv
+import time
+import asyncio
+import threading
+import numpy as np
+import serial
+from buffered_csv_writer import BufferedCsvWriter, truncate_partial_line
+from session_binary import BINARY_EXTENSION, is_binary_session, create_session, open_session, BufferedBinaryWriter, MUSCLE_GROUP_LABELS
+from session_store import CHUNKED_EXTENSION, is_chunked_session, create_store, recover, ChunkedSessionWriter, META_FILE
+from session_columnar import is_columnar_session
+from session_export import export_session
+from stream_merger import StreamMerger
+from wire_protocol import FrameDecoder
+from device_clock import DeviceClock
+from perf_metrics import PerfMonitor, MetricsLog, format_summary
+from summary_index import open_summary_index
+
+color_red = "\u001b[31m"
+color_magenta = "\u001b[35m"
+color_reset = "\u001b[0m"
+
+
+class LineFramer(object):
+    """Split a serial byte stream into lines in a single pass per chunk."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, chunk):
+        """Add raw bytes and return the complete lines they finish."""
+        buf = self.buffer
+        buf += chunk
+        lines = []
+        start = 0
+        end = buf.find(b'\n')
+        while end != -1:
+            lines.append(bytes(buf[start:end]))
+            start = end + 1
+            end = buf.find(b'\n', start)
+        # Drop everything consumed with one move, keep the partial line
+        del buf[:start]
+        return lines
+
+
+# Session file formats that can be recorded to, by name (main.py --format)
+SESSION_EXTENSIONS = {"csv": ".csv", "skemg": BINARY_EXTENSION, "chunked": CHUNKED_EXTENSION}
+
+
+def get_new_filename(subject="A0", extension=".csv"):
+    """Generate a new session filename based on subject ID."""
+    return f"TestSubject_{subject}{extension}"
+
+
+def _require_recordable(path):
+    if is_columnar_session(path):
+        raise ValueError(f"Parquet and HDF5 sessions are not recorded to; "
+                         f"record a chunked session and export it: {path}")
+
+
+def open_session_writer(path, **kwargs):
+    """Create (not start) the buffered writer thread for a session of any recordable format."""
+    _require_recordable(path)
+    if is_chunked_session(path):
+        writer_class = ChunkedSessionWriter
+    elif is_binary_session(path):
+        writer_class = BufferedBinaryWriter
+    else:
+        writer_class = BufferedCsvWriter
+    return writer_class(path, **kwargs)
+
+
+def session_exists(path):
+    """True if `path` is a session with a header (it may hold no samples yet)."""
+    if is_chunked_session(path):
+        return os.path.exists(os.path.join(path, META_FILE))
+    try:
+        with open(path, 'rb') as f:
+            return bool(f.read(1))
+    except FileNotFoundError:
+        return False
+
+
+def _last_csv_time(path):
+    # Timestamp of the last data row, read from the end of the file
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - 64 * 1024))
+        lines = f.read().splitlines()
+    for line in reversed(lines):
+        try:
+            return float(line.split(b',', 1)[0])
+        except ValueError:
+            continue  # header or a damaged row
+    return None
+
+
+def resume_session(path):
+    """Repair what a crash left at the end of a session; return its last timestamp.
+
+    Cuts off a torn last CSV row or binary record and indexes unfinished
+    chunks of a chunked session. Returns None if the session has no samples.
+    A recording appended to the session should start its clock there
+    (``time_offset``) so timestamps keep increasing across restarts.
+    """
+    if is_chunked_session(path):
+        entries = recover(path)
+        return entries[-1]["t_end"] if entries else None
+    if is_binary_session(path):
+        # Opening the writer cuts a torn record off; whole records are read here
+        meta, times, values = open_session(path)
+        return float(times[-1]) if len(times) else None
+    if truncate_partial_line(path):
+        print(f"{color_magenta}Removed an incomplete last row from {color_red}{path}{color_reset}")
+    return _last_csv_time(path)
+
+
+def channel_labels(muscle_labels, port_sensors):
+    """Label of every channel; channels of the second port on get a port suffix."""
+    labels = []
+    for device, sensors in enumerate(port_sensors):
+        for i in range(sensors):
+            label = muscle_labels[i % len(muscle_labels)]
+            labels.append(f"{label} ({device + 1})" if device else label)
+    return labels
+
+
+def create_session_file(path, labels, muscle_group=None):
+    """Write the header of a new session of any recordable format."""
+    _require_recordable(path)
+    if is_chunked_session(path):
+        create_store(path, labels, muscle_group)
+        return
+    if is_binary_session(path):
+        create_session(path, labels, muscle_group)
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['Timestamp'] +
+            [f"Muscle{i + 1} - {label}" for i, label in enumerate(labels)]
+        )
+
+
+class SerialAcquisition(threading.Thread):
+    """Read samples from one serial port.
+
+    ``protocol`` is "ascii" (space-separated lines), "binary" (the framed
+    protocol in wire_protocol) or "auto", which uses whichever the device
+    is sending once the first valid line or frame arrives. Samples that
+    carry the device's micros() (all binary frames, text lines starting
+    with "@<micros>") are timestamped from it through a DeviceClock, which
+    corrects for USB buffering and clock drift; others get the time their
+    read arrived.
+
+    Each sample is logged to ``csv_file`` (unless it is None), added to the
+    optional store and pipeline, and passed to ``on_sample(elapsed, values)``;
+    with ``batch_size`` set, samples are grouped into (n, 1 + num_sensors)
+    blocks (column 0 = timestamp) passed to ``on_batch(block)`` once the
+    block is full or its oldest sample is ``max_latency`` seconds old.
+
+    With a ``merger`` the samples go to that StreamMerger as device
+    `device_index` instead, and the merged rows it releases are passed to
+    ``on_batch``. Callbacks run on the reading thread; ``on_batch`` runs
+    after the merger has let go of its lock, so when several readers share
+    a merger, blocks that must arrive in order go to the merger's
+    ``listener`` instead.
+
+    ``start()`` runs the loop on this thread; ``run()`` can also be called
+    directly from another thread (the Qt reader does this).
+
+    When appending to an existing session, ``time_offset`` (its last
+    timestamp, see ``resume_session``) is where this recording's clock
+    starts, so timestamps continue rather than restarting at 0.
+    ``summary_index`` (a summary_index.SummaryIndex) is kept up to date by
+    the session writer.
+    """
+
+    def __init__(self, csv_file, serial_port, baud_rate, num_sensors, store=None,
+                 batch_size=None, max_latency=0.05, pipeline=None, merger=None,
+                 device_index=0, start_time=None, on_sample=None, on_batch=None, protocol="auto",
+                 time_offset=0.0, summary_index=None):
+        super().__init__(name=f"SerialAcquisition-{serial_port}", daemon=True)
+        self.csv_file = csv_file
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+        self.num_sensors = num_sensors
+        self.store = store
+        self.pipeline = pipeline
+        self.merger = merger
+        self.device_index = device_index
+        self.on_sample = on_sample
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.protocol = protocol
+        self.decoder = None
+        self._block = None
+        self._pending = 0
+        self._batch_started = None
+        # Longest a read blocks waiting for data before re-checking state
+        self.read_timeout = 0.05
+        # CSV flush policy, see BufferedCsvWriter for the durability window
+        self.flush_interval = 0.25
+        self.flush_bytes = 64 * 1024
+        self.fsync_on_stop = False
+        self.csv_writer = None
+        self.ser = None
+        # time.monotonic() of t = 0; readers of one session share it so their
+        # timestamps line up. Defaults to when the thread starts reading.
+        self.start_time = start_time
+        self.time_offset = time_offset
+        self.summary_index = summary_index
+        # Totals for rate reporting (see perf_metrics.PerfMonitor)
+        self.bytes_read = 0
+        self.lines = 0
+        self.samples = 0
+        # Lines (or frames) dropped for a wrong value count, unparsable values or a bad CRC
+        self.lines_malformed = 0
+        # Binary frames missing according to their sequence numbers
+        self.samples_lost = 0
+        # Maps device micros() stamps (binary frames, "@" lines) to session time
+        self.clock = DeviceClock(not_before=time_offset)
+        # Unstamped samples: arrival of the previous read and the smoothed sample interval
+        self._last_arrival = None
+        self._sample_interval = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        # Open serial port
+        try:
+            # Also accepts pyserial URLs such as socket://host:port (see data_sources)
+            self.ser = serial.serial_for_url(self.serial_port, self.baud_rate, timeout=self.read_timeout)
+            # Give the board time to reset; returns early if stopped meanwhile
+            if self._stop_event.wait(2):
+                self.ser.close()
+                return
+            # Samples sent during the wait arrived all at once; their arrival times mean nothing
+            self.ser.reset_input_buffer()
+        except Exception as e:
+            print(f"{color_magenta}Could not open port {color_red}{self.serial_port}{color_magenta}:{color_reset} {e}\n")
+            return
+
+        # Prepare CSV (or binary session) writer thread for appending data
+        if self.csv_file is not None:
+            try:
+                self.csv_writer = open_session_writer(
+                    self.csv_file,
+                    flush_interval=self.flush_interval,
+                    flush_bytes=self.flush_bytes,
+                    fsync_on_stop=self.fsync_on_stop,
+                    summary=self.summary_index
+                )
+            except Exception as e:
+                print(f"{color_magenta}Could not open CSV {color_red}{self.csv_file}{color_magenta}:{color_reset} {e}\n")
+                if self.ser and self.ser.is_open:
+                    self.ser.close()
+                return
+            self.csv_writer.start()
+
+        if self.start_time is None:
+            self.start_time = time.monotonic() - self.time_offset
+        framer = LineFramer()
+        self.decoder = FrameDecoder(self.num_sensors)
+        if self.batch_size:
+            self._block = np.empty((self.batch_size, self.num_sensors + 1))
+            self._pending = 0
+
+        while not self._stop_event.is_set():
+            try:
+                # Blocks until data arrives or read_timeout passes
+                chunk = self._read_chunk()
+                self.bytes_read += len(chunk)
+                if self.protocol != "ascii":
+                    self._handle_frames(chunk)
+                if self.protocol != "binary":
+                    self._handle_lines(framer.feed(chunk))
+                if self._pending and time.monotonic() - self._batch_started >= self.max_latency:
+                    self._emit_batch()
+            except Exception as e:
+                print(f"{color_magenta}Serial read error:{color_red} {e}{color_reset}\n")
+                # Avoid spinning if the port keeps failing
+                time.sleep(self.read_timeout)
+
+        # Cleanup
+        if self._pending:
+            self._emit_batch()
+        if self.csv_writer is not None:
+            self.csv_writer.close()
+        if self.ser and self.ser.is_open:
+            self.ser.close()
+
+    def _handle_lines(self, lines):
+        """Parse ASCII sample lines and pass each sample on.
+
+        A line may start with the device time as "@<micros>"; then the
+        samples are timestamped through ``self.clock``.
+        """
+        self.lines += len(lines)
+        samples = []
+        ticks = []
+        for line in lines:
+            parts = line.split()
+            stamp = parts.pop(0)[1:] if parts and parts[0].startswith(b'@') else None
+            if len(parts) == self.num_sensors:
+                try:
+                    vals = [float(p) for p in parts]
+                    if stamp is not None:
+                        ticks.append(int(stamp))
+                except ValueError:
+                    self.lines_malformed += 1
+                    continue
+                samples.append(vals)
+            elif parts or stamp is not None:
+                # Wrong number of values, or a status message from the board
+                self.lines_malformed += 1
+        if not samples:
+            return
+        if self.protocol == "auto":
+            self.protocol = "ascii"
+        self.samples += len(samples)
+        # Device time only if every line of the read carried it
+        times = self._timestamps(ticks if len(ticks) == len(samples) else None, len(samples)).tolist()
+        for elapsed, vals in zip(times, samples):
+            if self.batch_size:
+                # Written to CSV as one block when the batch is emitted
+                self._add_to_batch(elapsed, vals)
+                continue
+            if self.merger is not None:
+                self._deliver_merged(self.merger.add(self.device_index, [elapsed], [vals]))
+                continue
+            if self.csv_writer is not None:
+                self.csv_writer.write_row([elapsed] + vals)
+            if self.store is not None:
+                self.store.append(elapsed, vals)
+            if self.pipeline is not None:
+                self.pipeline.process([elapsed], [vals])
+            if self.on_sample is not None:
+                self.on_sample(elapsed, vals)
+
+    def _handle_frames(self, chunk):
+        """Decode binary frames and pass their samples on as one block."""
+        decoder = self.decoder
+        bad_frames, missing = decoder.bad_frames, decoder.missing
+        frames = decoder.feed(chunk)
+        self.lines_malformed += decoder.bad_frames - bad_frames
+        self.samples_lost += decoder.missing - missing
+        if not len(frames.values):
+            return
+        if self.protocol == "auto":
+            self.protocol = "binary"
+        self.lines += len(frames.values)
+        self.samples += len(frames.values)
+        if missing != decoder.missing:
+            print(f"{color_magenta}{self.serial_port}: {color_red}{decoder.missing - missing}{color_magenta} "
+                  f"frames lost before #{int(frames.seq[np.argmax(frames.missing)])}{color_reset}")
+        self._add_block(self._timestamps(frames.device_time, len(frames.values)), frames.values)
+
+    def _timestamps(self, ticks, count):
+        """Session times (s) of `count` samples that just arrived, from device ticks if given."""
+        arrival = time.monotonic() - self.start_time
+        if ticks is None:
+            return np.round(self._spread(arrival, count), 3)
+        return np.round(self.clock.to_host(ticks, arrival), 3)
+
+    def _spread(self, arrival, count):
+        """Times of `count` unstamped samples read at `arrival`.
+
+        They were taken since the previous read, so they are spaced back from
+        the arrival at the observed sample interval (never reaching back
+        before the previous read) instead of all sharing the arrival time.
+        """
+        last, self._last_arrival = self._last_arrival, arrival
+        observed = (arrival - last) / count if last is not None else np.inf
+        interval = self._sample_interval
+        # A much longer wait is a pause in the stream, not slower sampling
+        if np.isfinite(observed) and (interval is None or observed < 4 * interval):
+            interval = self._sample_interval = observed if interval is None else 0.9 * interval + 0.1 * observed
+        step = min(observed, interval or 0.0)
+        return arrival - step * np.arange(count - 1, -1, -1)
+
+    def _add_block(self, times, values):
+        """Pass several samples on at once (batched, merged or one by one)."""
+        if self.batch_size:
+            done = 0
+            while done < len(values):
+                if not self._pending:
+                    self._batch_started = time.monotonic()
+                n = min(self.batch_size - self._pending, len(values) - done)
+                rows = self._block[self._pending:self._pending + n]
+                rows[:, 0] = times[done:done + n]
+                rows[:, 1:] = values[done:done + n]
+                self._pending += n
+                done += n
+                if self._pending == self.batch_size:
+                    self._emit_batch()
+            return
+        if self.merger is not None:
+            self._deliver_merged(self.merger.add(self.device_index, times, values))
+            return
+        if self.csv_writer is not None:
+            self.csv_writer.write_rows(np.column_stack((times, values)))
+        if self.store is not None:
+            self.store.extend(times, values)
+        if self.pipeline is not None:
+            self.pipeline.process(times, values)
+        if self.on_sample is not None:
+            for elapsed, vals in zip(times.tolist(), values.tolist()):
+                self.on_sample(elapsed, vals)
+
+    def _read_chunk(self):
+        """Wait up to read_timeout for data, then return everything buffered."""
+        if not self.serial_port.startswith('socket://'):
+            return self.ser.read(self.ser.in_waiting or 1)
+        # pyserial's socket backend only reports whether data is waiting, not
+        # how much: block for the first byte, then take the rest without waiting
+        self.ser.timeout = self.read_timeout
+        chunk = self.ser.read(1)
+        if chunk:
+            self.ser.timeout = 0
+            chunk += self.ser.read(65536)
+        return chunk
+
+    def _add_to_batch(self, elapsed, vals):
+        """Append one sample to the pending block, emitting it when full."""
+        if not self._pending:
+            self._batch_started = time.monotonic()
+        row = self._block[self._pending]
+        row[0] = elapsed
+        row[1:] = vals
+        self._pending += 1
+        if self._pending == self.batch_size:
+            self._emit_batch()
+
+    def _emit_batch(self):
+        """Store and emit the pending samples as one contiguous block."""
+        batch = self._block[:self._pending]
+        # Start a fresh block so the emitted one is never overwritten
+        self._block = np.empty_like(self._block)
+        self._pending = 0
+        if self.merger is not None:
+            self._deliver_merged(self.merger.add(self.device_index, batch[:, 0], batch[:, 1:]))
+            return
+        if self.csv_writer is not None:
+            self.csv_writer.write_rows(batch)
+        if self.store is not None:
+            self.store.extend(batch[:, 0], batch[:, 1:])
+        if self.pipeline is not None:
+            self.pipeline.process(batch[:, 0], batch[:, 1:])
+        if self.on_batch is not None:
+            self.on_batch(batch)
+
+    def _deliver_merged(self, rows):
+        # Rows released by the merger cover every device's channels
+        if len(rows) and self.on_batch is not None:
+            self.on_batch(rows)
+
+    def stop(self):
+        """Stop the reading loop and wait for it to finish (if started with start())."""
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+
+class Recorder(object):
+    """Record one or more serial ports into one session file.
+
+    One SerialAcquisition per port; with several ports they share a clock
+    and a StreamMerger, which owns the session writer. Sample blocks
+    ((n, 1 + channels), column 0 = timestamp) are passed to every listener
+    on the reading threads. The session file header must already exist
+    (see ``create_session_file``). ``protocol`` and ``time_offset`` are
+    passed to every reader; the session writer keeps ``summary_index`` up
+    to date.
+    """
+
+    def __init__(self, path, ports, baud_rate, port_sensors, store=None, pipeline=None, batch_size=64,
+                 protocol="auto", time_offset=0.0, summary_index=None):
+        self.path = path
+        self.ports = [ports] if isinstance(ports, str) else list(ports)
+        if isinstance(port_sensors, int):
+            port_sensors = [port_sensors] * len(self.ports)
+        self.port_sensors = list(port_sensors)
+        self.baud_rate = baud_rate
+        self.store = store
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+        self.protocol = protocol
+        self.time_offset = time_offset
+        self.summary_index = summary_index
+        self.readers = []
+        self.merger = None
+        self.writer = None
+        self._listeners = []
+
+    @property
+    def num_channels(self):
+        return sum(self.port_sensors)
+
+    def add_listener(self, callback):
+        """Call ``callback(block)`` for every block of samples recorded."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def _deliver(self, block):
+        for callback in list(self._listeners):
+            callback(block)
+
+    def start(self):
+        if len(self.ports) == 1:
+            # A single reader writes the session itself
+            self.readers = [SerialAcquisition(
+                self.path, self.ports[0], self.baud_rate, self.port_sensors[0],
+                store=self.store, batch_size=self.batch_size, pipeline=self.pipeline,
+                on_batch=self._deliver, protocol=self.protocol, time_offset=self.time_offset,
+                summary_index=self.summary_index
+            )]
+        else:
+            self.writer = open_session_writer(self.path, summary=self.summary_index)
+            self.writer.start()
+            # Fed in release order under the merger's lock, whichever reader released the rows
+            self.merger = StreamMerger(self.port_sensors, writer=self.writer,
+                                       store=self.store, pipeline=self.pipeline, listener=self._deliver)
+            start_time = time.monotonic() - self.time_offset
+            self.readers = [
+                SerialAcquisition(
+                    None, port, self.baud_rate, sensors, batch_size=self.batch_size,
+                    merger=self.merger, device_index=device, start_time=start_time,
+                    protocol=self.protocol, time_offset=self.time_offset
+                )
+                for device, (port, sensors) in enumerate(zip(self.ports, self.port_sensors))
+            ]
+        for reader in self.readers:
+            reader.start()
+
+    def stop(self):
+        """Stop all readers and write out everything recorded."""
+        for reader in self.readers:
+            reader.stop()
+        if self.merger is not None:
+            # Samples still held back waiting for the slowest port
+            self.merger.flush()
+            self.writer.close()
+
+    @property
+    def writers(self):
+        """Session writer threads (the merger's, or the single reader's once open)."""
+        if self.writer is not None:
+            return [self.writer]
+        return [r.csv_writer for r in self.readers if r.csv_writer is not None]
+
+    @property
+    def samples(self):
+        return sum(reader.samples for reader in self.readers)
+
+    @property
+    def bytes_read(self):
+        return sum(reader.bytes_read for reader in self.readers)
+
+    async def batches(self, max_pending=256):
+        """Async iterator over recorded blocks, for asyncio consumers.
+
+        Blocks are handed over from the reading threads through a queue of
+        ``max_pending`` blocks; if the consumer falls that far behind the
+        oldest block is dropped rather than stalling acquisition.
+        """
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue(max_pending)
+
+        def offer(block):
+            if pending.full():
+                pending.get_nowait()
+            pending.put_nowait(block)
+
+        def listener(block):
+            try:
+                loop.call_soon_threadsafe(offer, block)
+            except RuntimeError:
+                pass  # event loop already closed
+
+        self.add_listener(listener)
+        try:
+            while True:
+                yield await pending.get()
+        finally:
+            self.remove_listener(listener)
+
+
+async def run_headless(recorder, interval=1.0, duration=None, metrics_log=None):
+    """Record until `duration` seconds pass (or forever), printing rates every `interval`.
+
+    Each printout is also appended to `metrics_log` (a perf_metrics.MetricsLog) if given.
+    """
+    received = 0
+
+    async def consume():
+        nonlocal received
+        async for block in recorder.batches():
+            received += len(block)
+
+    recorder.start()
+    consumer = asyncio.ensure_future(consume())
+    monitor = PerfMonitor(recorder)
+    try:
+        while duration is None or time.monotonic() - monitor.started < duration:
+            await asyncio.sleep(interval)
+            sample = monitor.sample()
+            print(f"{sample['uptime_s']:8.1f} s  {format_summary(sample)}  total {received} rows", flush=True)
+            if metrics_log is not None:
+                metrics_log.write(sample)
+    finally:
+        consumer.cancel()
+        # Joining the reader threads blocks, so do it off the event loop
+        await asyncio.get_running_loop().run_in_executor(None, recorder.stop)
+
+
+def export_recording(path, export_path):
+    """Convert a stopped recording to Parquet or HDF5 (``--format parquet|hdf5``).
+
+    The whole session is exported again, so a recording appended to an
+    earlier one replaces the earlier export. Errors are reported, not raised:
+    the session itself is safe either way.
+    """
+    try:
+        rows = export_session(path, export_path)
+    except Exception as e:
+        print(f"{color_magenta}Could not export {color_red}{path}{color_magenta} to {export_path}:{color_reset} {e}\n")
+        return
+    print(f"Wrote {rows} rows to {export_path}")
+
+
+def record_headless(csv_file, ports, baud_rate, port_sensors, muscle_group="Quad",
+                    interval=1.0, duration=None, metrics_file=None, protocol="auto", export_path=None):
+    """Record to `csv_file` without Qt; stops on Ctrl+C or after `duration` seconds.
+
+    With `export_path` the session is also exported there once recording stops.
+    """
+    recorder = Recorder(csv_file, ports, baud_rate, port_sensors, protocol=protocol)
+    if session_exists(csv_file):
+        end = resume_session(csv_file)
+        if end is not None:
+            recorder.time_offset = end
+            print(f"Appending to {csv_file} from t = {end:.3f} s")
+    else:
+        labels = channel_labels(MUSCLE_GROUP_LABELS[muscle_group], recorder.port_sensors)
+        create_session_file(csv_file, labels, muscle_group)
+    recorder.summary_index = open_summary_index(csv_file, recorder.num_channels)
+    metrics_log = MetricsLog(metrics_file) if metrics_file else None
+    print(f"Recording {recorder.num_channels} channels from {', '.join(recorder.ports)} to {csv_file}")
+    try:
+        asyncio.run(run_headless(recorder, interval, duration, metrics_log))
+    except KeyboardInterrupt:
+        # Stopping again is harmless if the event loop already did it
+        recorder.stop()
+    finally:
+        if metrics_log is not None:
+            metrics_log.close()
+    print(f"Stopped after {recorder.samples} samples")
+    if export_path is not None:
+        export_recording(csv_file, export_path)
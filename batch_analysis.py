@@ -0,0 +1,147 @@
+"""Headless analysis of many recorded sessions at once.
+
+Computes the GUI's metrics (max amplitude and total muscle activity per
+muscle) for every session file given, plus windowed RMS and peak stats,
+and writes them to one summary CSV with a row per session and channel.
+Files are spread over a process pool, so a study's worth of sessions
+scales with the number of cores. Qt is not needed.
+
+    python batch_analysis.py recordings/ -o summary.csv
+    python batch_analysis.py "data/TestSubject_*.csv" --window 0.5 --workers 8
+"""
+import os
+import csv
+import sys
+import glob
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from emg_stats import RunningStats
+from session_loader import load_session, session_channels
+from session_binary import BINARY_EXTENSION
+from session_store import CHUNKED_EXTENSION, is_chunked_session
+from session_columnar import PARQUET_EXTENSION, HDF5_EXTENSION
+from summary_index import INDEX_EXTENSION
+
+color_red = "\u001b[31m"
+color_magenta = "\u001b[35m"
+color_reset = "\u001b[0m"
+
+SUMMARY_FIELDS = [
+    'file', 'channel', 'label', 'samples', 'duration_s', 'sample_rate_hz',
+    'max_amplitude', 'total_activity',
+    'window_s', 'windows', 'rms_mean', 'rms_max', 'rms_max_at_s', 'window_max_mean',
+]
+
+
+def find_sessions(patterns):
+    """Expand directories and glob patterns into a sorted list of session files."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern) and not is_chunked_session(pattern):
+            for ext in ('.csv', BINARY_EXTENSION, CHUNKED_EXTENSION, PARQUET_EXTENSION, HDF5_EXTENSION):
+                paths.extend(glob.glob(os.path.join(pattern, f"TestSubject_*{ext}")))
+        else:
+            paths.extend(glob.glob(pattern))
+    # Summary indexes and files being replaced sit next to the sessions
+    return sorted(set(p for p in paths if not p.endswith((INDEX_EXTENSION, '.tmp'))))
+
+
+def windowed_stats(times, values, window_seconds):
+    """Per-window RMS and max of each channel over fixed windows from the first sample.
+
+    Returns (starts, rms, peak): window start times (w,) and (w, channels)
+    arrays. Empty windows (gaps in the recording) are left out.
+    """
+    if not len(times):
+        return np.empty(0), np.empty((0, values.shape[1])), np.empty((0, values.shape[1]))
+    index = np.floor((times - times[0]) / window_seconds).astype(np.int64)
+    # Rows are in time order, so each window is one contiguous run
+    bounds = np.flatnonzero(np.diff(index)) + 1
+    bounds = np.concatenate(([0], bounds))
+    counts = np.diff(np.append(bounds, len(times)))[:, None]
+    values = np.asarray(values, dtype=np.float64)
+    rms = np.sqrt(np.add.reduceat(np.square(values), bounds, axis=0) / counts)
+    peak = np.maximum.reduceat(values, bounds, axis=0)
+    return times[0] + index[bounds] * window_seconds, rms, peak
+
+
+def analyze_session(path, window_seconds=1.0):
+    """Summary rows (one dict per channel) for one session file."""
+    labels = session_channels(path)
+    times, values = load_session(path, len(labels))
+    stats = RunningStats(len(labels))
+    stats.update_batch(times, values)
+    starts, rms, peak = windowed_stats(times, values, window_seconds)
+    duration = float(times[-1] - times[0]) if len(times) else 0.0
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    sample_rate = 1.0 / np.median(steps) if len(steps) else 0.0
+    rows = []
+    for col, label in enumerate(labels):
+        loudest = int(rms[:, col].argmax()) if len(rms) else None
+        rows.append({
+            'file': path,
+            'channel': col + 1,
+            'label': label,
+            'samples': len(times),
+            'duration_s': round(duration, 3),
+            'sample_rate_hz': round(sample_rate, 2),
+            'max_amplitude': stats.max_amplitude()[col],
+            'total_activity': stats.total_activity()[col],
+            'window_s': window_seconds,
+            'windows': len(rms),
+            'rms_mean': rms[:, col].mean() if len(rms) else 0.0,
+            'rms_max': rms[loudest, col] if len(rms) else 0.0,
+            'rms_max_at_s': round(starts[loudest], 3) if len(rms) else '',
+            'window_max_mean': peak[:, col].mean() if len(peak) else 0.0,
+        })
+    return rows
+
+
+def _analyze_or_report(path, window_seconds):
+    # Runs in a worker process: one bad file must not stop the study
+    try:
+        return path, analyze_session(path, window_seconds), None
+    except Exception as e:
+        return path, [], str(e)
+
+
+def analyze_sessions(paths, window_seconds=1.0, workers=None):
+    """Analyze files in parallel; yields (path, rows, error) in input order."""
+    if workers == 1:
+        for path in paths:
+            yield _analyze_or_report(path, window_seconds)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_analyze_or_report, paths, [window_seconds] * len(paths))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize StabiliKnee sessions without the GUI.")
+    parser.add_argument('sessions', nargs='+', help='session files, glob patterns or directories')
+    parser.add_argument('-o', '--output', default='session_summary.csv')
+    parser.add_argument('--window', type=float, default=1.0, help='window length in seconds')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args(argv)
+
+    paths = find_sessions(args.sessions)
+    if not paths:
+        print(f"{color_magenta}No session files found{color_reset}")
+        return 1
+    failed = 0
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for path, rows, error in analyze_sessions(paths, args.window, args.workers):
+            if error is not None:
+                failed += 1
+                print(f"{color_magenta}Could not analyze {color_red}{path}{color_magenta}:{color_reset} {error}")
+                continue
+            writer.writerows(rows)
+    print(f"Analyzed {len(paths) - failed} of {len(paths)} sessions, wrote {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Sample-to-signal latency of the serial reader: current loop vs the old sleep-poll loop.
+
+Lines are written into a pseudo-terminal at a fixed rate and timed until
+``data_received`` is emitted in the reader thread. POSIX only (uses a pty).
+
+    python benchmarks/bench_ingest.py --rate 500 --samples 3000
+"""
+import os
+import sys
+import time
+import tty
+import argparse
+import tempfile
+import numpy as np
+from PyQt5.QtCore import QCoreApplication, Qt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from uMyo_serial_thread import SerialReaderFromUMyo, color_magenta, color_red, color_reset
+
+
+class LegacySerialReader(SerialReaderFromUMyo):
+    """The original reader loop: poll in_waiting, re-split a str buffer, sleep 30 ms."""
+
+    def run(self):
+        import csv
+        import serial
+        self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=0.1)
+        csvfile = open(self.csv_file, 'a', newline='')
+        writer = csv.writer(csvfile)
+        self._running = True
+        self.start_time = time.time()
+        buffer = ""
+        while self._running:
+            try:
+                if self.ser.in_waiting:
+                    chunk = self.ser.read(self.ser.in_waiting).decode('utf-8', errors='ignore')
+                    buffer += chunk
+                    while '\n' in buffer:
+                        line, buffer = buffer.split('\n', 1)
+                        parts = line.strip().split()
+                        if len(parts) == self.num_sensors:
+                            try:
+                                vals = [float(p) for p in parts]
+                            except ValueError:
+                                continue
+                            elapsed = round(time.time() - self.start_time, 3)
+                            writer.writerow([elapsed] + vals)
+                            csvfile.flush()
+                            self.data_received.emit(elapsed, vals)
+            except Exception as e:
+                print(f"{color_magenta}Serial read error:{color_red} {e}{color_reset}\n")
+            time.sleep(0.03)
+        csvfile.close()
+        self.ser.close()
+
+
+def measure(reader_class, rate, samples, num_sensors=4):
+    """Return per-sample latencies (seconds) from pty write to signal emit."""
+    master, slave = os.openpty()
+    tty.setraw(master)
+    tty.setraw(slave)
+    csv_file = os.path.join(tempfile.mkdtemp(), 'bench.csv')
+    reader = reader_class(csv_file, os.ttyname(slave), 115200, num_sensors)
+    sent = np.zeros(samples)
+    received = np.full(samples, np.nan)
+
+    def on_data(elapsed, values):
+        received[int(values[0])] = time.perf_counter()
+
+    # Direct connection: time the emit itself, not the GUI event loop
+    reader.data_received.connect(on_data, Qt.DirectConnection)
+    reader.start()
+    time.sleep(2.5)  # reader waits 2 s after opening the port
+
+    filler = ' 0' * (num_sensors - 1)
+    period = 1.0 / rate
+    start = time.perf_counter()
+    for i in range(samples):
+        target = start + i * period
+        while time.perf_counter() < target:
+            pass
+        sent[i] = time.perf_counter()
+        os.write(master, f"{i}{filler}\n".encode())
+    time.sleep(0.5)
+    reader.stop()
+    os.close(master)
+    os.close(slave)
+    return received - sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rate', type=float, default=500, help='lines per second')
+    parser.add_argument('--samples', type=int, default=3000)
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv)
+    for name, reader_class in (('legacy', LegacySerialReader), ('current', SerialReaderFromUMyo)):
+        latency = measure(reader_class, args.rate, args.samples)
+        ok = latency[~np.isnan(latency)] * 1000
+        print(f"{name:8s} received {len(ok)}/{args.samples}  "
+              f"p50 {np.percentile(ok, 50):7.2f} ms  p99 {np.percentile(ok, 99):7.2f} ms")
+    del app
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Startup load time of a session CSV: vectorized loader vs the old three csv.reader passes.
+
+    python benchmarks/bench_load.py --rows 1000000
+"""
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from session_loader import load_session_csv
+
+
+def write_session(path, rows, num_sensors=4):
+    """Write a synthetic session in the app's CSV layout."""
+    rng = np.random.default_rng(0)
+    times = np.round(np.arange(1, rows + 1) * 0.001, 3)
+    values = rng.integers(0, 800, size=(rows, num_sensors)).astype(float)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Timestamp'] + [f"Muscle{i + 1} - M{i + 1}" for i in range(num_sensors)])
+        writer.writerows(np.column_stack((times, values)).tolist())
+
+
+def legacy_load(path):
+    """The original startup path: max, integral and plot data each re-read the CSV."""
+    with open(path) as file:
+        reader = csv.reader(file)
+        next(reader)
+        max_values = {col: float('-inf') for col in (1, 2, 3, 4)}
+        for row in reader:
+            for col in max_values:
+                max_values[col] = max(max_values[col], float(row[col]))
+    for _ in range(2):
+        with open(path) as file:
+            reader = csv.reader(file)
+            next(reader)
+            time_vals = []
+            columns = {1: [], 2: [], 3: [], 4: []}
+            for row in reader:
+                row_data = [float(value) if value else 0.0 for value in row]
+                time_vals.append(round(row_data[0], 3))
+                for col in range(1, 5):
+                    columns[col].append(row_data[col])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--skip-legacy', action='store_true', help='only time the new loader')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'TestSubject_bench.csv')
+    write_session(path, args.rows)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"{args.rows} rows, {size_mb:.1f} MB")
+
+    start = time.perf_counter()
+    times, values = load_session_csv(path, 4)
+    print(f"vectorized  {time.perf_counter() - start:7.2f} s  ({len(times)} rows)")
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        legacy_load(path)
+        print(f"legacy      {time.perf_counter() - start:7.2f} s")
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""End-to-end benchmark: ingest, logging, loading, rendering and memory per session length.
+
+For each session length it measures:
+
+- ingest: samples/s through the serial reader and CSV writer, fed at max
+  speed by a simulated device (data_sources.SimulatedDevice) in the text
+  or binary serial format (``--protocol``);
+- GUI: load time of an existing session of that length, then a live
+  500 Hz stream on top of it. Reports sample-to-screen latency percentiles
+  (line written to the port -> first frame that includes it), redraw time
+  per frame for the 10 s live window and for the whole session, and memory
+  growth.
+
+Runs offscreen and without hardware (uses a pseudo-terminal, so Linux/macOS).
+Results are written as JSON; ``--compare`` prints the change against an
+earlier run:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_suite.py --json after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import numpy as np
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from acquisition import SerialAcquisition, create_session_file
+from data_sources import SimulatedDevice, SyntheticSource, PtyLink
+
+
+def rss_mb():
+    """Resident memory of this process in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        import resource
+        # Peak, not current, where /proc is missing (bytes on macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e6
+
+
+def percentiles(values, prefix):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {}
+    return {f"{prefix}_p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def wait_for(condition, timeout, app=None):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        if app is not None:
+            app.processEvents()
+        time.sleep(0.001)
+    return condition()
+
+
+class TimedDevice(SimulatedDevice):
+    """SimulatedDevice that records when each sample was written to the port."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_counts = []
+        self.write_times = []
+        self.samples_read = 0
+        read, write = self.source.read, self.link.write
+
+        def timed_read(n):
+            values = read(n)
+            self.samples_read += len(values)
+            return values
+
+        def timed_write(data):
+            write(data)
+            self.write_counts.append(self.samples_read)
+            self.write_times.append(time.perf_counter())
+
+        self.source.read = timed_read
+        self.link.write = timed_write
+
+
+def bench_ingest(samples, channels, protocol='ascii'):
+    """Reader + CSV writer throughput at max feed speed."""
+    path = os.path.join(tempfile.mkdtemp(), 'TestSubject_ingest.csv')
+    create_session_file(path, [f"M{i + 1}" for i in range(channels)])
+    received = [0, None, None]
+
+    def on_batch(batch):
+        now = time.perf_counter()
+        if received[1] is None:
+            received[1] = now
+        received[0] += len(batch)
+        received[2] = now
+
+    rss_start = rss_mb()
+    device = SimulatedDevice(SyntheticSource(channels, 1000.0, seed=0), PtyLink(), speed=None,
+                             protocol=protocol)
+    reader = SerialAcquisition(path, device.port, 115200, channels, batch_size=64, on_batch=on_batch,
+                               protocol=protocol)
+    reader.start()
+    # Feed only once the reader is reading, past the board reset wait
+    wait_for(lambda: reader.start_time is not None, 10)
+    device.start()
+    cpu_start = time.process_time()
+    wait_for(lambda: received[0] >= samples, 60 + samples / 5000)
+    cpu_s = time.process_time() - cpu_start
+    reader.stop()
+    device.stop()
+    span = (received[2] or 0) - (received[1] or 0)
+    rows = reader.csv_writer.rows_written if reader.csv_writer is not None else 0
+    os.remove(path)
+    return {
+        'ingest_samples_per_s': round(received[0] / span) if span > 0 else None,
+        'ingest_rows_logged': rows,
+        # Whole process (reader, writer and simulated device)
+        'ingest_cpu_us_per_sample': round(cpu_s / received[0] * 1e6, 2) if received[0] else None,
+        'ingest_rss_growth_mb': round(rss_mb() - rss_start, 1),
+    }
+
+
+def write_history(path, samples, channels, rate):
+    """A session of `samples` rows ending at t = 0, so live samples continue it."""
+    times = np.round((np.arange(samples) - samples) / rate, 3)
+    values = SyntheticSource(channels, rate, seed=1).read(samples)
+    header = 'Timestamp,' + ','.join(f"Muscle{i + 1} - M{i + 1}" for i in range(channels))
+    np.savetxt(path, np.column_stack((times, values)), fmt='%.3f', delimiter=',',
+               header=header, comments='')
+
+
+def bench_gui(app, samples, channels, rate, live_seconds):
+    """Load a session of `samples` rows, then stream live data into the GUI."""
+    from main_window import MainWindow
+    path = os.path.join(tempfile.mkdtemp(), 'TestSubject_gui.csv')
+    write_history(path, samples, channels, rate)
+    device = TimedDevice(SyntheticSource(channels, rate, seed=2), PtyLink(), speed=1.0)
+
+    rss_start = rss_mb()
+    start = time.perf_counter()
+    window = MainWindow(path, device.port, 115200, channels, muscle_group='Quad')
+    load_s = time.perf_counter() - start
+    window.show()
+    app.processEvents()
+    rss_loaded = rss_mb()
+    ui = window.ui
+
+    frames = []  # (frame end time, live rows shown, redraw seconds, mode)
+    render = ui.timer.render
+
+    def timed_render():
+        shown = len(ui.store) + ui.store.discarded - samples
+        t0 = time.perf_counter()
+        render()
+        t1 = time.perf_counter()
+        frames.append((t1, shown, t1 - t0, 'window' if ui.window_seconds else 'session'))
+
+    ui.timer.render = timed_render
+    wait_for(lambda: ui.recorder.readers and ui.recorder.readers[0].start_time is not None, 10, app)
+    device.start()
+    phase_end = time.monotonic() + live_seconds
+    wait_for(lambda: False, live_seconds, app)
+    # Latency is measured on these samples; give the last of them time to show
+    live_written = device.samples_read
+    wait_for(lambda: False, 0.5, app)
+    # Then redraw the whole session each frame (min/max pyramid path)
+    ui.window_spin.setValue(0)
+    wait_for(lambda: time.monotonic() > phase_end + 0.5 + live_seconds / 2, live_seconds, app)
+    rss_live = rss_mb()
+    window.close()
+    device.stop()
+    os.remove(path)
+
+    ends, shown, redraw, modes = zip(*frames) if frames else ((), (), (), ())
+    ends, shown = np.array(ends), np.array(shown)
+    # Sample k reaches the screen in the first frame showing more than k live rows
+    counts, times = np.array(device.write_counts), np.array(device.write_times)
+    k = np.arange(live_written)
+    written_at = times[np.searchsorted(counts, k, side='right')]
+    frame = np.searchsorted(np.maximum.accumulate(shown), k, side='right') if len(shown) else k
+    seen = frame < len(ends)
+    latency_ms = (ends[frame[seen]] - written_at[seen]) * 1000
+    redraw = np.array(redraw) * 1000
+    modes = np.array(modes)
+    result = {
+        'load_s': round(load_s, 3),
+        'live_samples': int(live_written),
+        'live_samples_shown': int(seen.sum()),
+        'frames': len(frames),
+        'dropped_frames': ui.timer.dropped_frames,
+        'rss_after_load_mb': round(rss_loaded - rss_start, 1),
+        'rss_growth_live_mb': round(rss_live - rss_loaded, 1),
+    }
+    result.update(percentiles(latency_ms, 'latency_ms'))
+    result.update(percentiles(redraw[modes == 'window'], 'redraw_window_ms'))
+    result.update(percentiles(redraw[modes == 'session'], 'redraw_session_ms'))
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(old, new):
+    """Print every metric of `new` next to its value in `old`."""
+    for size, metrics in new['results'].items():
+        before = old.get('results', {}).get(size, {})
+        print(f"\n{size} samples")
+        for name, value in metrics.items():
+            previous = before.get(name)
+            change = ''
+            if isinstance(value, (int, float)) and isinstance(previous, (int, float)) and previous:
+                change = f"{(value - previous) / abs(previous) * 100:+7.1f} %"
+            print(f"  {name:24s} {str(previous):>12s} -> {str(value):>12s}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--channels', type=int, default=4)
+    parser.add_argument('--protocol', choices=['ascii', 'binary'], default='ascii',
+                        help='serial format for the ingest run')
+    parser.add_argument('--rate', type=float, default=500.0, help='live sample rate for the GUI run')
+    parser.add_argument('--live-seconds', type=float, default=5.0)
+    parser.add_argument('--skip-gui', action='store_true')
+    parser.add_argument('--json', default='bench_results.json', help='where to write the results')
+    parser.add_argument('--compare', help='earlier results JSON to compare against')
+    args = parser.parse_args()
+
+    app = None
+    if not args.skip_gui:
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication(sys.argv)
+    results = {}
+    for size in args.sizes:
+        print(f"{size} samples ...", flush=True)
+        result = bench_ingest(size, args.channels, args.protocol)
+        if app is not None:
+            result.update(bench_gui(app, size, args.channels, args.rate, args.live_seconds))
+        results[str(size)] = result
+        print(json.dumps(result, indent=2))
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'channels': args.channels,
+            'protocol': args.protocol,
+            'rate': args.rate,
+            'live_seconds': args.live_seconds,
+        },
+        'results': results,
+    }
+    with open(args.json, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
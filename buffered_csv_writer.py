@@ -0,0 +1,173 @@
+import io
+import os
+import csv
+import time
+import queue
+import threading
+import numpy as np
+from perf_metrics import Histogram
+
+color_red = "\u001b[31m"
+color_magenta = "\u001b[35m"
+color_reset = "\u001b[0m"
+
+# Sentinel telling the writer thread to drain and exit
+_STOP = object()
+
+
+def truncate_partial_line(path):
+    """Cut off a last line left unterminated by a crash; return the bytes removed."""
+    try:
+        f = open(path, 'r+b')
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        end = size
+        # Read backwards until the last newline
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        if end < size:
+            f.truncate(end)
+        return size - end
+
+
+class BufferedCsvWriter(threading.Thread):
+    """Append rows to a CSV file from a dedicated thread.
+
+    Producers hand rows (or whole NumPy blocks) over through a bounded queue
+    and return immediately. The writer formats them into memory and writes
+    them in one block when ``flush_bytes`` of text are pending or
+    ``flush_interval`` seconds have passed since the last flush.
+
+    Durability: after a process crash at most the last ``flush_interval``
+    seconds (or ``flush_bytes`` of text) plus whatever is still queued is
+    lost. Flushed data sits in the OS cache; with ``fsync_on_stop`` the file
+    is also fsynced on close so it survives a power loss after a clean stop.
+    If the disk stalls long enough for ``max_queue`` items to pile up,
+    producers block rather than dropping data.
+
+    Rows are also added to ``summary`` (a summary_index.SummaryIndex) if
+    given, with their byte offsets in the file, and the index is saved next
+    to the file after a clean close.
+    """
+
+    def __init__(self, path, flush_interval=0.25, flush_bytes=64 * 1024,
+                 fsync_on_stop=False, max_queue=4096, summary=None):
+        super().__init__(name="BufferedCsvWriter", daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.fsync_on_stop = fsync_on_stop
+        self.queue = queue.Queue(max_queue)
+        self.summary = summary
+        self.rows_written = 0
+        # Seconds taken by each block write + flush (disk stalls show up here)
+        self.write_times = Histogram()
+        self.error = None
+        # Raises here (on the caller's thread) if the file cannot be opened
+        self._file = self._open()
+        self._buffer = self._new_buffer()
+
+    def _open(self):
+        truncate_partial_line(self.path)
+        # Byte offset the next row is written at
+        self._offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return open(self.path, 'a', newline='')
+
+    def _close_file(self):
+        self._file.close()
+
+    def _new_buffer(self):
+        buffer = io.StringIO()
+        self._csv = csv.writer(buffer)
+        return buffer
+
+    def _format_rows(self, rows):
+        """Append rows to the in-memory buffer in the file's format."""
+        if hasattr(rows, 'tolist'):
+            rows = rows.tolist()
+        self._csv.writerows(rows)
+
+    def _row_offsets(self, start):
+        """Byte offsets in the file of the rows formatted into the buffer from position `start`.
+
+        None for formats whose rows are found by position rather than offset.
+        """
+        text = self._buffer.getvalue()[start:].encode('utf-8')
+        ends = np.flatnonzero(np.frombuffer(text, dtype=np.uint8) == 10) + 1
+        offsets = self._offset + np.concatenate(([0], ends[:-1]))
+        self._offset += len(text)
+        return offsets
+
+    def write_row(self, row):
+        """Queue one row (list of values)."""
+        self.queue.put((row,))
+
+    def write_rows(self, rows):
+        """Queue several rows at once (list of lists or a 2-D NumPy array)."""
+        self.queue.put(rows)
+
+    def close(self):
+        """Write everything still queued, flush and close the file."""
+        if self.is_alive():
+            self.queue.put(_STOP)
+            self.join()
+        elif not self._file.closed:
+            self._close_file()
+
+    def run(self):
+        last_flush = time.monotonic()
+        item = None
+        try:
+            while True:
+                timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                if item is not None:
+                    start = self._buffer.tell()
+                    self._format_rows(item)
+                    self.rows_written += len(item)
+                    if self.summary is not None:
+                        self.summary.extend_rows(item, self._row_offsets(start))
+                if (self._buffer.tell() >= self.flush_bytes
+                        or time.monotonic() - last_flush >= self.flush_interval):
+                    self._write_block()
+                    last_flush = time.monotonic()
+            self._write_block()
+            if self.fsync_on_stop:
+                os.fsync(self._file.fileno())
+        except Exception as e:
+            self.error = e
+            print(f"{color_magenta}CSV write error {color_red}{self.path}{color_magenta}:{color_reset} {e}\n")
+            # Keep draining so producers never block on a dead writer
+            while item is not _STOP:
+                item = self.queue.get()
+        finally:
+            self._close_file()
+        if self.summary is not None and self.error is None:
+            try:
+                self.summary.save(self.path)
+            except Exception as e:
+                # The index is rebuilt from the session next time it is opened
+                print(f"{color_magenta}Summary index write error {color_red}{self.path}{color_magenta}:{color_reset} {e}\n")
+
+    def _write_block(self):
+        if self._buffer.tell():
+            start = time.perf_counter()
+            self._file.write(self._buffer.getvalue())
+            self._file.flush()
+            self.write_times.observe(time.perf_counter() - start)
+            self._buffer.seek(0)
+            self._buffer.truncate()
@@ -0,0 +1,287 @@
+import os
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtCore import pyqtSignal
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from acquisition import channel_labels
+from session_binary import MUSCLE_GROUP_LABELS
+from session_cache import shared_cache
+
+color_red = "\u001b[31m"
+color_magenta = "\u001b[35m"
+color_reset = "\u001b[0m"
+
+
+def session_muscles(session, default_group):
+    """(muscle group, label) of each channel of a LoadedSession.
+
+    The group is the one stored with the session, else the one its labels
+    belong to, else `default_group`. Labels naming no muscle of the group
+    ("Sensor 1", ...) are taken to follow the group's usual channel order.
+    """
+    bases = [label.split(' (')[0] for label in session.labels]
+    group = session.muscle_group
+    if group is None:
+        group = next((name for name, muscles in MUSCLE_GROUP_LABELS.items()
+                      if bases and set(bases) <= set(muscles)), default_group)
+    muscles = MUSCLE_GROUP_LABELS.get(group)
+    labels = session.labels
+    if muscles is not None and not set(bases) <= set(muscles):
+        ports = -(-len(labels) // len(muscles))
+        labels = channel_labels(muscles, [len(muscles)] * ports)[:len(labels)]
+    return [(group, label) for label in labels]
+
+
+class ComparisonWindow(QtWidgets.QMainWindow):
+    """Overlay several recorded sessions, one graph per muscle.
+
+    Ticked sessions are loaded on the session cache's thread pool the first
+    time they are shown, then kept in the (shared, memory-capped) cache,
+    so ticking them again or switching the highlighted one is instant.
+    Sessions are aligned on their first sample; each is decimated through
+    its cached min/max pyramid to the graph width. Channels are matched by
+    muscle label, and sessions of another muscle group get panels of their
+    own; the muscle group picked in the window applies to sessions that
+    do not record one.
+    """
+    # Emitted from the loading thread with the session path; handled on the GUI thread
+    session_loaded = pyqtSignal(str)
+
+    def __init__(self, paths, muscle_group=None, cache=None, parent=None):
+        super().__init__(parent)
+        self.paths = list(paths)
+        self.cache = cache if cache is not None else shared_cache()
+        self.muscle_group = muscle_group
+        self.errors = {}
+        # Paths with a load in progress
+        self.loading = set()
+        self.graphs = []
+        self.setWindowTitle("StabiliKnee Session Comparison")
+        self.resize(1500, 900)
+
+        central = QtWidgets.QWidget(self)
+        layout = QtWidgets.QHBoxLayout(central)
+        side = QtWidgets.QVBoxLayout()
+        self.session_list = QtWidgets.QListWidget(central)
+        self.session_list.setMinimumWidth(260)
+        for i, path in enumerate(self.paths):
+            item = QtWidgets.QListWidgetItem(os.path.basename(path.rstrip('/\\')))
+            item.setToolTip(path)
+            item.setFlags(item.flags() | QtCore.Qt.ItemIsUserCheckable)
+            # Only the first two load up front; the rest when ticked
+            item.setCheckState(QtCore.Qt.Checked if i < 2 else QtCore.Qt.Unchecked)
+            self.session_list.addItem(item)
+        self.session_list.itemChanged.connect(self.on_selection_changed)
+        self.session_list.currentRowChanged.connect(self.on_current_changed)
+        side.addWidget(self.session_list)
+        self.group_combo = QtWidgets.QComboBox(central)
+        self.group_combo.addItems(list(MUSCLE_GROUP_LABELS))
+        self.group_combo.setToolTip("Muscle group of sessions that do not record one")
+        if muscle_group is not None:
+            self.group_combo.setCurrentText(muscle_group)
+        self.group_combo.currentTextChanged.connect(self.on_group_changed)
+        side.addWidget(self.group_combo)
+        layout.addLayout(side)
+
+        self.scroll_area = QtWidgets.QScrollArea(central)
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.panels_widget = QtWidgets.QWidget()
+        self.panels_layout = QtWidgets.QGridLayout(self.panels_widget)
+        self.scroll_area.setWidget(self.panels_widget)
+        # Graphs scrolled out of view skip highlight changes; catch up when shown
+        self.scroll_area.verticalScrollBar().valueChanged.connect(
+            lambda _: self.on_current_changed(self.session_list.currentRow()))
+        layout.addWidget(self.scroll_area, 1)
+        self.setCentralWidget(central)
+
+        self.session_loaded.connect(self.on_session_loaded)
+        self.on_selection_changed()
+
+    def checked_paths(self):
+        return [path for i, path in enumerate(self.paths)
+                if self.session_list.item(i).checkState() == QtCore.Qt.Checked]
+
+    def on_selection_changed(self, item=None):
+        """Start loading ticked sessions that are not cached, and show the rest."""
+        for path in self.checked_paths():
+            if path in self.errors or path in self.loading or self.cache.get(path) is not None:
+                continue
+            self.loading.add(path)
+            future = self.cache.load(path)
+            future.add_done_callback(lambda f, path=path: self._loaded(path, f))
+        self.show_graphs()
+
+    def _loaded(self, path, future):
+        # Runs on the loading thread
+        error = future.exception()
+        if error is not None:
+            self.errors[path] = error
+            print(f"{color_magenta}Could not load {color_red}{path}{color_magenta}:{color_reset} {error}")
+        try:
+            self.session_loaded.emit(path)
+        except RuntimeError:
+            pass  # window already closed
+
+    def on_session_loaded(self, path):
+        self.loading.discard(path)
+        if self.muscle_group is None:
+            session = self.cache.get(path)
+            if session is not None and session.muscle_group:
+                # Default labels from the first session that names its group
+                self.muscle_group = session.muscle_group
+                self.group_combo.setCurrentText(session.muscle_group)
+        self.show_graphs()
+
+    def on_group_changed(self, group):
+        self.muscle_group = group
+        self.show_graphs()
+
+    def loaded_sessions(self):
+        """(list index, LoadedSession) of the ticked sessions already in the cache."""
+        sessions = []
+        for path in self.checked_paths():
+            session = self.cache.get(path)
+            if session is not None:
+                sessions.append((self.paths.index(path), session))
+        return sessions
+
+    def _ensure_panels(self, panels, groups):
+        count = len(panels)
+        while len(self.graphs) < count:
+            canvas = OverlayCanvas()
+            canvas.setMinimumHeight(260 if count > 4 else 340)
+            self.panels_layout.addWidget(canvas, len(self.graphs) // 2, len(self.graphs) % 2)
+            self.graphs.append(canvas)
+        while len(self.graphs) > count:
+            canvas = self.graphs.pop()
+            self.panels_layout.removeWidget(canvas)
+            canvas.deleteLater()
+        for canvas, (group, label) in zip(self.graphs, panels):
+            canvas.set_title(f"{group} - {label}" if len(groups) > 1 else label)
+
+    def on_current_changed(self, row):
+        # Only the line widths change: redrawn over the cached axes
+        for canvas in self.graphs:
+            if not canvas.visibleRegion().isEmpty():
+                canvas.highlight(row)
+
+    def show_graphs(self):
+        """Redraw every muscle's overlay from the cached sessions."""
+        sessions = self.loaded_sessions()
+        default_group = self.group_combo.currentText()
+        # One panel per (muscle group, label), in the order sessions list them
+        muscles = {index: session_muscles(session, default_group) for index, session in sessions}
+        panels = []
+        for index, _ in sessions:
+            panels += [muscle for muscle in muscles[index] if muscle not in panels]
+        if not panels:
+            panels = [(default_group, label) for label in MUSCLE_GROUP_LABELS[default_group]]
+        groups = list(dict.fromkeys(group for group, _ in panels))
+        self._ensure_panels(panels, groups)
+        for canvas, muscle in zip(self.graphs, panels):
+            columns = max(canvas.width(), 100)
+            traces = {}
+            for index, session in sessions:
+                if muscle not in muscles[index] or not len(session.times):
+                    continue
+                col = muscles[index].index(muscle)
+                x, y = session.pyramid.envelope(session.times, session.values, col, 0,
+                                                len(session.times), columns)
+                label = os.path.basename(self.paths[index].rstrip('/\\'))
+                traces[index] = (label, x - session.times[0], y)
+            canvas.set_traces(traces, self.session_list.currentRow())
+        checked = self.checked_paths()
+        loading = len([p for p in checked if p in self.loading])
+        # Ticked, loaded once, since dropped by the cache's memory cap; reloaded when ticked again
+        dropped = len(checked) - len(sessions) - loading - len([p for p in checked if p in self.errors])
+        # Sessions of different muscle groups never share a graph
+        groups_note = f"{' and '.join(groups)} sessions in separate panels   " if len(groups) > 1 else ""
+        self.statusBar().showMessage(
+            f"{len(sessions)} shown, {loading} loading, {dropped} dropped (cache full)   {groups_note}"
+            f"cache {self.cache.nbytes / 1e6:.0f} of {self.cache.max_bytes / 1e6:.0f} MB, "
+            f"{len(self.cache)} sessions"
+        )
+
+
+class OverlayCanvas(FigureCanvas):
+    """One muscle's graph: a line per session over axes cached as a background.
+
+    Changing which line is highlighted only redraws the lines and blits,
+    like LivePlotCanvas; new data redraws the axes too.
+    """
+
+    def __init__(self, parent=None):
+        self.figure = Figure(figsize=(7, 2.6))
+        super().__init__(self.figure)
+        if parent is not None:
+            self.setParent(parent)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlabel('Time from session start (s)')
+        self.ax.set_ylabel('Amplitude (mV)')
+        # session index -> Line2D
+        self.lines = {}
+        self.current = None
+        self._background = None
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.figure.tight_layout()
+
+    def set_title(self, title):
+        if title != self.ax.get_title():
+            self.ax.set_title(title)
+            self.figure.tight_layout()
+            self._background = None
+
+    def _style(self, index, line):
+        line.set_linewidth(2.0 if index == self.current else 0.8)
+        line.set_zorder(3 if index == self.current else 2)
+
+    def _draw_lines(self):
+        for line in sorted(self.lines.values(), key=lambda line: line.get_zorder()):
+            self.ax.draw_artist(line)
+
+    def _on_draw(self, event):
+        # After every full draw: cache the axes, then put the lines on top
+        self._background = self.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+
+    def set_traces(self, traces, current):
+        """Show {session index: (label, x, y)}, highlighting session `current`."""
+        self.current = current
+        for index in list(self.lines):
+            if index not in traces:
+                self.lines.pop(index).remove()
+        for index, (label, x, y) in traces.items():
+            line = self.lines.get(index)
+            if line is None:
+                line, = self.ax.plot([], [], color=f"C{index % 10}", label=label, animated=True)
+                self.lines[index] = line
+            line.set_data(x, y)
+            self._style(index, line)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        if self.lines:
+            legend = self.ax.legend(handles=[self.lines[i] for i in sorted(self.lines)],
+                                    loc='upper right', fontsize='small')
+            # The legend is part of the cached axes, so it shows no highlight
+            for handle in legend.get_lines():
+                handle.set_linewidth(1.5)
+        elif self.ax.get_legend() is not None:
+            self.ax.get_legend().remove()
+        self.draw_idle()
+
+    def highlight(self, current):
+        if current == self.current and self._background is not None:
+            return
+        self.current = current
+        for index, line in self.lines.items():
+            self._style(index, line)
+        if self._background is None:
+            self.draw_idle()
+            return
+        self.restore_region(self._background)
+        self._draw_lines()
+        self.blit(self.figure.bbox)
@@ -0,0 +1,315 @@
+"""Stand-ins for the uMyo receiver, for testing without hardware.
+
+A source produces samples; a link carries them to the reader as the same
+space-separated, CRLF-terminated lines the firmware prints (or its binary
+frames, see wire_protocol), over a pseudo-terminal (POSIX) or a loopback TCP socket. ``SimulatedDevice``
+paces a source onto a link in real time, N times faster or as fast as the
+reader takes it, and exposes a ``port`` any reader can open:
+
+    device = SimulatedDevice(SyntheticSource(num_channels=8, sample_rate=1000))
+    device.start()
+    reader = SerialAcquisition("out.csv", device.port, 115200, 8)
+
+From the command line (prints the port to pass to main.py --port):
+
+    python data_sources.py synthetic --channels 4 --rate 500
+    python data_sources.py replay 4sensor_readings.csv --speed 10
+    python data_sources.py replay TestSubject_A00.skemg --speed max --tcp 5555
+    python data_sources.py synthetic --channels 8 --rate 2000 --binary
+"""
+import io
+import os
+import sys
+import time
+import socket
+import argparse
+import threading
+import numpy as np
+from session_loader import load_session, session_channels
+from wire_protocol import encode_frames
+
+color_red = "\u001b[31m"
+color_magenta = "\u001b[35m"
+color_reset = "\u001b[0m"
+
+
+def format_lines(values, times_us=None):
+    """Encode (n, channels) values in the firmware's line protocol (with "@micros" stamps if given)."""
+    buffer = io.BytesIO()
+    if times_us is None:
+        np.savetxt(buffer, values, fmt='%.2f', delimiter=' ', newline='\r\n')
+    else:
+        stamped = np.column_stack((np.asarray(times_us, dtype=np.int64) & 0xFFFFFFFF, values))
+        np.savetxt(buffer, stamped, fmt=['@%d'] + ['%.2f'] * values.shape[1], delimiter=' ', newline='\r\n')
+    return buffer.getvalue()
+
+
+class SyntheticSource(object):
+    """Generated muscle activity: rectified noise plus random bursts.
+
+    Bursts start at random (``burst_rate`` per second per channel), last
+    ``burst_seconds`` with a half-sine envelope and peak at around
+    ``burst_amplitude``. A ``seed`` makes the signal reproducible.
+    """
+
+    def __init__(self, num_channels=4, sample_rate=500.0, noise=2.0, baseline=0.0,
+                 burst_rate=0.5, burst_seconds=0.5, burst_amplitude=40.0, seed=None):
+        self.num_channels = num_channels
+        self.sample_rate = sample_rate
+        self.noise = noise
+        self.baseline = baseline
+        self.burst_rate = burst_rate
+        self.burst_length = max(1, int(round(burst_seconds * sample_rate)))
+        self.burst_amplitude = burst_amplitude
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+        # Bursts still in progress: (start sample, channel, amplitude)
+        self._bursts = []
+
+    def count_until(self, t):
+        """Samples due by `t` seconds of source time that were not read yet."""
+        return max(0, int(t * self.sample_rate) + 1 - self.index)
+
+    def read(self, n):
+        """Next `n` samples as an (n, channels) array."""
+        values = self.baseline + self.noise * np.abs(self.rng.standard_normal((n, self.num_channels)))
+        starts = self.rng.random((n, self.num_channels)) < self.burst_rate / self.sample_rate
+        for row, col in zip(*np.nonzero(starts)):
+            amplitude = self.burst_amplitude * (0.5 + self.rng.random())
+            self._bursts.append((self.index + row, col, amplitude))
+        active = []
+        for start, col, amplitude in self._bursts:
+            a = max(start - self.index, 0)
+            b = min(start + self.burst_length - self.index, n)
+            phase = (np.arange(a, b) + self.index - start) / self.burst_length
+            values[a:b, col] += amplitude * np.sin(np.pi * phase)
+            if start + self.burst_length > self.index + n:
+                active.append((start, col, amplitude))
+        self._bursts = active
+        self.index += n
+        return values
+
+
+class ReplaySource(object):
+    """Samples of a recorded CSV or binary session, on their recorded timing.
+
+    With ``loop`` the session repeats forever; otherwise ``read`` returns an
+    empty block once it is used up.
+    """
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.num_channels = len(session_channels(path))
+        times, values = load_session(path, self.num_channels)
+        self.times = np.asarray(times, dtype=np.float64) - (times[0] if len(times) else 0.0)
+        self.values = values
+        self.loop = loop
+        # Length of one pass, including one typical sample step
+        steps = np.diff(self.times)
+        steps = steps[steps > 0]
+        step = np.median(steps) if len(steps) else 0.0
+        self.period = self.times[-1] + step if len(self.times) else 0.0
+        # Typical rate, for the device clock of binary frames
+        self.sample_rate = 1.0 / step if step else 1.0
+        self.index = 0
+        self.passes = 0
+
+    def count_until(self, t):
+        if not len(self.times):
+            return 0
+        if self.loop and self.period > 0:
+            # Samples due over every full pass since the start
+            passes, t = divmod(t, self.period)
+            due = int(passes) * len(self.times) + int(np.searchsorted(self.times, t, side='right'))
+            return due - (self.passes * len(self.times) + self.index)
+        return int(np.searchsorted(self.times, t, side='right')) - self.index
+
+    def read(self, n):
+        parts = []
+        while n > 0 and len(self.times):
+            chunk = self.values[self.index:self.index + n]
+            if not len(chunk):
+                if not self.loop:
+                    break
+                self.index = 0
+                self.passes += 1
+                continue
+            parts.append(chunk)
+            self.index += len(chunk)
+            n -= len(chunk)
+        if not parts:
+            return np.empty((0, self.num_channels))
+        return np.concatenate(parts)
+
+
+class PtyLink(object):
+    """Pseudo-terminal pair (POSIX only): the reader opens ``port``."""
+
+    def __init__(self):
+        import tty
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.master)
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            # Blocks while the reader is behind, like a full UART buffer
+            view = view[os.write(self.master, view):]
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+
+class TcpLink(object):
+    """Loopback TCP server; the reader opens ``port`` ('socket://127.0.0.1:N').
+
+    Works on every platform. Writes wait until a reader has connected.
+    """
+
+    def __init__(self, tcp_port=0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', tcp_port))
+        self.server.listen(1)
+        self.port = f"socket://127.0.0.1:{self.server.getsockname()[1]}"
+        self.connection = None
+
+    def wait_for_reader(self, stop_event, poll=0.2):
+        """Block until a reader connects; False if stopped first."""
+        self.server.settimeout(poll)
+        while self.connection is None and not stop_event.is_set():
+            try:
+                self.connection, _ = self.server.accept()
+            except socket.timeout:
+                pass
+        return self.connection is not None
+
+    def write(self, data):
+        self.connection.sendall(data)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+        self.server.close()
+
+
+def default_link():
+    """A pty where available, otherwise a loopback socket."""
+    return PtyLink() if hasattr(os, 'openpty') else TcpLink()
+
+
+class SimulatedDevice(threading.Thread):
+    """Stream a source onto a link at ``speed`` x real time (None = as fast as possible).
+
+    At max speed the writer only waits when the link is full, so the rate
+    measured is the reader's throughput. With ``protocol="binary"`` samples
+    are sent as firmware frames, and with ``timestamps`` text lines carry
+    "@micros" too. The device clock follows the source's sample times and
+    runs ``drift_ppm`` fast, like an imprecise crystal.
+    """
+
+    def __init__(self, source, link=None, speed=1.0, chunk=256, protocol="ascii", timestamps=False,
+                 drift_ppm=0.0):
+        super().__init__(name="SimulatedDevice", daemon=True)
+        self.source = source
+        self.link = link if link is not None else default_link()
+        self.port = self.link.port
+        self.speed = speed
+        self.chunk = chunk
+        self.protocol = protocol
+        self.timestamps = timestamps
+        self.drift_ppm = drift_ppm
+        self.samples_sent = 0
+        self.error = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        if hasattr(self.link, 'wait_for_reader') and not self.link.wait_for_reader(self._stop_event):
+            return
+        started = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                if self.speed is None:
+                    n = self.chunk
+                else:
+                    n = self.source.count_until((time.monotonic() - started) * self.speed)
+                    if not n:
+                        time.sleep(0.001)
+                        continue
+                values = self.source.read(n)
+                if not len(values):
+                    break  # replay finished
+                self.link.write(self._encode(values))
+                self.samples_sent += len(values)
+        except OSError as e:
+            # Reader went away
+            self.error = e
+
+    def _encode(self, values):
+        index = self.samples_sent + np.arange(len(values))
+        micros = np.round(index * 1e6 * (1 + self.drift_ppm * 1e-6) / self.source.sample_rate)
+        if self.protocol == "binary":
+            return encode_frames(values, self.samples_sent, micros)
+        return format_lines(values, micros if self.timestamps else None)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(1.0)
+        self.link.close()
+
+
+def _speed(text):
+    return None if text == 'max' else float(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a uMyo receiver without hardware.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    synthetic = sub.add_parser('synthetic', help='generated EMG-like signal')
+    synthetic.add_argument('--channels', type=int, default=4)
+    synthetic.add_argument('--rate', type=float, default=500.0, help='samples per second')
+    synthetic.add_argument('--noise', type=float, default=2.0)
+    synthetic.add_argument('--burst-rate', type=float, default=0.5, help='bursts per second per channel')
+    synthetic.add_argument('--burst-seconds', type=float, default=0.5)
+    synthetic.add_argument('--burst-amplitude', type=float, default=40.0)
+    synthetic.add_argument('--seed', type=int, default=None)
+    replay = sub.add_parser('replay', help='replay a recorded session')
+    replay.add_argument('session')
+    replay.add_argument('--loop', action='store_true', help='repeat the session forever')
+    for p in (synthetic, replay):
+        p.add_argument('--speed', type=_speed, default=1.0, help="multiple of real time, or 'max'")
+        p.add_argument('--tcp', type=int, default=None, metavar='PORT',
+                       help='serve on a loopback TCP port instead of a pty')
+        p.add_argument('--binary', action='store_true', help='send binary frames instead of text lines')
+        p.add_argument('--timestamps', action='store_true', help='start text lines with "@<micros>"')
+        p.add_argument('--drift-ppm', type=float, default=0.0, help='device clock error')
+    args = parser.parse_args(argv)
+
+    if args.command == 'synthetic':
+        source = SyntheticSource(args.channels, args.rate, args.noise, burst_rate=args.burst_rate,
+                                 burst_seconds=args.burst_seconds,
+                                 burst_amplitude=args.burst_amplitude, seed=args.seed)
+    else:
+        source = ReplaySource(args.session, loop=args.loop)
+    link = TcpLink(args.tcp) if args.tcp is not None else default_link()
+    device = SimulatedDevice(source, link, args.speed, protocol='binary' if args.binary else 'ascii',
+                             timestamps=args.timestamps, drift_ppm=args.drift_ppm)
+    print(f"Streaming {source.num_channels} channels on {device.port} (Ctrl+C to stop)", flush=True)
+    device.start()
+    try:
+        while device.is_alive():
+            device.join(0.5)
+    except KeyboardInterrupt:
+        pass
+    device.stop()
+    if device.error is not None:
+        print(f"{color_magenta}Stream ended:{color_red} {device.error}{color_reset}")
+    print(f"Sent {device.samples_sent} samples")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+from collections import deque
+import numpy as np
+from perf_metrics import Histogram
+
+
+def _steps(values, previous):
+    # np.diff with `previous` before the first value (np.diff's prepend is slow)
+    steps = np.empty(len(values), dtype=values.dtype)
+    steps[0] = values[0] - previous
+    np.subtract(values[1:], values[:-1], out=steps[1:])
+    return steps
+
+
+class DeviceClock(object):
+    """Map device ``micros()`` stamps onto the host's monotonic clock.
+
+    Samples reach the host late by a varying amount (USB buffering, read
+    timing), so arrival times come in bunches. Device stamps are evenly
+    spaced but run on their own crystal. The model is a line
+    ``host = offset + rate * device`` fitted to the earliest arrival of
+    every ``window`` seconds of device time (the lower envelope: the
+    samples that waited least), over the last ``history`` windows. The
+    fitted rate follows crystal drift; the envelope keeps the offset at
+    the shortest latency seen rather than the average. The slope is the
+    median of the slopes between pairs of windows, capped at ``max_drift``,
+    so a window whose samples were all held up (a backlog read after the
+    port opened, a USB stall) cannot tilt the line.
+
+    Returned host times never run backwards and are never later than the
+    arrival time. A device stamp that goes backwards other than by
+    wrapping, or a sample arriving more than ``max_jump`` seconds before
+    the model says it was sent (or over a minute after), means the board
+    was reset; that starts a new model. Nor are they earlier than
+    ``not_before`` (the end of the session being appended to).
+    """
+
+    def __init__(self, tick=1e-6, wrap=2 ** 32, window=1.0, history=120, max_jump=1.0,
+                 not_before=-np.inf, max_drift=1000e-6):
+        self.tick = tick
+        self.wrap = wrap
+        self.window = window
+        self.max_jump = max_jump
+        # Largest believable |rate - 1|; board crystals are within ~100 ppm
+        self.max_drift = max_drift
+        self.offset = None
+        # d host / d device; 1.0 until two windows are complete
+        self.rate = 1.0
+        self.resets = 0
+        self.samples = 0
+        # Arrival minus modelled host time of every sample (seconds)
+        self.latency = Histogram()
+        # Count, sum and sum of squares of device sample intervals (seconds)
+        self.interval_sums = [0, 0.0, 0.0]
+        self._points = deque(maxlen=history)
+        self._last_host = not_before
+        self._restart()
+
+    def _restart(self):
+        self._points.clear()
+        self._best = None
+        self._window_start = None
+        self._last_tick = None
+        self._wraps = 0
+        self._last_device = None
+        self.offset = None
+        self.rate = 1.0
+
+    @property
+    def drift_ppm(self):
+        """How much faster the device clock runs than the host's, in ppm."""
+        return (1.0 / self.rate - 1.0) * 1e6
+
+    def to_host(self, ticks, arrival):
+        """Host times (seconds) of samples stamped `ticks` that arrived at `arrival`."""
+        ticks = np.asarray(ticks, dtype=np.int64)
+        if not len(ticks):
+            return np.empty(0)
+        previous = ticks[0] if self._last_tick is None else self._last_tick
+        steps = _steps(ticks, previous)
+        wrapped = steps < -self.wrap // 2
+        backwards = np.flatnonzero((steps < 0) & ~wrapped)
+        if len(backwards):
+            # Board reset: finish the samples before it on the old model
+            i = backwards[0]
+            head = self.to_host(ticks[:i], arrival)
+            self.resets += 1
+            self._restart()
+            return np.concatenate((head, self.to_host(ticks[i:], arrival)))
+
+        wraps = self._wraps + np.cumsum(wrapped)
+        device = (ticks + wraps * self.wrap) * self.tick
+        if self.offset is not None:
+            lateness = arrival - (self.offset + self.rate * device[-1])
+            if lateness < -self.max_jump or lateness > 60.0:
+                self.resets += 1
+                self._restart()
+                return self.to_host(ticks, arrival)
+        self._wraps = int(wraps[-1])
+        self._last_tick = int(ticks[-1])
+        if self._last_device is not None:
+            intervals = _steps(device, self._last_device)
+            sums = self.interval_sums
+            sums[0] += len(intervals)
+            sums[1] += float(intervals.sum())
+            sums[2] += float(np.dot(intervals, intervals))
+        self._last_device = float(device[-1])
+
+        self._update(device, arrival - device)
+        host = self.offset + self.rate * device
+        # Nothing is seen before it is sent, and time does not run backwards
+        np.minimum(host, arrival, out=host)
+        host = np.maximum.accumulate(host)
+        np.maximum(host, self._last_host, out=host)
+        self._last_host = host[-1]
+        self.latency.observe_many(arrival - host)
+        self.samples += len(host)
+        return host
+
+    def _update(self, device, residual):
+        # Earliest arrival (relative to the device clock) of the current window
+        i = int(np.argmin(residual))
+        if self._best is None or residual[i] < self._best[1]:
+            self._best = (device[i], residual[i])
+        if self._window_start is None:
+            self._window_start = device[0]
+        if device[-1] - self._window_start >= self.window:
+            self._points.append(self._best)
+            self._best = None
+            self._window_start = device[-1]
+            if len(self._points) >= 2:
+                d, r = np.array(self._points).T
+                # residual = offset' + slope * device, slope from every pair of windows
+                first, second = np.triu_indices(len(d), 1)
+                slope = float(np.median((r[second] - r[first]) / (d[second] - d[first])))
+                slope = min(max(slope, -self.max_drift), self.max_drift)
+                self.rate = 1.0 + slope
+                # Through the lowest point: windows held up sit above the line, never below
+                self.offset = float(np.min(r - slope * d))
+        if len(self._points) < 2:
+            # No slope yet: hold the device rate at 1 and the offset at the lowest residual
+            lowest = min([p[1] for p in self._points] + ([self._best[1]] if self._best else []))
+            self.offset = lowest if self.offset is None else min(self.offset, lowest)
+
+    def interval_jitter(self, sums=None):
+        """Standard deviation of the device sample intervals (seconds).
+
+        With `sums` (an earlier copy of ``interval_sums``) only the intervals
+        since then count.
+        """
+        n, s, ss = self.interval_sums
+        if sums is not None:
+            n, s, ss = n - sums[0], s - sums[1], ss - sums[2]
+        if n < 2:
+            return 0.0
+        return float(np.sqrt(max(ss / n - (s / n) ** 2, 0.0)))
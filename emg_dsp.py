@@ -0,0 +1,272 @@
+"""Streaming EMG signal processing.
+
+Stages keep their own state (filter delays, sliding windows) between calls,
+so a recording can be processed one batch at a time with constant cost per
+sample and the same result as processing it in one go. All stages work on
+(n, channels) blocks and are vectorized over channels.
+
+scipy is optional: when it is installed ``scipy.signal.sosfilt`` runs the
+IIR filters, otherwise an equivalent NumPy loop is used. That loop steps
+through samples in Python (about 10 us each): fine for live batches, slow
+over long recordings, so ``EMGPipeline.process_history`` only runs it
+over the most recent ``NUMPY_HISTORY_SAMPLES``.
+"""
+import numpy as np
+from sample_store import SampleStore
+
+try:
+    from scipy.signal import sosfilt
+except ImportError:
+    sosfilt = None
+
+# Recorded samples run through the DSP at startup when scipy is missing
+NUMPY_HISTORY_SAMPLES = 16384
+
+
+def butter2_sos(cutoff, sample_rate, btype='low'):
+    """Second-order Butterworth low/high-pass as a one-section SOS array.
+
+    The cutoff is clamped just below Nyquist so low sample rates still work.
+    """
+    cutoff = min(cutoff, 0.45 * sample_rate)
+    w0 = 2 * np.pi * cutoff / sample_rate
+    alpha = np.sin(w0) / np.sqrt(2)
+    cos_w0 = np.cos(w0)
+    if btype == 'low':
+        b = np.array([(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2])
+    elif btype == 'high':
+        b = np.array([(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2])
+    else:
+        raise ValueError(f"Unsupported filter type: {btype}")
+    a = np.array([1 + alpha, -2 * cos_w0, 1 - alpha])
+    return np.concatenate((b, a))[None, :] / a[0]
+
+
+def _sosfilt_numpy(sos, x, zi):
+    """Direct form II transposed SOS filter, vectorized over channels."""
+    y = np.array(x, dtype=np.float64)
+    for s, (b0, b1, b2, a0, a1, a2) in enumerate(sos):
+        z0, z1 = zi[s, 0], zi[s, 1]
+        for i in range(len(y)):
+            xi = y[i]
+            yi = b0 * xi + z0
+            z0 = b1 * xi - a1 * yi + z1
+            z1 = b2 * xi - a2 * yi
+            y[i] = yi
+        zi[s, 0], zi[s, 1] = z0, z1
+    return y, zi
+
+
+class StreamingSOSFilter(object):
+    """IIR filter (second-order sections) that carries its state across blocks."""
+
+    def __init__(self, sos, num_channels):
+        self.sos = np.atleast_2d(sos)
+        self.zi = np.zeros((len(self.sos), 2, num_channels))
+
+    def process(self, block):
+        if not len(block):
+            return np.empty_like(block, dtype=np.float64)
+        if sosfilt is not None:
+            y, self.zi = sosfilt(self.sos, block, axis=0, zi=self.zi)
+            return y
+        y, self.zi = _sosfilt_numpy(self.sos, block, self.zi.copy())
+        return y
+
+
+class StreamingStage(object):
+    """Base class for pipeline stages.
+
+    ``start`` is called once the sample rate is known. ``process`` takes an
+    (n, channels) block and returns an (n, channels) trace, or None for
+    stages that only produce summary values (see ``summary``).
+    """
+
+    name = ''
+    trace = True
+
+    def start(self, sample_rate, num_channels):
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    def process(self, block):
+        return None
+
+    def summary(self):
+        """Latest per-channel values, e.g. {'mnf': array([...])}."""
+        return {}
+
+
+class LinearEnvelope(StreamingStage):
+    """Linear envelope: high-pass (remove offset), rectify, low-pass."""
+
+    name = 'envelope'
+
+    def __init__(self, cutoff=2.0, highpass=None):
+        self.cutoff = cutoff
+        self.highpass = highpass
+
+    def start(self, sample_rate, num_channels):
+        super().start(sample_rate, num_channels)
+        self.hp = None
+        if self.highpass:
+            self.hp = StreamingSOSFilter(butter2_sos(self.highpass, sample_rate, 'high'), num_channels)
+        self.lp = StreamingSOSFilter(butter2_sos(self.cutoff, sample_rate), num_channels)
+
+    def process(self, block):
+        if self.hp is not None:
+            block = self.hp.process(block)
+        return self.lp.process(np.abs(block))
+
+
+class MovingRMS(StreamingStage):
+    """Root mean square over a sliding window of `window_seconds`."""
+
+    name = 'rms'
+
+    def __init__(self, window_seconds=0.25):
+        self.window_seconds = window_seconds
+
+    def start(self, sample_rate, num_channels):
+        super().start(sample_rate, num_channels)
+        self.window = max(1, int(round(self.window_seconds * sample_rate)))
+        # Squares of the last window - 1 samples seen
+        self.history = np.zeros((0, num_channels))
+        self.latest = np.zeros(num_channels)
+
+    def process(self, block):
+        squares = np.vstack((self.history, np.square(block, dtype=np.float64)))
+        sums = np.cumsum(squares, axis=0)
+        sums = np.vstack((np.zeros((1, self.num_channels)), sums))
+        ends = np.arange(len(self.history) + 1, len(squares) + 1)
+        starts = np.maximum(ends - self.window, 0)
+        counts = (ends - starts)[:, None]
+        rms = np.sqrt(np.maximum(sums[ends] - sums[starts], 0.0) / counts)
+        self.history = squares[-(self.window - 1):] if self.window > 1 else squares[:0]
+        if len(rms):
+            self.latest = rms[-1]
+        return rms
+
+    def summary(self):
+        return {'rms': self.latest}
+
+
+class SpectralFrequency(StreamingStage):
+    """Mean and median frequency of each channel over a sliding window."""
+
+    name = 'spectrum'
+    trace = False
+
+    def __init__(self, window_seconds=1.0):
+        self.window_seconds = window_seconds
+
+    def start(self, sample_rate, num_channels):
+        super().start(sample_rate, num_channels)
+        self.window = max(8, int(round(self.window_seconds * sample_rate)))
+        self.buffer = np.zeros((self.window, num_channels))
+        self.filled = 0
+        self.taper = np.hanning(self.window)[:, None]
+        self.freqs = np.fft.rfftfreq(self.window, 1.0 / sample_rate)
+        self.mnf = np.zeros(num_channels)
+        self.mdf = np.zeros(num_channels)
+
+    def process(self, block):
+        n = len(block)
+        if n >= self.window:
+            self.buffer[:] = block[-self.window:]
+        elif n:
+            self.buffer[:-n] = self.buffer[n:]
+            self.buffer[-n:] = block
+        self.filled = min(self.window, self.filled + n)
+        if n and self.filled == self.window:
+            # One FFT per batch, whatever the batch size
+            centred = (self.buffer - self.buffer.mean(axis=0)) * self.taper
+            power = np.abs(np.fft.rfft(centred, axis=0)) ** 2
+            total = power.sum(axis=0)
+            valid = total > 0
+            safe_total = np.where(valid, total, 1.0)
+            self.mnf = np.where(valid, (self.freqs[:, None] * power).sum(axis=0) / safe_total, 0.0)
+            half = np.cumsum(power, axis=0) >= safe_total / 2
+            self.mdf = np.where(valid, self.freqs[half.argmax(axis=0)], 0.0)
+        return None
+
+    def summary(self):
+        return {'mnf': self.mnf, 'mdf': self.mdf}
+
+
+class EMGPipeline(object):
+    """Runs streaming stages over batches of samples and keeps their traces.
+
+    Traces are stored in ``self.store`` (a SampleStore with one column per
+    trace stage and channel, see ``trace_columns``) so the UI can plot them
+    like the raw data. If no sample rate is given it is estimated from the
+    timestamps of the first samples.
+    """
+
+    # Samples used to estimate the sample rate
+    RATE_ESTIMATE_SAMPLES = 16
+
+    def __init__(self, num_channels, stages=None, sample_rate=None, max_samples=None):
+        self.num_channels = num_channels
+        if stages is None:
+            stages = [LinearEnvelope(), MovingRMS(), SpectralFrequency()]
+        self.stages = stages
+        self.trace_names = [stage.name for stage in stages if stage.trace]
+        self.store = SampleStore(num_channels * len(self.trace_names), max_samples=max_samples)
+        self.sample_rate = None
+        self.summary = {}
+        self._waiting_times = []
+        self._waiting_values = []
+        if sample_rate:
+            self._start(sample_rate)
+
+    def trace_columns(self, name):
+        """Slice of ``store`` columns holding trace `name` for all channels."""
+        i = self.trace_names.index(name)
+        return slice(i * self.num_channels, (i + 1) * self.num_channels)
+
+    def _start(self, sample_rate):
+        self.sample_rate = sample_rate
+        for stage in self.stages:
+            stage.start(sample_rate, self.num_channels)
+
+    def process(self, times, values):
+        """Feed a block: times (n,) and values (n, channels)."""
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)[:, :self.num_channels]
+        if self.sample_rate is None:
+            self._waiting_times.append(times)
+            self._waiting_values.append(values)
+            times = np.concatenate(self._waiting_times)
+            if len(times) < self.RATE_ESTIMATE_SAMPLES:
+                return
+            steps = np.diff(times)
+            steps = steps[steps > 0]
+            if not len(steps):
+                return
+            values = np.vstack(self._waiting_values)
+            self._waiting_times, self._waiting_values = [], []
+            self._start(1.0 / np.median(steps))
+        if not len(times):
+            return
+        traces = []
+        summary = {}
+        for stage in self.stages:
+            out = stage.process(values)
+            if stage.trace:
+                traces.append(out)
+            summary.update(stage.summary())
+        if traces:
+            self.store.extend(times, np.hstack(traces))
+        # Replaced in one assignment so readers on other threads see a whole dict
+        self.summary = summary
+
+    def process_history(self, times, values):
+        """Feed recorded samples before live ones.
+
+        Without scipy only the last ``NUMPY_HISTORY_SAMPLES`` are filtered;
+        earlier samples get no traces.
+        """
+        if sosfilt is None:
+            times, values = times[-NUMPY_HISTORY_SAMPLES:], values[-NUMPY_HISTORY_SAMPLES:]
+        self.process(times, values)
@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class RunningStats(object):
+    """Per-channel running max amplitude and trapezoidal integral.
+
+    Each sample is folded in as it arrives, so the cost per sample is constant
+    and the results match ``max``/``np.trapz`` over the full recording.
+    """
+
+    def __init__(self, num_sensors):
+        self.num_sensors = num_sensors
+        self.reset()
+
+    def reset(self):
+        """Forget all samples seen so far."""
+        self.count = 0
+        self.max_values = np.full(self.num_sensors, -np.inf)
+        self.integrals = np.zeros(self.num_sensors)
+        self.last_time = None
+        self.last_values = None
+
+    def restore(self, count, max_values, integrals, last_time, last_values):
+        """Continue from totals saved earlier (e.g. a chunked session's index)."""
+        self.count = count
+        self.max_values = self._as_row(max_values)
+        if not count:
+            self.max_values[:] = -np.inf
+        self.integrals = self._as_row(integrals)
+        self.last_time = last_time
+        self.last_values = None if last_values is None else self._as_row(last_values)
+
+    def _as_row(self, values):
+        # Missing channels count as 0.0, same as the CSV readers
+        row = np.zeros(self.num_sensors)
+        n = min(len(values), self.num_sensors)
+        row[:n] = values[:n]
+        return row
+
+    def update(self, elapsed, values):
+        """Add one sample (elapsed seconds, list of channel values)."""
+        row = self._as_row(values)
+        np.maximum(self.max_values, row, out=self.max_values)
+        if self.last_values is not None:
+            self.integrals += (elapsed - self.last_time) * (row + self.last_values) / 2.0
+        self.last_time = elapsed
+        self.last_values = row
+        self.count += 1
+
+    def update_batch(self, times, values):
+        """Add a block of samples: times (n,) and values (n, num_sensors)."""
+        n = len(times)
+        if n == 0:
+            return
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if values.shape[1] != self.num_sensors:
+            rows = np.zeros((len(times), self.num_sensors))
+            cols = min(values.shape[1], self.num_sensors)
+            rows[:, :cols] = values[:, :cols]
+            values = rows
+        np.maximum(self.max_values, values.max(axis=0), out=self.max_values)
+        if self.last_values is not None:
+            # Join the block to the previous sample
+            times = np.concatenate(([self.last_time], times))
+            values = np.vstack((self.last_values, values))
+        if len(times) > 1:
+            dt = np.diff(times)[:, None]
+            self.integrals += (dt * (values[1:] + values[:-1]) / 2.0).sum(axis=0)
+        self.last_time = times[-1]
+        self.last_values = values[-1].copy()
+        self.count += n
+
+    def max_amplitude(self):
+        """Max value per channel (0 for channels with no data yet)."""
+        return np.where(np.isneginf(self.max_values), 0.0, self.max_values)
+
+    def total_activity(self):
+        """Trapezoidal integral of each channel over time."""
+        return self.integrals.copy()
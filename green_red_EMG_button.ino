@@ -6,6 +6,55 @@ const int redLedPin = 11;    // Red LED for inactive state
 bool scriptRunning = false;  // Track if script is running
 bool lastButtonState = HIGH; // tores previous button state
 
+// Output format: 0 = text lines ("23.00 36.00 18.00 15.00"), 1 = binary
+// frames (sync, sequence number, micros(), int16 levels, CRC; layout in
+// wire_protocol.py). The Python reader detects either one.
+#define BINARY_PROTOCOL 0
+// Text mode only: start each line with the device time as "@<micros> ", so
+// the host can timestamp samples when they were taken, not when they arrived
+// (0 sends bare values, as older firmware did)
+#define ASCII_TIMESTAMPS 1
+#define MAX_CHANNELS 16
+#define LEVEL_SCALE 10           // binary levels are sent as level * LEVEL_SCALE
+// Pause between samples; binary frames are short enough for a much lower value
+#define SAMPLE_DELAY_MS 60
+uint16_t frameSeq = 0;           // wraps; gaps tell the reader frames were lost
+
+// CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF)
+uint16_t crc16(const uint8_t *data, size_t len) {
+  uint16_t crc = 0xFFFF;
+  for (size_t i = 0; i < len; i++) {
+    crc ^= (uint16_t)data[i] << 8;
+    for (int b = 0; b < 8; b++) {
+      crc = (crc & 0x8000) ? (crc << 1) ^ 0x1021 : crc << 1;
+    }
+  }
+  return crc;
+}
+
+void sendFrame(int count) {
+  uint8_t frame[11 + 2 * MAX_CHANNELS];
+  uint32_t now = micros();
+  int n = 0;
+  frame[n++] = 0xA5;  // sync
+  frame[n++] = 0x5A;
+  frame[n++] = count;
+  frame[n++] = frameSeq & 0xFF;
+  frame[n++] = frameSeq >> 8;
+  for (int i = 0; i < 4; i++) frame[n++] = (now >> (8 * i)) & 0xFF;
+  for (int d = 0; d < count; d++) {
+    float scaled = uMyo.getMuscleLevel(d) * LEVEL_SCALE;
+    int16_t level = scaled > 32767 ? 32767 : (scaled < -32768 ? -32768 : (int16_t)lround(scaled));
+    frame[n++] = level & 0xFF;
+    frame[n++] = (level >> 8) & 0xFF;
+  }
+  uint16_t crc = crc16(frame + 2, n - 2);  // everything after the sync bytes
+  frame[n++] = crc & 0xFF;
+  frame[n++] = crc >> 8;
+  Serial.write(frame, n);
+  frameSeq++;
+}
+
 void setup() {
   pinMode(buttonPin, INPUT_PULLUP);  // Use internal pull-up resistor
   pinMode(greenLedPin, OUTPUT);  // Green LED pin as output
@@ -43,11 +92,22 @@ void loop() {
     uMyo.run();
     int dev_count = uMyo.getDeviceCount();  // Get device count
 
+#if BINARY_PROTOCOL
+    if (dev_count > 0) sendFrame(min(dev_count, MAX_CHANNELS));
+#else
+#if ASCII_TIMESTAMPS
+    if (dev_count > 0) {
+      Serial.print('@');
+      Serial.print(micros());
+      Serial.print(' ');
+    }
+#endif
     for (int d = 0; d < dev_count; d++) {
       Serial.print(uMyo.getMuscleLevel(d));
       if (d < dev_count - 1) Serial.print(' ');
       else Serial.println();
     }
-    delay(60);  // Small delay to prevent excessive data printing
+#endif
+    delay(SAMPLE_DELAY_MS);  // Small delay to prevent excessive data printing
   }
 }
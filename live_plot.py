@@ -0,0 +1,136 @@
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+
+# Axis limits grow by this factor when data runs past them, so full redraws
+# only happen a logarithmic number of times over a session
+AXIS_HEADROOM = 1.5
+
+
+class LivePlotCanvas(FigureCanvas):
+    """Long-lived matplotlib canvas for one EMG channel.
+
+    The axes, ticks and labels are rendered once and cached as a background.
+    Each update only draws the samples added since the previous frame on top
+    of the cached last frame and blits the axes area. A full redraw happens
+    only when the data leaves the current axis limits, the x window is
+    changed (``set_x_window``) or the widget resizes.
+    """
+
+    def __init__(self, parent=None, title='Muscle Activity Over Time'):
+        self.figure = Figure(figsize=(9, 2.7))
+        super().__init__(self.figure)
+        if parent is not None:
+            self.setParent(parent)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_xlabel('Time (s)')
+        self.ax.set_ylabel('Amplitude (mV)')
+        self.ax.set_title(title)
+        self.ax.set_xlim(0, 1)
+        self.ax.set_ylim(0, 1)
+        self.figure.tight_layout()
+        self.line, = self.ax.plot([], [], animated=True)
+        # Draws just the newly appended points, same style as the main line
+        self.tail, = self.ax.plot([], [], color=self.line.get_color(), animated=True)
+        self._background = None  # axes without data
+        self._frame = None       # axes with the data drawn so far
+        self._drawn = 0
+        self._last_x = None
+        # Fixed (x0, x1) limits for windowed views; None = follow the data
+        self.x_window = None
+        # Extra traces (e.g. envelope, RMS) drawn over the raw data
+        self.overlays = []
+        self.mpl_connect('draw_event', self._on_draw)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.figure.tight_layout()
+
+    def set_overlays(self, labels):
+        """Create one extra trace per label, with a legend."""
+        for overlay in self.overlays:
+            overlay.remove()
+        self.overlays = [self.ax.plot([], [], label=label, animated=True)[0] for label in labels]
+        self.line.set_label('raw')
+        if labels:
+            self.ax.legend(handles=[self.line] + self.overlays, loc='upper left', fontsize='small')
+        self._background = None
+
+    def _draw_lines(self):
+        self.ax.draw_artist(self.line)
+        for overlay in self.overlays:
+            self.ax.draw_artist(overlay)
+
+    def _on_draw(self, event):
+        # Called after every full draw: re-cache the backgrounds
+        self._background = self.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+        self._frame = self.copy_from_bbox(self.figure.bbox)
+        xdata = self.line.get_xdata()
+        self._drawn = len(xdata)
+        self._last_x = xdata[-1] if len(xdata) else None
+
+    def set_x_window(self, x0=None, x1=None):
+        """Pin the x axis to [x0, x1], or let it follow the data (no arguments)."""
+        window = None if x0 is None else (float(x0), float(x1))
+        if window == self.x_window:
+            return
+        self.x_window = window
+        if window is not None:
+            self.ax.set_xlim(*window)
+        # Axis changed: the next update does a full redraw
+        self._background = None
+        self._frame = None
+
+    def _fits(self, x, y):
+        # True if the points fit inside the current axis limits
+        x0, x1 = self.ax.get_xlim()
+        y0, y1 = self.ax.get_ylim()
+        x_fits = self.x_window is not None or (x[0] >= x0 and x[-1] <= x1)
+        return x_fits and y.min() >= y0 and y.max() <= y1
+
+    def _rescale(self, x, y):
+        if self.x_window is None:
+            x0, x1 = float(x[0]), float(x[-1])
+            self.ax.set_xlim(x0, x0 + max((x1 - x0) * AXIS_HEADROOM, 1.0))
+        y0, y1 = float(min(y.min(), 0.0)), float(y.max())
+        self.ax.set_ylim(y0, y0 + max((y1 - y0) * AXIS_HEADROOM, 1.0))
+
+    def update_data(self, x, y, append=True, overlays=()):
+        """Show samples y over times x (views are fine; they are not copied).
+
+        With append=True, x/y may extend the previous call's data and only
+        the new points are drawn; pass False when the points were reshaped
+        (e.g. decimated) and the whole line must be redrawn. `overlays` is
+        a list of (x, y) pairs, one per trace set up with ``set_overlays``;
+        they are always redrawn in full.
+        """
+        if len(x) == 0:
+            return
+        for overlay, (ox, oy) in zip(self.overlays, overlays):
+            overlay.set_data(ox, oy)
+        continuation = (
+            append
+            and not self.overlays
+            and self._frame is not None
+            and 0 < self._drawn <= len(x)
+            and x[self._drawn - 1] == self._last_x
+        )
+        self.line.set_data(x, y)
+        new = slice(self._drawn - 1 if continuation else 0, None)
+        if self._background is None or not self._fits(x[new], y[new]):
+            # Axis limits change: full redraw, _on_draw re-caches backgrounds
+            self._rescale(x, y)
+            self.draw()
+            return
+        if continuation:
+            # Only the points since the last frame are drawn
+            self.restore_region(self._frame)
+            self.tail.set_data(x[new], y[new])
+            self.ax.draw_artist(self.tail)
+        else:
+            self.restore_region(self._background)
+            self._draw_lines()
+        self._frame = self.copy_from_bbox(self.figure.bbox)
+        self._drawn = len(x)
+        self._last_x = x[-1]
+        self.blit(self.figure.bbox)
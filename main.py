@@ -5,19 +5,80 @@ warnings.filterwarnings(
     module="matplotlib.projections"
 )
 import sys
-from PyQt5.QtWidgets import QApplication
-from main_window import MainWindow
-from uMyo_serial_thread import get_new_filename
+import argparse
+from acquisition import get_new_filename, SESSION_EXTENSIONS
+from session_export import EXPORT_FORMATS, export_path
+from session_columnar import require_backend
 
 def main():
-    subject = 'A00_Test123'
-    csv_file = get_new_filename(subject)
-    port = 'COM3'          # or '/dev/tty...' on Mac/Linux
-    baud = 115200
-    sensors = 4
+    parser = argparse.ArgumentParser(description="StabiliKnee EMG acquisition GUI.")
+    parser.add_argument('--subject', default='A00_Test123')
+    # Repeat --port to record several receivers together, e.g. --port COM3 --port COM4
+    parser.add_argument('--port', action='append', dest='ports',
+                        help="serial port (default COM3, or '/dev/tty...' on Mac/Linux)")
+    parser.add_argument('--baud', type=int, default=115200)
+    # One count for every port, or one per port in --port order
+    parser.add_argument('--sensors', type=int, nargs='+', default=[4])
+    parser.add_argument('--headless', action='store_true',
+                        help='record without the GUI and print live rates')
+    parser.add_argument('--muscle-group', choices=['Quad', 'Hamstring'], default=None,
+                        help='channel labels (GUI default: ask; headless default: Quad)')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='headless: stop after this many seconds (default: Ctrl+C)')
+    parser.add_argument('--metrics', metavar='PATH', default=None,
+                        help='append performance metrics every second to PATH (.csv or JSON lines)')
+    parser.add_argument('--protocol', choices=['auto', 'ascii', 'binary'], default='auto',
+                        help='serial format sent by the board (default: detect)')
+    parser.add_argument('--format', choices=sorted(SESSION_EXTENSIONS) + sorted(EXPORT_FORMATS), default='csv',
+                        help='session file format; chunked is crash-safe with an index, '
+                             'parquet and hdf5 record a chunked session and convert it when '
+                             'recording stops, and need pyarrow / h5py (default: csv)')
+    parser.add_argument('--compare', nargs='+', metavar='SESSION', default=None,
+                        help='overlay recorded sessions (files, directories or glob patterns) instead of recording')
+    parser.add_argument('--cache-mb', type=int, default=512,
+                        help='compare: memory for loaded sessions before the least recent are dropped')
+    args = parser.parse_args()
 
+    if args.compare:
+        from PyQt5.QtWidgets import QApplication
+        from batch_analysis import find_sessions
+        from session_cache import shared_cache
+        from comparison_window import ComparisonWindow
+        app = QApplication(sys.argv)
+        window = ComparisonWindow(find_sessions(args.compare), args.muscle_group,
+                                  shared_cache(args.cache_mb * 1024 * 1024))
+        window.show()
+        sys.exit(app.exec_())
+
+    export = None
+    if args.format in EXPORT_FORMATS:
+        csv_file = get_new_filename(args.subject, SESSION_EXTENSIONS['chunked'])
+        export = export_path(csv_file, args.format)
+        try:
+            require_backend(export)
+        except ImportError as e:
+            parser.error(str(e))
+    else:
+        csv_file = get_new_filename(args.subject, SESSION_EXTENSIONS[args.format])
+    ports = args.ports or ['COM3']
+    if len(args.sensors) not in (1, len(ports)):
+        parser.error(f"--sensors takes one count or one per port ({len(ports)}), got {len(args.sensors)}")
+    sensors = args.sensors if len(args.sensors) == len(ports) else args.sensors[0]
+
+    if args.headless:
+        # No Qt or matplotlib import at all
+        from acquisition import record_headless
+        record_headless(csv_file, ports, args.baud, sensors, args.muscle_group or 'Quad',
+                        duration=args.duration, metrics_file=args.metrics,
+                        protocol=args.protocol, export_path=export)
+        return
+
+    from PyQt5.QtWidgets import QApplication
+    from main_window import MainWindow
     app = QApplication(sys.argv)
-    window = MainWindow(csv_file, port, baud, sensors)
+    window = MainWindow(csv_file, ports if len(ports) > 1 else ports[0], args.baud, sensors,
+                        muscle_group=args.muscle_group, metrics_file=args.metrics,
+                        protocol=args.protocol, export_path=export)
     window.show()
     sys.exit(app.exec_())
 
@@ -3,9 +3,11 @@ from ui_main_window import ui_main_window
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, csv_file, serial_port, baud_rate, num_sensors):
+    def __init__(self, csv_file, serial_port, baud_rate, num_sensors, max_samples=None, muscle_group=None,
+                 metrics_file=None, protocol="auto", export_path=None):
         super().__init__()
-        self.ui = ui_main_window(csv_file, serial_port, baud_rate, num_sensors)
+        self.ui = ui_main_window(csv_file, serial_port, baud_rate, num_sensors, max_samples, muscle_group,
+                                 metrics_file, protocol, export_path)
         self.ui.setup_ui(self)
 
     def closeEvent(self, event):
@@ -0,0 +1,218 @@
+"""Lightweight performance instrumentation.
+
+The hot paths only bump integer counters (once per serial chunk, not per
+byte or line) or add one observation to a ``Histogram`` (once per disk
+write or frame). ``PerfMonitor`` reads them all once per interval and
+turns them into rates and per-interval percentiles, so the cost of
+measuring stays far below 1% of a core. ``MetricsLog`` appends each
+sample to a rolling CSV or JSON-lines file.
+"""
+import os
+import csv
+import json
+import time
+import math
+from bisect import bisect_left
+import numpy as np
+
+
+class Histogram(object):
+    """Counts of observations in fixed log-spaced buckets.
+
+    Buckets span ``lo``..``hi`` with ``per_decade`` buckets per factor of
+    ten (values outside go to the first/last bucket), so percentiles are
+    accurate to about 25% at any scale. One thread observes; others may
+    read ``counts`` at any time.
+    """
+
+    def __init__(self, lo=1e-6, hi=100.0, per_decade=10):
+        decades = math.log10(hi / lo)
+        steps = int(round(decades * per_decade))
+        self.bounds = [lo * 10 ** (i / per_decade) for i in range(steps + 1)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def observe_many(self, values):
+        """Add a NumPy array of observations at once."""
+        if not len(values):
+            return
+        counts = np.bincount(np.searchsorted(self.bounds, values), minlength=len(self.counts))
+        for i in np.flatnonzero(counts):
+            self.counts[i] += int(counts[i])
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+
+    def percentile(self, q, counts=None):
+        """Upper bound of the bucket holding the q-th percentile (0 if empty)."""
+        counts = self.counts if counts is None else counts
+        n = sum(counts)
+        if not n:
+            return 0.0
+        rank = q / 100.0 * n
+        seen = 0
+        for i, c in enumerate(counts):
+            seen += c
+            if seen >= rank and c:
+                return self.bounds[min(i, len(self.bounds) - 1)]
+        return self.bounds[-1]
+
+
+class PerfMonitor(object):
+    """Samples the counters of a Recorder, its writers and a RenderScheduler.
+
+    Each ``sample()`` returns a flat dict: totals, per-second rates since
+    the previous sample, writer queue depth and the percentiles of write
+    and frame times observed during the interval. With device timestamps
+    it also has the arrival latency over the clock model, the device
+    sample interval jitter and the worst clock drift of the readers.
+    """
+
+    def __init__(self, recorder=None, scheduler=None):
+        self.recorder = recorder
+        self.scheduler = scheduler
+        self.started = time.monotonic()
+        self._last_time = self.started
+        self._last_totals = {}
+        self._last_counts = {}
+        self._last_intervals = {}
+
+    def _totals(self):
+        readers = self.recorder.readers if self.recorder is not None else []
+        writers = self.recorder.writers if self.recorder is not None else []
+        return {
+            'bytes_read': sum(r.bytes_read for r in readers),
+            'lines': sum(r.lines for r in readers),
+            'samples': sum(r.samples for r in readers),
+            'malformed': sum(r.lines_malformed for r in readers),
+            'lost': sum(r.samples_lost for r in readers),
+            'rows_written': sum(w.rows_written for w in writers),
+        }
+
+    def _interval(self, name, histogram, sample, scale=1000.0):
+        # Percentiles of just the observations since the previous sample
+        counts = list(histogram.counts)
+        previous = self._last_counts.get(name, [0] * len(counts))
+        recent = [a - b for a, b in zip(counts, previous)]
+        self._last_counts[name] = counts
+        sample[f"{name}_count"] = sum(recent)
+        sample[f"{name}_ms_p50"] = round(histogram.percentile(50, recent) * scale, 3)
+        sample[f"{name}_ms_p95"] = round(histogram.percentile(95, recent) * scale, 3)
+        sample[f"{name}_ms_max"] = round(histogram.percentile(100, recent) * scale, 3)
+
+    def sample(self):
+        now = time.monotonic()
+        span = max(now - self._last_time, 1e-9)
+        totals = self._totals()
+        sample = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'uptime_s': round(now - self.started, 1)}
+        for name, value in totals.items():
+            sample[name] = value
+            sample[f"{name}_per_s"] = round((value - self._last_totals.get(name, 0)) / span, 1)
+        self._last_totals = totals
+        self._last_time = now
+
+        writers = self.recorder.writers if self.recorder is not None else []
+        sample['queue_depth'] = sum(w.queue.qsize() for w in writers)
+        write_times = Histogram()
+        for w in writers:
+            # Combine the writers' buckets (one writer unless recording several ports)
+            write_times.counts = [a + b for a, b in zip(write_times.counts, w.write_times.counts)]
+        self._interval('write', write_times, sample)
+        if self.recorder is not None:
+            self._clock_stats(self.recorder.readers, sample)
+        if self.scheduler is not None:
+            self._interval('frame', self.scheduler.frame_times, sample)
+            sample['dropped_frames'] = self.scheduler.dropped_frames
+        return sample
+
+
+    def _clock_stats(self, readers, sample):
+        # Device timestamps: latency above the clock model, drift and sample interval jitter
+        clocks = [r.clock for r in readers if r.clock.samples]
+        latency = Histogram()
+        jitter = 0.0
+        drift = 0.0
+        for clock in clocks:
+            latency.counts = [a + b for a, b in zip(latency.counts, clock.latency.counts)]
+            jitter = max(jitter, clock.interval_jitter(self._last_intervals.get(id(clock))))
+            self._last_intervals[id(clock)] = list(clock.interval_sums)
+            if abs(clock.drift_ppm) > abs(drift):
+                drift = clock.drift_ppm
+        sample['clock_samples'] = sum(clock.samples for clock in clocks)
+        self._interval('latency', latency, sample)
+        sample['interval_jitter_ms'] = round(jitter * 1000.0, 3)
+        sample['clock_drift_ppm'] = round(drift, 1)
+        sample['clock_resets'] = sum(clock.resets for clock in clocks)
+
+
+def format_summary(sample):
+    """One-line text for a status bar or console."""
+    text = (f"in {sample['samples_per_s']:.0f}/s  {sample['bytes_read_per_s'] / 1024:.1f} KB/s  "
+            f"bad {sample['malformed']}  lost {sample['lost']}  queue {sample['queue_depth']}  "
+            f"write p95 {sample['write_ms_p95']:.1f} ms")
+    if sample.get('clock_samples'):
+        text += f"  latency p95 {sample['latency_ms_p95']:.1f} ms  drift {sample['clock_drift_ppm']:+.0f} ppm"
+    if 'frame_ms_p95' in sample:
+        text += f"  frame p95 {sample['frame_ms_p95']:.1f} ms  dropped {sample['dropped_frames']}"
+    return text
+
+
+class MetricsLog(object):
+    """Append metric samples to a CSV (``.csv``) or JSON-lines file, rolling over by size.
+
+    When the file passes ``max_bytes`` it is renamed to ``path.1`` (older
+    files shift up to ``path.<backups>``) and a new file is started.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.is_csv = path.lower().endswith('.csv')
+        self._fields = None
+        self._file = None
+
+    def _open(self):
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, 'a', newline='')
+        self._csv = None
+        if self.is_csv:
+            self._csv = csv.DictWriter(self._file, fieldnames=self._fields, extrasaction='ignore')
+            if new:
+                self._csv.writeheader()
+
+    def _roll(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def write(self, sample):
+        if self._file is None:
+            self._fields = list(sample)
+            self._open()
+        if self.is_csv:
+            self._csv.writerow(sample)
+        else:
+            self._file.write(json.dumps(sample) + '\n')
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._roll()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
@@ -0,0 +1,179 @@
+import numpy as np
+
+
+class _Level(object):
+    """Min/max of every complete block of one size, all channels."""
+
+    def __init__(self, num_channels, capacity=1024):
+        self.start = 0  # absolute index of the first block kept
+        self.count = 0
+        self.vmin = np.empty((capacity, num_channels))
+        self.vmax = np.empty((capacity, num_channels))
+        self.imin = np.empty((capacity, num_channels), dtype=np.int64)
+        self.imax = np.empty((capacity, num_channels), dtype=np.int64)
+
+    @property
+    def end(self):
+        """Absolute index one past the last block."""
+        return self.start + self.count
+
+    def append(self, vmin, vmax, imin, imax):
+        n = len(vmin)
+        needed = self.count + n
+        if needed > len(self.vmin):
+            capacity = len(self.vmin)
+            while capacity < needed:
+                capacity *= 2
+            for name in ('vmin', 'vmax', 'imin', 'imax'):
+                old = getattr(self, name)
+                new = np.empty((capacity, old.shape[1]), dtype=old.dtype)
+                new[:self.count] = old[:self.count]
+                setattr(self, name, new)
+        self.vmin[self.count:needed] = vmin
+        self.vmax[self.count:needed] = vmax
+        self.imin[self.count:needed] = imin
+        self.imax[self.count:needed] = imax
+        self.count = needed
+
+    def drop_before(self, block):
+        """Forget blocks whose index is below `block`."""
+        drop = min(max(block - self.start, 0), self.count)
+        if not drop:
+            return
+        keep = self.count - drop
+        for arr in (self.vmin, self.vmax, self.imin, self.imax):
+            arr[:keep] = arr[drop:self.count]
+        self.start += drop
+        self.count = keep
+
+
+class MinMaxPyramid(object):
+    """Multi-resolution min/max envelopes for plotting long recordings.
+
+    Level k holds, per channel, the min and max (and the sample index of
+    each) of every block of ``base_block * 2**k`` samples. Levels are built
+    incrementally from new samples only. ``envelope`` reduces any index
+    range to at most about two points per pixel column, using real samples
+    at their real times, so spikes survive decimation.
+
+    Sample indices are absolute: ``offset`` is the number of samples a
+    bounded SampleStore has already discarded.
+    """
+
+    def __init__(self, num_channels, base_block=8, max_levels=24):
+        self.num_channels = num_channels
+        self.base_block = base_block
+        self.levels = [_Level(num_channels) for _ in range(max_levels)]
+
+    def block_size(self, level):
+        return self.base_block << level
+
+    def clear(self):
+        self.levels = [_Level(self.num_channels) for _ in self.levels]
+
+    def update(self, values, offset=0):
+        """Fold samples added to `values` (rows offset.. of the recording) into the levels."""
+        total = offset + len(values)
+        first = self.levels[0]
+        # Restart level 0 if rows were discarded before they were summarised
+        if first.end * self.base_block < offset:
+            self.clear()
+            first = self.levels[0]
+            first.start = -(-offset // self.base_block)
+        new_end = total // self.base_block
+        if new_end > first.end:
+            a = first.end * self.base_block
+            b = new_end * self.base_block
+            raw = values[a - offset:b - offset].reshape(-1, self.base_block, self.num_channels)
+            base = np.arange(first.end, new_end)[:, None] * self.base_block
+            first.append(raw.min(axis=1), raw.max(axis=1),
+                         raw.argmin(axis=1) + base, raw.argmax(axis=1) + base)
+        for lower, upper in zip(self.levels, self.levels[1:]):
+            if upper.count == 0 and upper.start * 2 < lower.start:
+                upper.start = -(-lower.start // 2)
+            new_end = lower.end // 2
+            if new_end <= upper.end:
+                break
+            a = upper.end * 2 - lower.start
+            b = new_end * 2 - lower.start
+            self._merge_into(upper, lower, a, b)
+        # Keep memory bounded along with the store
+        for level, lvl in enumerate(self.levels):
+            lvl.drop_before(offset // self.block_size(level))
+
+    @staticmethod
+    def _merge_into(upper, lower, a, b):
+        # Combine pairs of lower-level blocks [a, b) into upper-level blocks
+        vmin = lower.vmin[a:b].reshape(-1, 2, lower.vmin.shape[1])
+        vmax = lower.vmax[a:b].reshape(vmin.shape)
+        imin = lower.imin[a:b].reshape(vmin.shape)
+        imax = lower.imax[a:b].reshape(vmin.shape)
+        pick_min = vmin[:, 1] < vmin[:, 0]
+        pick_max = vmax[:, 1] > vmax[:, 0]
+        upper.append(
+            np.where(pick_min, vmin[:, 1], vmin[:, 0]),
+            np.where(pick_max, vmax[:, 1], vmax[:, 0]),
+            np.where(pick_min, imin[:, 1], imin[:, 0]),
+            np.where(pick_max, imax[:, 1], imax[:, 0]),
+        )
+
+    def _pieces(self, a, b, level):
+        """Cover absolute sample range [a, b) with blocks of `level` and below.
+
+        Returns a list of (level, first_block, last_block) runs, with level
+        -1 meaning raw samples [first, last).
+        """
+        pieces = []
+        while a < b:
+            for lvl in range(level, -1, -1):
+                size = self.block_size(lvl)
+                block = a // size
+                stored = self.levels[lvl]
+                if a % size == 0 and a + size <= b and stored.start <= block < stored.end:
+                    last = min(b // size, stored.end) if lvl == level else block + 1
+                    pieces.append((lvl, block, last))
+                    a = last * size
+                    break
+            else:
+                stop = min(b, (a // self.base_block + 1) * self.base_block)
+                if stop > self.levels[0].end * self.base_block:
+                    stop = b  # newest samples are not summarised yet
+                pieces.append((-1, a, stop))
+                a = stop
+        return pieces
+
+    def envelope(self, times, values, channel, lo, hi, columns, offset=0):
+        """Return (x, y) for plotting rows lo..hi of `values[:, channel]`.
+
+        `columns` is the plot width in pixels. Small ranges come back as
+        plain views; larger ones as a min/max envelope of at most about
+        2 * columns points.
+        """
+        count = hi - lo
+        if count <= 2 * columns:
+            return times[lo:hi], values[lo:hi, channel]
+        level = 0
+        while (level + 1 < len(self.levels)
+               and count / self.block_size(level) > columns):
+            level += 1
+        index_parts = []
+        value_parts = []
+        for lvl, first, last in self._pieces(lo + offset, hi + offset, level):
+            if lvl < 0:
+                index_parts.append(np.arange(first, last))
+                value_parts.append(values[first - offset:last - offset, channel])
+                continue
+            stored = self.levels[lvl]
+            rows = slice(first - stored.start, last - stored.start)
+            imin = stored.imin[rows, channel]
+            imax = stored.imax[rows, channel]
+            vmin = stored.vmin[rows, channel]
+            vmax = stored.vmax[rows, channel]
+            # Emit each block's min and max in the order they occurred
+            min_first = imin <= imax
+            index_parts.append(np.column_stack((np.where(min_first, imin, imax),
+                                                np.where(min_first, imax, imin))).ravel())
+            value_parts.append(np.column_stack((np.where(min_first, vmin, vmax),
+                                                np.where(min_first, vmax, vmin))).ravel())
+        index = np.concatenate(index_parts) - offset
+        return times[index], np.concatenate(value_parts)
@@ -0,0 +1,65 @@
+import time
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+from perf_metrics import Histogram
+
+
+class RenderScheduler(QObject):
+    """Redraw the UI at a fixed frame rate instead of once per sample.
+
+    Data producers call ``request_frame()``; every sample that arrives
+    between two timer ticks is shown by a single call to ``render``. If a
+    frame takes longer than its budget (1 / fps), the next ticks are skipped
+    so the event loop gets that time back, and each skipped tick is counted
+    in ``dropped_frames``.
+    """
+
+    # Emits the total number of dropped frames so far
+    frames_dropped = pyqtSignal(int)
+
+    def __init__(self, render, fps=30, parent=None):
+        super().__init__(parent)
+        self.render = render
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+        self.frames = 0
+        self.dropped_frames = 0
+        self.last_frame_time = 0.0
+        self.frame_times = Histogram()
+        self._pending = False
+        self._skip = 0
+        self.set_fps(fps)
+
+    def set_fps(self, fps):
+        """Change the target redraw rate."""
+        self.fps = fps
+        self.frame_budget = 1.0 / fps
+        self.timer.setInterval(max(1, int(round(1000.0 / fps))))
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def request_frame(self):
+        """Mark the view as stale; it is redrawn on the next tick."""
+        self._pending = True
+
+    def _tick(self):
+        if not self._pending:
+            return
+        if self._skip:
+            self._skip -= 1
+            self.dropped_frames += 1
+            self.frames_dropped.emit(self.dropped_frames)
+            return
+        self._pending = False
+        start = time.perf_counter()
+        self.render()
+        self.last_frame_time = time.perf_counter() - start
+        self.frame_times.observe(self.last_frame_time)
+        self.frames += 1
+        if self.last_frame_time > self.frame_budget:
+            # Give back the overrun before drawing again
+            self._skip = int(self.last_frame_time // self.frame_budget)
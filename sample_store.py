@@ -0,0 +1,120 @@
+import threading
+import numpy as np
+
+
+class SampleStore(object):
+    """Live sample store backed by preallocated NumPy arrays.
+
+    Timestamps are kept as float64 and channel values as an
+    (N, num_sensors) array. The arrays double in size when they fill up, so
+    appends are amortised O(1). Readers get zero-copy views; appends never
+    write into the part of the arrays a view already covers.
+
+    If ``max_samples`` is set memory stays bounded for long recordings: the
+    store always keeps at least the most recent ``max_samples`` rows and
+    never more than twice that. Old rows are discarded in one block copy
+    into a fresh array, which keeps views handed out earlier valid.
+    """
+
+    def __init__(self, num_sensors, capacity=4096, max_samples=None):
+        self.num_sensors = num_sensors
+        self.max_samples = max_samples
+        if max_samples is not None:
+            capacity = 2 * max_samples
+        self._times = np.empty(capacity, dtype=np.float64)
+        self._values = np.empty((capacity, num_sensors), dtype=np.float64)
+        self._size = 0
+        self.discarded = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._times)
+
+    def _reserve(self, extra):
+        # Make room for `extra` more rows; caller holds the lock
+        needed = self._size + extra
+        if needed <= self.capacity:
+            return
+        if self.max_samples is not None:
+            keep = min(self._size, max(self.max_samples - extra, 0))
+            capacity = max(self.capacity, 2 * max(self.max_samples, extra))
+            self.discarded += self._size - keep
+            start = self._size - keep
+        else:
+            keep = self._size
+            capacity = self.capacity
+            while capacity < needed:
+                capacity *= 2
+            start = 0
+        times = np.empty(capacity, dtype=np.float64)
+        values = np.empty((capacity, self.num_sensors), dtype=np.float64)
+        times[:keep] = self._times[start:self._size]
+        values[:keep] = self._values[start:self._size]
+        self._times, self._values, self._size = times, values, keep
+
+    def append(self, elapsed, values):
+        """Append one sample; missing channels are stored as 0.0."""
+        with self._lock:
+            self._reserve(1)
+            row = self._values[self._size]
+            n = min(len(values), self.num_sensors)
+            row[:n] = values[:n]
+            row[n:] = 0.0
+            self._times[self._size] = elapsed
+            self._size += 1
+
+    def extend(self, times, values):
+        """Append a block of samples: times (n,) and values (n, num_sensors)."""
+        times = np.asarray(times, dtype=np.float64)
+        if not len(times):
+            return
+        values = np.asarray(values, dtype=np.float64).reshape(len(times), -1)
+        cols = min(values.shape[1], self.num_sensors)
+        with self._lock:
+            if self.max_samples is not None and len(times) > self.max_samples:
+                self.discarded += len(times) - self.max_samples
+                times = times[-self.max_samples:]
+                values = values[-self.max_samples:]
+            n = len(times)
+            self._reserve(n)
+            end = self._size + n
+            self._times[self._size:end] = times
+            self._values[self._size:end, :cols] = values[:, :cols]
+            self._values[self._size:end, cols:] = 0.0
+            self._size = end
+
+    def clear(self):
+        """Drop all samples (views handed out earlier stay valid)."""
+        with self._lock:
+            self._times = np.empty(self.capacity, dtype=np.float64)
+            self._values = np.empty((self.capacity, self.num_sensors), dtype=np.float64)
+            self._size = 0
+
+    def data(self):
+        """Return (times, values) views of every stored sample."""
+        with self._lock:
+            return self._times[:self._size], self._values[:self._size]
+
+    def snapshot(self):
+        """Return (times, values, discarded): views plus the number of rows dropped before them."""
+        with self._lock:
+            return self._times[:self._size], self._values[:self._size], self.discarded
+
+    def last_time(self):
+        """Timestamp of the newest sample, or None if the store is empty."""
+        with self._lock:
+            return self._times[self._size - 1] if self._size else None
+
+    def window(self, t_start=None, t_end=None):
+        """Return (times, values) views of samples with t_start <= t <= t_end.
+
+        Timestamps must be non-decreasing for the binary search to be exact.
+        """
+        times, values = self.data()
+        lo = 0 if t_start is None else np.searchsorted(times, t_start, side='left')
+        hi = len(times) if t_end is None else np.searchsorted(times, t_end, side='right')
+        return times[lo:hi], values[lo:hi]
@@ -0,0 +1,228 @@
+"""Compact binary session format (.skemg) and CSV converters.
+
+Layout: a fixed-size header followed by packed little-endian records.
+
+    bytes 0-7    magic b'SKEMGBIN'
+    bytes 8-11   format version (uint32)
+    bytes 12-15  header size in bytes (uint32), records start here
+    bytes 16-    UTF-8 JSON metadata padded with spaces to the header size:
+                 {"channels": [...], "muscle_group": "...",
+                  "sample_rate": 0.0, "value_dtype": "<f4"}
+
+Each record is a float64 timestamp followed by one value per channel
+(float32 or float64). A torn final record is ignored on read.
+
+Convert from the command line:
+
+    python session_binary.py to-binary TestSubject_A00.csv TestSubject_A00.skemg
+    python session_binary.py to-csv TestSubject_A00.skemg TestSubject_A00.csv
+"""
+import io
+import os
+import csv
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+from buffered_csv_writer import BufferedCsvWriter
+
+MAGIC = b'SKEMGBIN'
+VERSION = 1
+HEADER_SIZE = 1024
+BINARY_EXTENSION = '.skemg'
+_PREFIX = struct.Struct('<8sII')
+
+# Rows converted per step, so files of any size convert in bounded memory
+CHUNK_ROWS = 65536
+
+MUSCLE_GROUP_LABELS = {
+    "Quad": ["RVL", "RVM", "LVM", "LVL"],
+    "Hamstring": ["RBF", "RST", "LST", "LBF"],
+}
+
+
+def is_binary_session(path):
+    """True if the path names a binary session file."""
+    return path.lower().endswith(BINARY_EXTENSION)
+
+
+def record_dtype(num_channels, value_dtype='<f4'):
+    """NumPy dtype of one packed record."""
+    return np.dtype([('t', '<f8'), ('v', value_dtype, (num_channels,))])
+
+
+def create_session(path, channels, muscle_group=None, sample_rate=0.0, value_dtype='<f4'):
+    """Write the header of a new, empty binary session."""
+    meta = {
+        "channels": list(channels),
+        "muscle_group": muscle_group,
+        "sample_rate": float(sample_rate),
+        "value_dtype": np.dtype(value_dtype).str,
+    }
+    body = json.dumps(meta).encode('utf-8')
+    size = HEADER_SIZE
+    while _PREFIX.size + len(body) > size:
+        size *= 2
+    with open(path, 'wb') as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, size))
+        f.write(body.ljust(size - _PREFIX.size, b' '))
+    return meta
+
+
+def read_header(path):
+    """Return (metadata dict, header size) of a binary session."""
+    with open(path, 'rb') as f:
+        magic, version, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary session file")
+        if version > VERSION:
+            raise ValueError(f"{path} uses unsupported format version {version}")
+        meta = json.loads(f.read(size - _PREFIX.size).decode('utf-8'))
+    return meta, size
+
+
+def open_session(path):
+    """Memory-map a binary session.
+
+    Returns (metadata, times, values): times is a float64 view and values an
+    (n, channels) view straight onto the file, nothing is read up front.
+    """
+    meta, offset = read_header(path)
+    dtype = record_dtype(len(meta["channels"]), meta["value_dtype"])
+    count = (os.path.getsize(path) - offset) // dtype.itemsize
+    if count == 0:
+        return meta, np.empty(0), np.empty((0, len(meta["channels"])), dtype=meta["value_dtype"])
+    records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    return meta, records['t'], records['v']
+
+
+def pack_records(rows, num_channels, value_dtype='<f4'):
+    """Pack (n, 1 + channels) rows (timestamp first) into record bytes."""
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, num_channels + 1)
+    records = np.empty(len(rows), dtype=record_dtype(num_channels, value_dtype))
+    records['t'] = rows[:, 0]
+    records['v'] = rows[:, 1:]
+    return records.tobytes()
+
+
+class BufferedBinaryWriter(BufferedCsvWriter):
+    """BufferedCsvWriter that appends packed records to a binary session.
+
+    The session header must already exist (see ``create_session``); a torn
+    final record left by a crash is cut off before appending.
+    """
+
+    def _open(self):
+        meta, offset = read_header(self.path)
+        self.num_channels = len(meta["channels"])
+        self.value_dtype = meta["value_dtype"]
+        record_size = record_dtype(self.num_channels, self.value_dtype).itemsize
+        f = open(self.path, 'r+b')
+        size = os.path.getsize(self.path)
+        f.truncate(offset + (size - offset) // record_size * record_size)
+        f.seek(0, os.SEEK_END)
+        return f
+
+    def _new_buffer(self):
+        return io.BytesIO()
+
+    def _format_rows(self, rows):
+        self._buffer.write(pack_records(rows, self.num_channels, self.value_dtype))
+
+    def _row_offsets(self, start):
+        # Rows are found by position
+        return None
+
+
+def _channel_label(header):
+    # "Muscle1 - RVL" -> "RVL"; legacy headers ("Sensor 1") are kept as-is
+    return header.split(' - ', 1)[1].strip() if ' - ' in header else header.strip()
+
+
+def _guess_muscle_group(labels):
+    for group, group_labels in MUSCLE_GROUP_LABELS.items():
+        if labels == group_labels[:len(labels)]:
+            return group
+    return None
+
+
+def _csv_chunks(reader, num_channels):
+    """Yield (n, 1 + channels) float arrays; blank or missing cells become 0.0."""
+    rows = []
+    for row in reader:
+        if not row:
+            continue
+        row_data = [float(value) if value else 0.0 for value in row[:num_channels + 1]]
+        row_data.extend([0.0] * (num_channels + 1 - len(row_data)))
+        rows.append(row_data)
+        if len(rows) == CHUNK_ROWS:
+            yield np.array(rows)
+            rows = []
+    if rows:
+        yield np.array(rows)
+
+
+def csv_to_binary(csv_path, bin_path, muscle_group=None, sample_rate=0.0, value_dtype='<f4'):
+    """Convert a session CSV to the binary format, streaming in chunks.
+
+    Accepts the app's layout (Timestamp, Muscle1 - RVL, ...) as well as the
+    legacy 4sensor_readings.csv (Time (s), Sensor 1, ...) and
+    arduino_data.csv (Seconds Elapsed, Sensor Value) layouts: the first
+    column is time, every other column a channel. Returns the row count.
+    """
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        labels = [_channel_label(h) for h in header[1:]]
+        if muscle_group is None:
+            muscle_group = _guess_muscle_group(labels)
+        create_session(bin_path, labels, muscle_group, sample_rate, value_dtype)
+        count = 0
+        with open(bin_path, 'ab') as out:
+            for chunk in _csv_chunks(reader, len(labels)):
+                out.write(pack_records(chunk, len(labels), value_dtype))
+                count += len(chunk)
+    return count
+
+
+def binary_to_csv(bin_path, csv_path):
+    """Convert a binary session back to the app's CSV layout. Returns the row count."""
+    meta, times, values = open_session(bin_path)
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['Timestamp'] +
+            [f"Muscle{i + 1} - {label}" for i, label in enumerate(meta["channels"])]
+        )
+        for start in range(0, len(times), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            block = np.column_stack((times[start:stop], values[start:stop].astype(np.float64)))
+            writer.writerows(block.tolist())
+    return len(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert StabiliKnee sessions between CSV and binary.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    to_bin = sub.add_parser('to-binary', help='CSV -> .skemg')
+    to_bin.add_argument('src')
+    to_bin.add_argument('dst')
+    to_bin.add_argument('--muscle-group', choices=sorted(MUSCLE_GROUP_LABELS))
+    to_bin.add_argument('--sample-rate', type=float, default=0.0)
+    to_bin.add_argument('--float64', action='store_true', help='store values as float64')
+    to_csv = sub.add_parser('to-csv', help='.skemg -> CSV')
+    to_csv.add_argument('src')
+    to_csv.add_argument('dst')
+    args = parser.parse_args(argv)
+
+    if args.command == 'to-binary':
+        count = csv_to_binary(args.src, args.dst, args.muscle_group, args.sample_rate,
+                              '<f8' if args.float64 else '<f4')
+    else:
+        count = binary_to_csv(args.src, args.dst)
+    print(f"Wrote {count} rows to {args.dst}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Background loading and an LRU cache of decoded sessions.
+
+A session is loaded once into memory on a thread pool, with its min/max
+plot pyramid, and kept until the cache exceeds ``max_bytes``; the least
+recently used sessions are dropped first. Views opened on the same
+sessions share one cache (``shared_cache``). Qt is not needed.
+
+    cache = shared_cache()
+    future = cache.load("TestSubject_A00.csv")   # starts loading in the background
+    session = cache.get("TestSubject_A00.csv")   # None until it has loaded
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from plot_decimation import MinMaxPyramid
+from session_loader import load_session, session_channels, session_size, session_muscle_group
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class LoadedSession(object):
+    """One session's samples in memory, with a MinMaxPyramid for plotting them."""
+
+    def __init__(self, path, labels, muscle_group, times, values):
+        self.path = path
+        self.labels = labels
+        self.muscle_group = muscle_group
+        self.times = times
+        self.values = values
+        self.pyramid = MinMaxPyramid(len(labels))
+        self.pyramid.update(values)
+
+    @property
+    def num_channels(self):
+        return len(self.labels)
+
+    @property
+    def duration(self):
+        return float(self.times[-1] - self.times[0]) if len(self.times) else 0.0
+
+    @property
+    def nbytes(self):
+        """Memory held by the samples and the pyramid."""
+        size = self.times.nbytes + self.values.nbytes
+        for level in self.pyramid.levels:
+            size += level.vmin.nbytes + level.vmax.nbytes + level.imin.nbytes + level.imax.nbytes
+        return size
+
+
+def load_decoded(path):
+    """Read a session of any format into a LoadedSession."""
+    labels = session_channels(path)
+    times, values = load_session(path, len(labels))
+    # Copied out of memory-mapped files, so the cache owns its memory
+    return LoadedSession(path, labels, session_muscle_group(path),
+                         np.array(times, dtype=np.float64), np.array(values))
+
+
+class SessionCache(object):
+    """Memory-capped LRU cache of LoadedSessions, filled by a thread pool.
+
+    A session that has grown or been rewritten since it was cached is
+    loaded again. The session being added is never evicted, even if it
+    alone exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, workers=None):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # key -> LoadedSession, least recently used first
+        self._entries = OrderedDict()
+        # key -> Future of a load in progress
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers or min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="SessionCache")
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path), session_size(path), os.path.getmtime(path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, path):
+        """The cached session, or None if it is not loaded (see load)."""
+        key = self._key(path)
+        with self._lock:
+            session = self._entries.get(key)
+            if session is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return session
+
+    def load(self, path):
+        """Future of the LoadedSession; loads it on the pool unless cached or already loading."""
+        key = self._key(path)
+        with self._lock:
+            session = self._entries.get(key)
+            if session is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(session)
+                return future
+            future = self._pending.get(key)
+            if future is None:
+                self.misses += 1
+                future = self._pool.submit(self._load, key, path)
+                self._pending[key] = future
+        return future
+
+    def _load(self, key, path):
+        try:
+            session = load_decoded(path)
+        except Exception:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        with self._lock:
+            self._pending.pop(key, None)
+            # An older copy of the same file is stale now
+            for old in [k for k in self._entries if k[0] == key[0]]:
+                self.nbytes -= self._entries.pop(old).nbytes
+            self._entries[key] = session
+            self.nbytes += session.nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return session
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def close(self):
+        """Stop the pool; loads not yet started are cancelled."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_shared = None
+
+
+def shared_cache(max_bytes=None):
+    """The process-wide cache; `max_bytes`, if given, sets its cap."""
+    global _shared
+    if _shared is None:
+        _shared = SessionCache(max_bytes or DEFAULT_MAX_BYTES)
+    elif max_bytes is not None:
+        _shared.max_bytes = max_bytes
+    return _shared
@@ -0,0 +1,237 @@
+"""Columnar session files for downstream analysis: Parquet and HDF5.
+
+Parquet (.parquet): a float64 ``time`` column and one column per channel,
+named by its label (RVL, RVM, ...). The file's key/value metadata holds
+``channels`` (JSON list), ``muscle_group`` and ``value_dtype``.
+
+HDF5 (.h5, .hdf5): a ``time`` dataset (n,) and an ``emg`` dataset
+(n, channels), chunked and resizable. The root attributes hold
+``channels``, ``muscle_group`` and ``value_dtype``.
+
+pyarrow and h5py are optional; each is only needed for its own format.
+
+Neither is recorded to directly: a Parquet file is unreadable until its
+footer is written and an HDF5 file can be left damaged by a crash. A
+recording ``main.py --format parquet`` asks for goes to a chunked session
+(session_store), which is converted when recording stops (session_export).
+"""
+import json
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+PARQUET_EXTENSION = '.parquet'
+HDF5_EXTENSION = '.h5'
+_HDF5_EXTENSIONS = (HDF5_EXTENSION, '.hdf5')
+# Rows per HDF5 chunk, and per block when reading HDF5 in bounded memory
+HDF5_CHUNK_ROWS = 16384
+
+
+def is_parquet_session(path):
+    """True if the path names a Parquet session file."""
+    return path.lower().endswith(PARQUET_EXTENSION)
+
+
+def is_hdf5_session(path):
+    """True if the path names an HDF5 session file."""
+    return path.lower().endswith(_HDF5_EXTENSIONS)
+
+
+def is_columnar_session(path):
+    return is_parquet_session(path) or is_hdf5_session(path)
+
+
+def require_backend(path):
+    """Raise ImportError naming the package a Parquet/HDF5 path needs, if missing."""
+    if is_parquet_session(path) and pq is None:
+        raise ImportError(f"Parquet sessions need pyarrow (pip install pyarrow): {path}")
+    if is_hdf5_session(path) and h5py is None:
+        raise ImportError(f"HDF5 sessions need h5py (pip install h5py): {path}")
+
+
+def _column_names(labels):
+    # Labels are unique in sessions the app records; numbered if not
+    names = ['time']
+    for i, label in enumerate(labels):
+        names.append(label if label not in names else f"{label} ({i + 1})")
+    return names
+
+
+def _parquet_schema(channels, muscle_group, value_dtype):
+    value_type = pa.from_numpy_dtype(np.dtype(value_dtype))
+    fields = [pa.field(name, pa.float64() if i == 0 else value_type)
+              for i, name in enumerate(_column_names(channels))]
+    metadata = {
+        "channels": json.dumps(list(channels)),
+        "muscle_group": muscle_group or "",
+        "value_dtype": np.dtype(value_dtype).str,
+    }
+    return pa.schema(fields, metadata=metadata)
+
+
+def create_columnar(path, channels, muscle_group=None, value_dtype='<f4'):
+    """Create an empty Parquet or HDF5 session."""
+    require_backend(path)
+    value_dtype = np.dtype(value_dtype)
+    if is_parquet_session(path):
+        pq.ParquetWriter(path, _parquet_schema(channels, muscle_group, value_dtype)).close()
+    else:
+        with h5py.File(path, 'w') as f:
+            f.create_dataset('time', shape=(0,), maxshape=(None,), dtype='<f8',
+                             chunks=(HDF5_CHUNK_ROWS,))
+            f.create_dataset('emg', shape=(0, len(channels)), maxshape=(None, len(channels)),
+                             dtype=value_dtype, chunks=(HDF5_CHUNK_ROWS, max(len(channels), 1)))
+            f.attrs['channels'] = json.dumps(list(channels))
+            f.attrs['muscle_group'] = muscle_group or ""
+            f.attrs['value_dtype'] = value_dtype.str
+    return {"channels": list(channels), "muscle_group": muscle_group, "value_dtype": value_dtype.str}
+
+
+def _decode(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+def read_columnar_meta(path):
+    """Metadata (channels, muscle_group, value_dtype) of a Parquet or HDF5 session.
+
+    Files written by other tools without it get their column names and types.
+    """
+    require_backend(path)
+    if is_parquet_session(path):
+        schema = pq.read_schema(path)
+        attrs = {_decode(k): _decode(v) for k, v in (schema.metadata or {}).items()}
+        default_channels = schema.names[1:]
+        default_dtype = schema.field(1).type.to_pandas_dtype() if len(schema) > 1 else '<f4'
+    else:
+        with h5py.File(path, 'r') as f:
+            attrs = {k: _decode(v) for k, v in f.attrs.items()}
+            default_channels = [f"Sensor {i + 1}" for i in range(f['emg'].shape[1])]
+            default_dtype = f['emg'].dtype
+    channels = json.loads(attrs["channels"]) if "channels" in attrs else list(default_channels)
+    return {
+        "channels": channels,
+        "muscle_group": attrs.get("muscle_group") or None,
+        "value_dtype": attrs.get("value_dtype", np.dtype(default_dtype).str),
+    }
+
+
+def _table_arrays(table, value_dtype):
+    # Columns of a Parquet table -> (times, (n, channels) values)
+    times = table.column(0).to_numpy().astype(np.float64, copy=False)
+    values = np.empty((table.num_rows, table.num_columns - 1), dtype=value_dtype)
+    for i in range(1, table.num_columns):
+        values[:, i - 1] = table.column(i).to_numpy()
+    return times, values
+
+
+def columnar_rows(path):
+    """Row count of a Parquet or HDF5 session, read from its metadata."""
+    require_backend(path)
+    if is_parquet_session(path):
+        return pq.ParquetFile(path).metadata.num_rows
+    with h5py.File(path, 'r') as f:
+        return min(len(f['time']), len(f['emg']))
+
+
+def iter_columnar(path, start=0, stop=None):
+    """Yield (times, values) of rows start .. stop - 1 a block at a time.
+
+    Parquet files are read one row group at a time and only the groups
+    holding those rows are read; HDF5 in blocks of ``HDF5_CHUNK_ROWS``.
+    """
+    require_backend(path)
+    value_dtype = read_columnar_meta(path)["value_dtype"]
+    if is_parquet_session(path):
+        parquet = pq.ParquetFile(path)
+        offset = 0
+        for group in range(parquet.metadata.num_row_groups):
+            rows = parquet.metadata.row_group(group).num_rows
+            if stop is not None and offset >= stop:
+                break
+            if offset + rows > start:
+                times, values = _table_arrays(parquet.read_row_group(group), value_dtype)
+                begin = max(start - offset, 0)
+                end = rows if stop is None else min(stop - offset, rows)
+                yield times[begin:end], values[begin:end]
+            offset += rows
+        return
+    with h5py.File(path, 'r') as f:
+        count = min(len(f['time']), len(f['emg']))
+        stop = count if stop is None else min(stop, count)
+        for begin in range(start, stop, HDF5_CHUNK_ROWS):
+            end = min(begin + HDF5_CHUNK_ROWS, stop)
+            yield f['time'][begin:end], f['emg'][begin:end]
+
+
+def read_columnar(path, start=0, stop=None):
+    """Return (times, values) of rows start .. stop - 1 of a Parquet or HDF5 session."""
+    num_channels = len(read_columnar_meta(path)["channels"])
+    blocks = list(iter_columnar(path, start, stop))
+    if not blocks:
+        return np.empty(0), np.empty((0, num_channels), dtype=np.float32)
+    return (np.concatenate([t for t, _ in blocks]),
+            np.concatenate([v for _, v in blocks]))
+
+
+class ColumnarWriter(object):
+    """Write (times, values) blocks to a Parquet or HDF5 session made by create_columnar.
+
+    Every ``write`` adds one row group (Parquet) or extends the datasets
+    (HDF5). A Parquet file is only readable once ``close`` has written its
+    footer, so write to a temporary name and rename it when done.
+    """
+
+    def __init__(self, path):
+        require_backend(path)
+        self.path = path
+        self.meta = read_columnar_meta(path)
+        self.num_channels = len(self.meta["channels"])
+        self.value_dtype = np.dtype(self.meta["value_dtype"])
+        self.rows = 0
+        self.closed = False
+        if is_parquet_session(path):
+            self._h5 = None
+            # Rewritten from the start with the schema create_columnar stored
+            self._schema = pq.read_schema(path)
+            self._parquet = pq.ParquetWriter(path, self._schema)
+        else:
+            self._parquet = None
+            self._h5 = h5py.File(path, 'a')
+            self.rows = min(len(self._h5['time']), len(self._h5['emg']))
+
+    def write(self, times, values):
+        count = len(times)
+        if not count:
+            return
+        values = np.asarray(values).astype(self.value_dtype, copy=False)
+        if self._parquet is not None:
+            columns = [pa.array(np.asarray(times, dtype=np.float64))]
+            columns += [pa.array(values[:, i]) for i in range(self.num_channels)]
+            self._parquet.write_table(pa.Table.from_arrays(columns, schema=self._schema))
+        else:
+            end = self.rows + count
+            self._h5['time'].resize((end,))
+            self._h5['emg'].resize((end, self.num_channels))
+            self._h5['time'][self.rows:end] = times
+            self._h5['emg'][self.rows:end] = values
+            self._h5.flush()
+        self.rows += count
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._parquet is None:
+            self._h5.close()
+        else:
+            self._parquet.close()
+
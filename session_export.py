@@ -0,0 +1,105 @@
+"""Export sessions to Parquet or HDF5 for downstream analysis.
+
+Any session the app can load (CSV, .skemg, .skchunks, Parquet, HDF5) is
+streamed through in blocks (see session_loader.iter_session), so a
+recording of any size converts in bounded memory. The columnar layouts
+and the metadata kept with them (channels, muscle group) are described
+in session_columnar. Qt is not needed; the GUI runs the same export from
+its "Export session..." button.
+
+    python session_export.py TestSubject_A00.csv
+    python session_export.py recordings/ --format hdf5 -o exports/
+"""
+import os
+import sys
+import argparse
+from batch_analysis import find_sessions
+from session_binary import CHUNK_ROWS, MUSCLE_GROUP_LABELS
+from session_columnar import PARQUET_EXTENSION, HDF5_EXTENSION, create_columnar, ColumnarWriter, require_backend
+from session_loader import iter_session, session_channels, session_muscle_group
+
+color_red = "\u001b[31m"
+color_magenta = "\u001b[35m"
+color_reset = "\u001b[0m"
+
+EXPORT_FORMATS = {"parquet": PARQUET_EXTENSION, "hdf5": HDF5_EXTENSION}
+
+
+def export_path(path, fmt, output_dir=None):
+    """Where `path` is exported to in format `fmt`: same name, next to it unless output_dir is given."""
+    path = path.rstrip('/\\')
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir or os.path.dirname(path), stem + EXPORT_FORMATS[fmt])
+
+
+def export_session(src, dst, muscle_group=None, value_dtype='<f4', block_rows=CHUNK_ROWS, progress=None):
+    """Stream session `src` into a new Parquet or HDF5 file `dst`; return the row count.
+
+    The format follows dst's extension. The muscle group defaults to the
+    one stored with (or guessed from) the session. Rows are written a
+    block at a time to a hidden file next to dst, which replaces dst once
+    complete; ``progress(rows)`` is called after every block.
+    """
+    require_backend(dst)
+    channels = session_channels(src)
+    if muscle_group is None:
+        muscle_group = session_muscle_group(src)
+    folder, name = os.path.split(dst)
+    tmp = os.path.join(folder, '.' + name)
+    create_columnar(tmp, channels, muscle_group, value_dtype)
+    try:
+        writer = ColumnarWriter(tmp)
+        try:
+            for times, values in iter_session(src, len(channels), block_rows):
+                writer.write(times, values)
+                if progress is not None:
+                    progress(writer.rows)
+        finally:
+            writer.close()
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return writer.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export StabiliKnee sessions to Parquet or HDF5.")
+    parser.add_argument('sessions', nargs='+', help='session files, glob patterns or directories')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='parquet')
+    parser.add_argument('-o', '--output-dir', default=None, help='default: next to each session')
+    parser.add_argument('--muscle-group', choices=sorted(MUSCLE_GROUP_LABELS),
+                        help='stored with the export (default: from the session)')
+    parser.add_argument('--float64', action='store_true', help='store values as float64')
+    args = parser.parse_args(argv)
+
+    paths = find_sessions(args.sessions)
+    if not paths:
+        print(f"{color_magenta}No session files found{color_reset}")
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    failed = 0
+    written = {}
+    for path in paths:
+        dst = export_path(path, args.format, args.output_dir)
+        if os.path.abspath(dst) == os.path.abspath(path):
+            continue  # Already in that format
+        if dst in written:
+            # The same session recorded in two formats
+            print(f"{color_magenta}Skipped {color_red}{path}{color_magenta}: {dst} was written from {written[dst]}{color_reset}")
+            continue
+        written[dst] = path
+        try:
+            count = export_session(path, dst, args.muscle_group, '<f8' if args.float64 else '<f4')
+        except Exception as e:
+            failed += 1
+            print(f"{color_magenta}Could not export {color_red}{path}{color_magenta}:{color_reset} {e}")
+            continue
+        print(f"Wrote {count} rows to {dst}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
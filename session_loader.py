@@ -0,0 +1,329 @@
+import os
+import re
+import csv
+import warnings
+import numpy as np
+from session_binary import CHUNK_ROWS, is_binary_session, open_session, read_header, _channel_label, _guess_muscle_group
+from session_store import is_chunked_session, open_store, read_meta, read_rows, store_size, iter_store
+from session_columnar import is_columnar_session, read_columnar_meta, read_columnar, iter_columnar, columnar_rows
+
+# Text parsed per step; keeps peak memory bounded on very large files
+CHUNK_BYTES = 16 * 1024 * 1024
+
+_BLANK_CELL = re.compile(r',(?=,|$)', re.MULTILINE)
+_BLANK_FIRST_CELL = re.compile(r'^,', re.MULTILINE)
+
+
+def _parse_row(row, width):
+    # One csv.reader row as `width` floats, or None for a blank or junk row
+    if not row:
+        return None
+    try:
+        row_data = [float(value) if value else 0.0 for value in row[:width]]
+    except ValueError:
+        return None
+    row_data.extend([0.0] * (width - len(row_data)))
+    return row_data
+
+
+def _parse_rows(lines, width):
+    """Slow path: parse rows one by one (ragged rows, torn last line, junk)."""
+    rows = [row for row in (_parse_row(row, width) for row in csv.reader(lines)) if row is not None]
+    return np.array(rows, dtype=np.float64).reshape(-1, width)
+
+
+def _parse_block(text, width):
+    """Parse a block of CSV text into a (n, width) float array.
+
+    Blank cells become 0.0 and short rows are padded with 0.0, matching the
+    ``float(value) if value else 0.0`` rule used when the app reads CSVs.
+    """
+    block = _parse_fast(text, width)
+    if block is None:
+        # Ragged or malformed rows somewhere in this block
+        return _parse_rows(text.splitlines(), width)
+    return block
+
+
+def _parse_fast(text, width):
+    # _parse_block without the slow path: None if any row needs it
+    try:
+        block = np.loadtxt(text.splitlines(), delimiter=',', dtype=np.float64, ndmin=2)
+    except ValueError:
+        try:
+            # Blank cells: fill them in and retry the fast parser
+            filled = _BLANK_FIRST_CELL.sub('0,', _BLANK_CELL.sub(',0', text))
+            block = np.loadtxt(filled.splitlines(), delimiter=',', dtype=np.float64, ndmin=2)
+        except ValueError:
+            return None
+    return _fit_width(block, width)
+
+
+def _fit_width(block, width):
+    # Pad missing channel columns with 0.0, drop extra ones
+    if block.shape[1] == width:
+        return block
+    fitted = np.zeros((len(block), width))
+    cols = min(block.shape[1], width)
+    fitted[:, :cols] = block[:, :cols]
+    return fitted
+
+
+def _csv_blocks(f, width):
+    """Yield (n, width) arrays parsed from the rest of an open CSV, CHUNK_BYTES of text at a time."""
+    tail = ''
+    while True:
+        text = f.read(CHUNK_BYTES)
+        if not text:
+            break
+        # Parse whole lines only; carry the partial last line over
+        text = tail + text
+        cut = text.rfind('\n') + 1
+        tail = text[cut:]
+        if cut:
+            yield _parse_block(text[:cut], width)
+    if tail.strip():
+        yield _parse_block(tail, width)
+
+
+def load_session_csv(path, num_sensors):
+    """Read a session CSV in one vectorized pass.
+
+    Returns (times, values): float64 timestamps rounded to 3 decimals and an
+    (n, num_sensors) array. The header row is skipped.
+    """
+    width = num_sensors + 1
+    with open(path) as f:
+        f.readline()  # Skip header
+        start = f.tell()
+        try:
+            # Well-formed files parse in one call to NumPy's C reader
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UserWarning)  # header-only file
+                data = np.loadtxt(f, delimiter=',', dtype=np.float64, ndmin=2)
+            data = _fit_width(data, width)
+            return np.round(data[:, 0], 3), data[:, 1:]
+        except ValueError:
+            f.seek(start)
+        blocks = list(_csv_blocks(f, width))
+    data = np.concatenate(blocks) if blocks else np.empty((0, width))
+    return np.round(data[:, 0], 3), data[:, 1:]
+
+
+def _parse_lines(data, start, width):
+    """Parse whole CSV lines (bytes beginning at file offset `start`).
+
+    Returns (times, values, offsets), offsets being each row's byte offset
+    in the file. Blank lines and rows that do not parse are skipped.
+    """
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10) + 1
+    if not len(ends) or ends[-1] != len(data):
+        ends = np.append(ends, len(data))
+    begins = np.concatenate(([0], ends[:-1]))
+    # Blank lines hold no row; only short lines can be blank
+    short = np.flatnonzero(ends - begins <= 2)
+    blank = [i for i in short if not data[begins[i]:ends[i]].strip()]
+    filled = np.delete(begins, blank)
+    block = _parse_fast(data.decode('utf-8', 'replace'), width)
+    if block is None or len(block) != len(filled):
+        # Junk rows were dropped: parse line by line to keep rows and offsets together
+        rows, kept = [], []
+        lines = (line.decode('utf-8', 'replace') for line in data.split(b'\n'))
+        for begin, row in zip(begins, csv.reader(lines)):
+            row = _parse_row(row, width)
+            if row is not None:
+                rows.append(row)
+                kept.append(begin)
+        block = np.array(rows, dtype=np.float64).reshape(-1, width)
+        filled = np.array(kept, dtype=np.int64)
+    return np.round(block[:, 0], 3), block[:, 1:], start + filled
+
+
+def csv_row_blocks(path, num_sensors, offset=None, chunk_bytes=CHUNK_BYTES):
+    """Yield (times, values, offsets) of the rows of a session CSV, `chunk_bytes` of text at a time.
+
+    Starts at byte `offset` (the start of a row) or after the header.
+    Offsets are the byte offset of each row in the file, so a row can be
+    found again without parsing what comes before it.
+    """
+    width = num_sensors + 1
+    with open(path, 'rb') as f:
+        if offset is None:
+            f.readline()  # Skip header
+        else:
+            f.seek(offset)
+        start = f.tell()
+        pending = b''
+        while True:
+            chunk = f.read(chunk_bytes)
+            data = pending + chunk
+            # Whole lines only, until the end of the file
+            cut = data.rfind(b'\n') + 1 if chunk else len(data)
+            if cut:
+                times, values, offsets = _parse_lines(data[:cut], start, width)
+                if len(times):
+                    yield times, values, offsets
+            if not chunk:
+                break
+            pending = data[cut:]
+            start += cut
+
+
+def read_csv_rows(path, num_sensors, start=0, stop=None, offset=None):
+    """Return (times, values) of rows start .. stop - 1 of a session CSV.
+
+    With `offset`, the byte offset of row `start`, parsing begins there and
+    ends once `stop` is reached; otherwise the file is parsed from the top,
+    keeping only the rows asked for.
+    """
+    row = start if offset is not None else 0
+    # A few hundred rows fit in one small read
+    chunk_bytes = 64 * 1024 if offset is not None and stop is not None else CHUNK_BYTES
+    times_parts, values_parts = [], []
+    for times, values, _ in csv_row_blocks(path, num_sensors, offset, chunk_bytes):
+        count = len(times)
+        if row + count > start:
+            begin = max(start - row, 0)
+            end = count if stop is None else min(stop - row, count)
+            times_parts.append(times[begin:end])
+            values_parts.append(values[begin:end])
+        row += count
+        if stop is not None and row >= stop:
+            break
+    if not times_parts:
+        return np.empty(0), np.empty((0, num_sensors))
+    return np.concatenate(times_parts), np.concatenate(values_parts)
+
+
+def load_session(path, num_sensors):
+    """Load a CSV, binary (.skemg), chunked (.skchunks), Parquet or HDF5 session as (times, values) arrays.
+
+    Binary sessions are memory-mapped, so the arrays are views onto the file.
+    """
+    if is_columnar_session(path):
+        times, values = read_columnar(path)
+        return times, values[:, :num_sensors]
+    if is_chunked_session(path):
+        meta, times, values = open_store(path)
+        return times, values[:, :num_sensors]
+    if is_binary_session(path):
+        meta, times, values = open_session(path)
+        return times, values[:, :num_sensors]
+    return load_session_csv(path, num_sensors)
+
+
+def session_channels(path):
+    """Channel labels of a session of any format, from its header."""
+    if is_columnar_session(path):
+        return list(read_columnar_meta(path)["channels"])
+    if is_chunked_session(path):
+        return list(read_meta(path)["channels"])
+    if is_binary_session(path):
+        meta, _ = read_header(path)
+        return list(meta["channels"])
+    with open(path, newline='') as f:
+        header = next(csv.reader(f), [])
+    return [_channel_label(h) for h in header[1:]]
+
+
+def session_muscle_group(path):
+    """Muscle group a session was recorded with; guessed from the labels of a CSV."""
+    if is_columnar_session(path):
+        group = read_columnar_meta(path)["muscle_group"]
+    elif is_chunked_session(path):
+        group = read_meta(path).get("muscle_group")
+    elif is_binary_session(path):
+        group = read_header(path)[0].get("muscle_group")
+    else:
+        group = None
+    return group or _guess_muscle_group(session_channels(path))
+
+
+def load_session_tail(path, num_sensors, rows=None, offset=None):
+    """Load the last `rows` rows of a session (all of them if rows is None).
+
+    Chunked and Parquet sessions read only the chunks or row groups holding
+    those rows; binary ones are memory-mapped. CSVs are parsed from byte
+    `offset` if given (a row start at or before the rows wanted, see
+    SummaryIndex.row_offset), otherwise in full.
+    """
+    if is_columnar_session(path):
+        start = 0 if rows is None else max(columnar_rows(path) - rows, 0)
+        times, values = read_columnar(path, start)
+        return times, values[:, :num_sensors]
+    if is_chunked_session(path):
+        meta, times, values = open_store(path, last_rows=rows)
+        return times, values[:, :num_sensors]
+    if offset is not None and not is_binary_session(path):
+        times, values = read_csv_rows(path, num_sensors, offset=offset)
+    else:
+        times, values = load_session(path, num_sensors)
+    if rows is None:
+        return times, values
+    first = max(len(times) - rows, 0)
+    return times[first:], values[first:]
+
+
+def session_size(path):
+    """Bytes of a session on disk; grows whenever rows are appended."""
+    if is_chunked_session(path):
+        return store_size(path)
+    return os.path.getsize(path)
+
+
+def session_reader(path, num_sensors):
+    """Return ``read(start, stop, offset=None)`` giving (times, values) of rows start .. stop - 1 of a session.
+
+    ``stop`` may be None for "to the end". ``offset`` is the byte offset of
+    row `start` in a CSV, which is then parsed from there only; without it
+    a CSV is parsed from the top. Other formats find rows by position.
+    """
+    if is_columnar_session(path):
+        def read(start, stop, offset=None):
+            times, values = read_columnar(path, start, stop)
+            return times, values[:, :num_sensors]
+        return read
+    if is_chunked_session(path):
+        def read(start, stop, offset=None):
+            times, values = read_rows(path, start, stop)
+            return times, values[:, :num_sensors]
+        return read
+    if is_binary_session(path):
+        def read(start, stop, offset=None):
+            meta, times, values = open_session(path)
+            return times[start:stop], values[start:stop, :num_sensors]
+        return read
+
+    def read(start, stop, offset=None):
+        return read_csv_rows(path, num_sensors, start, stop, offset)
+    return read
+
+
+def is_csv_session(path):
+    """True for sessions stored as CSV text (any format not recognised by extension)."""
+    return not (is_columnar_session(path) or is_chunked_session(path) or is_binary_session(path))
+
+
+def iter_session(path, num_sensors, block_rows=CHUNK_ROWS):
+    """Yield (times, values) of a session of any format in blocks, in bounded memory.
+
+    Blocks hold at most ``block_rows`` rows, except CSV blocks, which hold
+    ``CHUNK_BYTES`` of text. Times of CSVs are rounded as in load_session_csv.
+    """
+    if is_columnar_session(path):
+        blocks = iter_columnar(path)
+    elif is_chunked_session(path):
+        blocks = iter_store(path)
+    elif is_binary_session(path):
+        meta, times, values = open_session(path)
+        blocks = [(times, values)]
+    else:
+        with open(path) as f:
+            f.readline()  # Skip header
+            for block in _csv_blocks(f, num_sensors + 1):
+                yield np.round(block[:, 0], 3), block[:, 1:]
+        return
+    for times, values in blocks:
+        for start in range(0, len(times), block_rows):
+            stop = start + block_rows
+            yield times[start:stop], values[start:stop, :num_sensors]
@@ -0,0 +1,362 @@
+"""Crash-safe chunked session store: a directory whose name ends in .skchunks.
+
+    TestSubject_A00.skchunks/
+        meta.json           channels, muscle group, value dtype (written once)
+        index.json          one entry per finished chunk, replaced atomically
+        chunk_000000.rec    finished chunks: packed records as in .skemg files
+        chunk_000001.rec    (session_binary.record_dtype), never modified
+        active.part         the chunk being written
+
+Records are appended to ``active.part``. Once it reaches ``CHUNK_BYTES`` it
+is fsynced, renamed to the next chunk file and added to the index; the
+same happens when recording stops. Each index entry holds the chunk's
+row count, time range, per-channel max and trapezoidal integral, and its
+first and last values (to join integrals across chunks). Summaries and
+the session's end time therefore come from the index alone.
+
+A crash can leave ``active.part`` (possibly ending in a torn record) or a
+renamed chunk the index does not list yet. ``recover`` cuts the torn
+record off and indexes what is left, reading only those files.
+"""
+import io
+import os
+import json
+import numpy as np
+from buffered_csv_writer import BufferedCsvWriter
+from session_binary import record_dtype, pack_records
+
+CHUNKED_EXTENSION = '.skchunks'
+META_FILE = 'meta.json'
+INDEX_FILE = 'index.json'
+ACTIVE_FILE = 'active.part'
+# Finished chunks are about this large (~200k rows of 4 float32 channels)
+CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def is_chunked_session(path):
+    """True if the path names a chunked session directory."""
+    return path.rstrip('/\\').lower().endswith(CHUNKED_EXTENSION)
+
+
+def _chunk_name(number):
+    return f"chunk_{number:06d}.rec"
+
+
+def _chunk_number(name):
+    return int(name[len('chunk_'):-len('.rec')])
+
+
+def _fsync_dir(path):
+    # Makes renames durable on POSIX; directories cannot be opened on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_atomic(path, data):
+    """Replace `path` with `data` so readers see the old or new file, never a mix."""
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(os.path.dirname(path) or '.')
+
+
+class ChunkSummary(object):
+    """Row count, time range, per-channel max and integral of one chunk, built incrementally."""
+
+    def __init__(self, num_channels):
+        self.rows = 0
+        self.t_start = None
+        self.t_end = None
+        self.max = np.full(num_channels, -np.inf)
+        self.integral = np.zeros(num_channels)
+        self.first = None
+        self.last = None
+
+    def add(self, times, values):
+        if not len(times):
+            return
+        if self.last is None:
+            self.t_start = float(times[0])
+            self.first = values[0].copy()
+        else:
+            self.integral += (times[0] - self.t_end) * (values[0] + self.last) / 2.0
+        dt = np.diff(times)[:, None]
+        self.integral += (dt * (values[1:] + values[:-1]) / 2.0).sum(axis=0)
+        np.maximum(self.max, values.max(axis=0), out=self.max)
+        self.t_end = float(times[-1])
+        self.last = values[-1].copy()
+        self.rows += len(times)
+
+    def entry(self, name):
+        return {
+            "file": name,
+            "rows": self.rows,
+            "t_start": self.t_start,
+            "t_end": self.t_end,
+            "max": self.max.tolist(),
+            "integral": self.integral.tolist(),
+            "first": self.first.tolist(),
+            "last": self.last.tolist(),
+        }
+
+
+def create_store(path, channels, muscle_group=None, value_dtype='<f4'):
+    """Create an empty chunked session."""
+    os.makedirs(path, exist_ok=True)
+    meta = {
+        "channels": list(channels),
+        "muscle_group": muscle_group,
+        "value_dtype": np.dtype(value_dtype).str,
+    }
+    _write_atomic(os.path.join(path, META_FILE), meta)
+    _write_atomic(os.path.join(path, INDEX_FILE), {"chunks": []})
+    return meta
+
+
+def read_meta(path):
+    with open(os.path.join(path, META_FILE)) as f:
+        return json.load(f)
+
+
+def read_index(path):
+    """Index entries of the finished chunks, in order."""
+    try:
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            return json.load(f)["chunks"]
+    except FileNotFoundError:
+        return []
+
+
+def _read_records(path, dtype):
+    # Whole records only; a torn final record is ignored
+    count = os.path.getsize(path) // dtype.itemsize
+    if not count:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+
+def _summarize(path, name, dtype, num_channels):
+    records = _read_records(os.path.join(path, name), dtype)
+    summary = ChunkSummary(num_channels)
+    summary.add(np.asarray(records['t'], dtype=np.float64), np.asarray(records['v'], dtype=np.float64))
+    return summary.entry(name)
+
+
+def recover(path):
+    """Index whatever a crash left unindexed; return the index entries.
+
+    Cuts a torn final record off ``active.part`` and turns the rest into
+    a finished chunk. Only unindexed files are read.
+    """
+    meta = read_meta(path)
+    num_channels = len(meta["channels"])
+    dtype = record_dtype(num_channels, meta["value_dtype"])
+    indexed = read_index(path)
+    entries = [e for e in indexed if os.path.exists(os.path.join(path, e["file"]))]
+    changed = len(entries) != len(indexed)
+    known = {e["file"] for e in entries}
+    names = sorted(n for n in os.listdir(path) if n.startswith('chunk_') and n.endswith('.rec'))
+    for name in names:
+        if name not in known:
+            # Renamed, but the crash came before the index was updated
+            entries.append(_summarize(path, name, dtype, num_channels))
+            changed = True
+
+    active = os.path.join(path, ACTIVE_FILE)
+    if os.path.exists(active):
+        size = os.path.getsize(active)
+        whole = size - size % dtype.itemsize
+        if whole:
+            with open(active, 'r+b') as f:
+                f.truncate(whole)
+                os.fsync(f.fileno())
+            name = _chunk_name(_chunk_number(names[-1]) + 1 if names else 0)
+            os.replace(active, os.path.join(path, name))
+            entries.append(_summarize(path, name, dtype, num_channels))
+        else:
+            os.remove(active)
+        changed = True
+
+    entries.sort(key=lambda e: e["file"])
+    if changed:
+        _write_atomic(os.path.join(path, INDEX_FILE), {"chunks": entries})
+    return entries
+
+
+def summarize_entries(entries, num_channels):
+    """Whole-session summary (rows, t_start, t_end, max, integral, last) from index entries."""
+    summary = {"rows": 0, "t_start": None, "t_end": None, "max": np.full(num_channels, -np.inf),
+               "integral": np.zeros(num_channels), "last": None}
+    for entry in entries:
+        if summary["last"] is not None:
+            # The segment between the previous chunk's last row and this chunk's first
+            gap = entry["t_start"] - summary["t_end"]
+            summary["integral"] += gap * (np.array(entry["first"]) + summary["last"]) / 2.0
+        else:
+            summary["t_start"] = entry["t_start"]
+        summary["rows"] += entry["rows"]
+        summary["t_end"] = entry["t_end"]
+        np.maximum(summary["max"], entry["max"], out=summary["max"])
+        summary["integral"] += entry["integral"]
+        summary["last"] = np.array(entry["last"])
+    return summary
+
+
+def session_summary(path):
+    """Whole-session summary of a chunked session, from its index alone (see summarize_entries)."""
+    return summarize_entries(read_index(path), len(read_meta(path)["channels"]))
+
+
+def _record_files(path, entries):
+    # (file, rows or None if unknown) of every record file, in order: indexed
+    # chunks, chunks finished after the index was read or never indexed, active.part
+    indexed = {e["file"] for e in entries}
+    files = [(e["file"], e["rows"]) for e in entries]
+    files += [(n, None) for n in sorted(os.listdir(path))
+              if n.startswith('chunk_') and n.endswith('.rec') and n not in indexed]
+    if os.path.exists(os.path.join(path, ACTIVE_FILE)):
+        files.append((ACTIVE_FILE, None))
+    return files
+
+
+def open_store(path, last_rows=None):
+    """Return (metadata, times, values) of the records in the store, in order.
+
+    Finished chunks are memory-mapped and joined into one copy; the active
+    chunk of a session still recording is included up to its last whole
+    record. With ``last_rows`` only the indexed chunks needed to cover
+    that many of the most recent rows are read.
+    """
+    meta = read_meta(path)
+    num_channels = len(meta["channels"])
+    dtype = record_dtype(num_channels, meta["value_dtype"])
+    entries = read_index(path)
+    files = _record_files(path, entries)
+    if last_rows is not None:
+        rows = 0
+        first = len(entries)
+        while first > 0 and rows < last_rows:
+            first -= 1
+            rows += entries[first]["rows"]
+        files = files[first:]
+    parts = [_read_records(os.path.join(path, name), dtype) for name, _ in files]
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    if last_rows is not None:
+        records = records[-last_rows:] if last_rows else records[:0]
+    return meta, np.asarray(records['t']), np.asarray(records['v'])
+
+
+def read_rows(path, start, stop=None):
+    """Return (times, values) of rows start .. stop - 1 of the store.
+
+    Only the chunks holding those rows are read; the index's row counts
+    locate them.
+    """
+    meta = read_meta(path)
+    dtype = record_dtype(len(meta["channels"]), meta["value_dtype"])
+    parts = []
+    offset = 0
+    for name, rows in _record_files(path, read_index(path)):
+        if stop is not None and offset >= stop:
+            break
+        if rows is not None and offset + rows <= start:
+            offset += rows
+            continue
+        records = _read_records(os.path.join(path, name), dtype)
+        begin = max(start - offset, 0)
+        end = len(records) if stop is None else min(stop - offset, len(records))
+        if begin < end:
+            parts.append(records[begin:end])
+        offset += len(records)
+    records = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    return np.asarray(records['t']), np.asarray(records['v'])
+
+
+def iter_store(path):
+    """Yield (times, values) of each record file of the store in order, memory-mapped."""
+    meta = read_meta(path)
+    dtype = record_dtype(len(meta["channels"]), meta["value_dtype"])
+    for name, _ in _record_files(path, read_index(path)):
+        records = _read_records(os.path.join(path, name), dtype)
+        if len(records):
+            yield records['t'], records['v']
+
+
+def store_size(path):
+    """Bytes of record data in the store (finished chunks and active.part)."""
+    return sum(os.path.getsize(os.path.join(path, name)) for name, _ in _record_files(path, []))
+
+
+class ChunkedSessionWriter(BufferedCsvWriter):
+    """BufferedCsvWriter that appends to a chunked session store.
+
+    Opening runs ``recover``. Rows go to ``active.part``, which becomes a
+    finished, indexed chunk once it holds ``chunk_bytes`` and when the
+    writer closes.
+    """
+
+    def __init__(self, path, chunk_bytes=CHUNK_BYTES, **kwargs):
+        self.chunk_bytes = chunk_bytes
+        super().__init__(path, **kwargs)
+
+    def _open(self):
+        self.entries = recover(self.path)
+        meta = read_meta(self.path)
+        self.num_channels = len(meta["channels"])
+        self.value_dtype = meta["value_dtype"]
+        self._summary = ChunkSummary(self.num_channels)
+        self._next_chunk = _chunk_number(self.entries[-1]["file"]) + 1 if self.entries else 0
+        return open(os.path.join(self.path, ACTIVE_FILE), 'ab')
+
+    def _new_buffer(self):
+        return io.BytesIO()
+
+    def _format_rows(self, rows):
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.num_channels + 1)
+        self._buffer.write(pack_records(rows, self.num_channels, self.value_dtype))
+        # Summarize the values as stored, so the index matches the file exactly
+        values = rows[:, 1:].astype(self.value_dtype).astype(np.float64)
+        self._summary.add(rows[:, 0], values)
+
+    def _row_offsets(self, start):
+        # Rows are found by position
+        return None
+
+    def _write_block(self):
+        super()._write_block()
+        if self._file.tell() >= self.chunk_bytes:
+            self._finish_chunk()
+            self._file = open(os.path.join(self.path, ACTIVE_FILE), 'ab')
+
+    def _finish_chunk(self):
+        active = os.path.join(self.path, ACTIVE_FILE)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        if not self._summary.rows:
+            os.remove(active)
+            return
+        name = _chunk_name(self._next_chunk)
+        self._next_chunk += 1
+        os.replace(active, os.path.join(self.path, name))
+        self.entries.append(self._summary.entry(name))
+        _write_atomic(os.path.join(self.path, INDEX_FILE), {"chunks": self.entries})
+        self._summary = ChunkSummary(self.num_channels)
+
+    def _close_file(self):
+        if self._buffer.tell():
+            # A write failed: leave active.part for recover() to repair on the next open
+            self._file.close()
+        else:
+            self._finish_chunk()
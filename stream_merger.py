@@ -0,0 +1,122 @@
+import time
+import threading
+import numpy as np
+
+
+class StreamMerger(object):
+    """Merge sample batches from several devices into one multi-channel stream.
+
+    Every device's reader timestamps samples against the same clock start.
+    Batches arrive from the reader threads in any order, so samples are held
+    until every active device has reported past their timestamp (the
+    watermark) and are then released sorted by time. That keeps the merged
+    timestamps non-decreasing. Nothing is released until every device has
+    reported once (the readers first wait for their boards to reset), or
+    until ``startup_seconds`` have passed; after that, a device that has
+    sent nothing for ``hold_seconds`` stops holding the others back.
+
+    Each merged row carries the newest values of every device at that time
+    (sample-and-hold), so row i of the merged stream is a complete snapshot
+    of all channels. Merged rows go to the optional writer, store and
+    pipeline, the same sinks a single reader feeds, and then to
+    ``listener(rows)``. All of them are fed before the next release, so
+    they get blocks in time order whichever reader thread released them.
+    """
+
+    def __init__(self, channel_counts, writer=None, store=None, pipeline=None, hold_seconds=0.25,
+                 startup_seconds=5.0, listener=None):
+        self.channel_counts = list(channel_counts)
+        self.num_channels = sum(self.channel_counts)
+        self.offsets = np.cumsum([0] + self.channel_counts[:-1])
+        self.writer = writer
+        self.store = store
+        self.pipeline = pipeline
+        self.listener = listener
+        self.hold_seconds = hold_seconds
+        self.startup_seconds = startup_seconds
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        devices = len(self.channel_counts)
+        self._pending = [[] for _ in range(devices)]
+        self._latest = [None] * devices
+        # When each device last reported (None until its first batch)
+        self._heard = [None] * devices
+        self._held = np.zeros(self.num_channels)
+        self._last_time = None
+
+    def add(self, device, times, values):
+        """Add a batch from one device; return the merged (n, 1 + channels) rows now ready."""
+        with self._lock:
+            if len(times):
+                self._pending[device].append(
+                    (np.asarray(times, dtype=np.float64), np.asarray(values, dtype=np.float64))
+                )
+                self._latest[device] = times[-1]
+            self._heard[device] = time.monotonic()
+            return self._release(self._watermark())
+
+    def flush(self):
+        """Release everything still held (e.g. when acquisition stops)."""
+        with self._lock:
+            return self._release(np.inf)
+
+    def _watermark(self):
+        # Release up to the oldest "latest sample" among devices still reporting
+        now = time.monotonic()
+        if None in self._heard and now - self._started < self.startup_seconds:
+            return -np.inf
+        # Devices never heard from by the end of startup don't hold the others back
+        active = [latest for latest, heard in zip(self._latest, self._heard)
+                  if heard is not None and now - heard < self.hold_seconds]
+        if not active or None in active:
+            return -np.inf if active else np.inf
+        return min(active)
+
+    def _release(self, watermark):
+        parts = []
+        for device, pending in enumerate(self._pending):
+            keep = []
+            for times, values in pending:
+                ready = np.searchsorted(times, watermark, side='right')
+                if ready:
+                    parts.append((device, times[:ready], values[:ready]))
+                if ready < len(times):
+                    keep.append((times[ready:], values[ready:]))
+            self._pending[device] = keep
+        if not parts:
+            return np.empty((0, self.num_channels + 1))
+
+        times = np.concatenate([times for _, times, _ in parts])
+        order = np.argsort(times, kind='stable')
+        # Each device fills its own columns; the rest stay NaN until held over
+        filled = np.full((len(times) + 1, self.num_channels), np.nan)
+        filled[0] = self._held
+        row = 1
+        for device, part_times, values in parts:
+            cols = slice(self.offsets[device], self.offsets[device] + self.channel_counts[device])
+            filled[row:row + len(part_times), cols] = values[:, :self.channel_counts[device]]
+            row += len(part_times)
+        filled[1:] = filled[1:][order]
+        # Sample-and-hold: take each column's last non-NaN row at or above
+        index = np.where(np.isnan(filled), 0, np.arange(len(filled))[:, None])
+        np.maximum.accumulate(index, axis=0, out=index)
+        filled = np.take_along_axis(filled, index, axis=0)
+
+        rows = np.empty((len(times), self.num_channels + 1))
+        rows[:, 0] = times[order]
+        if self._last_time is not None:
+            # A straggler released late cannot move merged time backwards
+            np.maximum(rows[:, 0], self._last_time, out=rows[:, 0])
+        rows[:, 1:] = filled[1:]
+        self._held = filled[-1]
+        self._last_time = rows[-1, 0]
+
+        if self.writer is not None:
+            self.writer.write_rows(rows)
+        if self.store is not None:
+            self.store.extend(rows[:, 0], rows[:, 1:])
+        if self.pipeline is not None:
+            self.pipeline.process(rows[:, 0], rows[:, 1:])
+        if self.listener is not None:
+            self.listener(rows)
+        return rows
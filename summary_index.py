@@ -0,0 +1,383 @@
+"""Hierarchical summary index of a session for whole-session and time-range metrics.
+
+The rows of a session are summarized in blocks of ``block_size`` rows
+(the leaves): per channel the max, min, sum and trapezoidal integral,
+plus the block's time range and its first and last values. Pairs of
+nodes are merged level by level up to a single root, a segment tree, so
+the max amplitude and total activity of any time range (one exercise
+repetition, say) combine O(log N) nodes. At most two blocks at the
+range's edges are read from the session itself; for CSVs the index keeps
+each block's byte offset, so only those blocks are parsed.
+
+The session writer updates the index as rows are written and saves it
+next to the session when recording stops (``TestSubject_A00.csv.skidx``,
+or ``summary.skidx`` inside a chunked session). ``open_summary_index``
+loads it and indexes any rows recorded after it was saved.
+
+    python summary_index.py TestSubject_A00.csv --start 12.5 --end 14.0
+"""
+import os
+import sys
+import argparse
+import threading
+import numpy as np
+from session_loader import session_reader, session_size, session_channels, is_csv_session, csv_row_blocks
+from session_store import is_chunked_session
+
+INDEX_EXTENSION = '.skidx'
+# Rows per leaf: ~0.25 s at 1 kHz, the most a range query reads at either edge
+BLOCK_SIZE = 256
+
+
+def index_path(session_path):
+    """Where the summary index of a session is kept."""
+    if is_chunked_session(session_path):
+        return os.path.join(session_path, 'summary' + INDEX_EXTENSION)
+    return session_path + INDEX_EXTENSION
+
+
+def node_dtype(num_channels):
+    shape = (num_channels,)
+    return np.dtype([('rows', '<i8'), ('t_start', '<f8'), ('t_end', '<f8'),
+                     ('max', '<f8', shape), ('min', '<f8', shape), ('sum', '<f8', shape),
+                     ('integral', '<f8', shape), ('first', '<f8', shape), ('last', '<f8', shape)])
+
+
+def _summarize(times, values, size, dtype):
+    # One node per `size` consecutive rows; len(times) is a multiple of size
+    count = len(times) // size
+    t = times.reshape(count, size)
+    v = values.reshape(count, size, -1)
+    nodes = np.empty(count, dtype)
+    nodes['rows'] = size
+    nodes['t_start'] = t[:, 0]
+    nodes['t_end'] = t[:, -1]
+    nodes['max'] = v.max(axis=1)
+    nodes['min'] = v.min(axis=1)
+    nodes['sum'] = v.sum(axis=1)
+    dt = np.diff(t, axis=1)[:, :, None]
+    nodes['integral'] = (dt * (v[:, 1:] + v[:, :-1]) / 2.0).sum(axis=1)
+    nodes['first'] = v[:, 0]
+    nodes['last'] = v[:, -1]
+    return nodes
+
+
+def _combine(a, b):
+    """Nodes covering a's rows followed by b's, element by element."""
+    nodes = np.empty(len(a), a.dtype)
+    nodes['rows'] = a['rows'] + b['rows']
+    nodes['t_start'] = a['t_start']
+    nodes['t_end'] = b['t_end']
+    nodes['max'] = np.maximum(a['max'], b['max'])
+    nodes['min'] = np.minimum(a['min'], b['min'])
+    nodes['sum'] = a['sum'] + b['sum']
+    # Plus the trapezoid joining a's last row to b's first
+    gap = (b['t_start'] - a['t_end'])[:, None]
+    nodes['integral'] = a['integral'] + b['integral'] + gap * (a['last'] + b['first']) / 2.0
+    nodes['first'] = a['first']
+    nodes['last'] = b['last']
+    return nodes
+
+
+class SummaryIndex(object):
+    """Segment tree of per-block channel summaries, extended as rows arrive.
+
+    ``extend`` may run on the writer thread while ``query`` runs on
+    another; a lock keeps them apart. Rows of the block being filled are
+    kept in memory. ``reader(start, stop, offset)`` returns (times, values)
+    of session rows, given the byte offset of row `start` when it is known
+    (see extend), and is needed only for ranges that cut through a block.
+    """
+
+    def __init__(self, num_channels, block_size=BLOCK_SIZE, reader=None):
+        self.num_channels = num_channels
+        self.block_size = block_size
+        self.reader = reader
+        self.dtype = node_dtype(num_channels)
+        # Size of the session data when the index was saved (see open_summary_index)
+        self.session_size = 0
+        # Level 0 holds the leaves, the last level the root; arrays grow by doubling
+        self._levels = []
+        self._counts = []
+        self._tail = np.empty((block_size, num_channels + 1))
+        self._tail_rows = 0
+        # Byte offset of each leaf's first row and of the tail's, -1 if unknown
+        self._offsets = np.full(16, -1, dtype=np.int64)
+        self._tail_offset = -1
+        self._lock = threading.Lock()
+
+    @property
+    def rows(self):
+        """Rows indexed so far."""
+        leaves = self._counts[0] if self._counts else 0
+        return leaves * self.block_size + self._tail_rows
+
+    def extend(self, times, values, offsets=None):
+        """Add rows: times (n,) and values (n, num_channels).
+
+        ``offsets`` (n,) are the rows' byte offsets in a CSV session, kept
+        for the first row of each block.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(times), self.num_channels)
+        if offsets is None:
+            offsets = np.full(len(times), -1, dtype=np.int64)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        size = self.block_size
+        with self._lock:
+            if self._tail_rows:
+                take = min(size - self._tail_rows, len(times))
+                self._tail[self._tail_rows:self._tail_rows + take, 0] = times[:take]
+                self._tail[self._tail_rows:self._tail_rows + take, 1:] = values[:take]
+                self._tail_rows += take
+                times, values, offsets = times[take:], values[take:], offsets[take:]
+                if self._tail_rows == size:
+                    self._append_leaves(_summarize(self._tail[:, 0], self._tail[:, 1:], size, self.dtype),
+                                        [self._tail_offset])
+                    self._tail_rows = 0
+            full = len(times) // size * size
+            if full:
+                self._append_leaves(_summarize(times[:full], values[:full], size, self.dtype),
+                                    offsets[:full:size])
+            rest = len(times) - full
+            if rest:
+                self._tail_offset = offsets[full]
+            self._tail[:rest, 0] = times[full:]
+            self._tail[:rest, 1:] = values[full:]
+            self._tail_rows += rest
+
+    def extend_rows(self, rows, offsets=None):
+        """Add (n, 1 + num_channels) rows, timestamp first, as the session writer gets them."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.num_channels + 1)
+        self.extend(rows[:, 0], rows[:, 1:], offsets)
+
+    def _put(self, level, start, nodes):
+        if level == len(self._levels):
+            self._levels.append(np.empty(max(len(nodes), 16), self.dtype))
+            self._counts.append(0)
+        end = start + len(nodes)
+        if end > len(self._levels[level]):
+            grown = np.empty(max(end, 2 * len(self._levels[level])), self.dtype)
+            grown[:start] = self._levels[level][:start]
+            self._levels[level] = grown
+        self._levels[level][start:end] = nodes
+        self._counts[level] = end
+
+    def _nodes(self, level):
+        return self._levels[level][:self._counts[level]]
+
+    def _append_leaves(self, leaves, offsets=None):
+        start = self._counts[0] if self._counts else 0
+        end = start + len(leaves)
+        if end > len(self._offsets):
+            grown = np.full(max(end, 2 * len(self._offsets)), -1, dtype=np.int64)
+            grown[:start] = self._offsets[:start]
+            self._offsets = grown
+        self._offsets[start:end] = -1 if offsets is None else offsets
+        self._put(0, start, leaves)
+        level = 0
+        # Recompute the parents of the new nodes, up to the root
+        while self._counts[level] > 1:
+            start //= 2
+            children = self._nodes(level)
+            left = children[2 * start::2]
+            right = children[2 * start + 1::2]
+            parents = left.copy()
+            parents[:len(right)] = _combine(left[:len(right)], right)
+            self._put(level + 1, start, parents)
+            level += 1
+
+    def _leaf_range(self, first, stop):
+        # Fewest tree nodes covering leaves first .. stop - 1, in order
+        head, tail = [], []
+        level = 0
+        while first < stop:
+            nodes = self._nodes(level)
+            if first & 1:
+                head.append(nodes[first:first + 1])
+                first += 1
+            if stop & 1:
+                stop -= 1
+                tail.append(nodes[stop:stop + 1])
+            first //= 2
+            stop //= 2
+            level += 1
+        return head + tail[::-1]
+
+    def _rows_node(self, times, values, lo, hi):
+        # Node of the rows with lo <= time <= hi (times are sorted), or None
+        begin = np.searchsorted(times, lo, 'left')
+        end = np.searchsorted(times, hi, 'right')
+        if begin >= end:
+            return None
+        return _summarize(times[begin:end], values[begin:end], end - begin, self.dtype)
+
+    def _edge_node(self, leaf, lo, hi):
+        if self.reader is None:
+            raise ValueError("range cuts through an indexed block; the index needs a session reader")
+        size = self.block_size
+        offset = int(self._offsets[leaf])
+        times, values = self.reader(leaf * size, (leaf + 1) * size, offset if offset >= 0 else None)
+        return self._rows_node(np.asarray(times, dtype=np.float64),
+                               np.asarray(values, dtype=np.float64)[:, :self.num_channels], lo, hi)
+
+    def _range_nodes(self, lo, hi):
+        nodes = []
+        if self._counts:
+            leaves = self._nodes(0)
+            # Leaves first .. stop - 1 overlap [lo, hi]
+            first = int(np.searchsorted(leaves['t_end'], lo, 'left'))
+            stop = int(np.searchsorted(leaves['t_start'], hi, 'right'))
+            if first < stop:
+                cut_first = leaves['t_start'][first] < lo
+                cut_last = leaves['t_end'][stop - 1] > hi
+                if stop - first == 1 and (cut_first or cut_last):
+                    nodes.append(self._edge_node(first, lo, hi))
+                else:
+                    if cut_first:
+                        nodes.append(self._edge_node(first, lo, hi))
+                        first += 1
+                    last = self._edge_node(stop - 1, lo, hi) if cut_last else None
+                    if cut_last:
+                        stop -= 1
+                    nodes += self._leaf_range(first, stop)
+                    nodes.append(last)
+        if self._tail_rows:
+            tail = self._tail[:self._tail_rows]
+            nodes.append(self._rows_node(tail[:, 0], tail[:, 1:], lo, hi))
+        return [n for n in nodes if n is not None]
+
+    def query(self, start=None, end=None):
+        """Summary of the rows with start <= time <= end (either may be None for open-ended).
+
+        Returns a dict: rows, t_start, t_end and per channel max, min, mean
+        and integral (trapezoidal, over the rows in range), plus the last row's
+        values. With no rows in range everything is 0 and times are None.
+        """
+        lo = -np.inf if start is None else start
+        hi = np.inf if end is None else end
+        with self._lock:
+            nodes = self._range_nodes(lo, hi)
+        if not nodes:
+            zeros = np.zeros(self.num_channels)
+            return {"rows": 0, "t_start": None, "t_end": None, "max": zeros, "min": zeros.copy(),
+                    "mean": zeros.copy(), "integral": zeros.copy(), "last": None}
+        joined = np.empty(len(nodes), self.dtype)
+        for i, node in enumerate(nodes):
+            joined[i] = node[0]
+        nodes = joined
+        rows = int(nodes['rows'].sum())
+        # The nodes' own integrals plus the trapezoids joining consecutive nodes
+        gaps = (nodes['t_start'][1:] - nodes['t_end'][:-1])[:, None]
+        integral = nodes['integral'].sum(axis=0) + (gaps * (nodes['last'][:-1] + nodes['first'][1:]) / 2.0).sum(axis=0)
+        return {"rows": rows, "t_start": float(nodes['t_start'][0]), "t_end": float(nodes['t_end'][-1]),
+                "max": nodes['max'].max(axis=0), "min": nodes['min'].min(axis=0),
+                "mean": nodes['sum'].sum(axis=0) / rows, "integral": integral, "last": nodes['last'][-1].copy()}
+
+    def row_offset(self, row):
+        """Byte offset in a CSV session of the start of the block holding `row`, or None if unknown.
+
+        Parsing from there reaches `row` after at most one block.
+        """
+        with self._lock:
+            leaves = self._counts[0] if self._counts else 0
+            leaf = row // self.block_size
+            if leaf < leaves:
+                offset = self._offsets[leaf]
+            elif self._tail_rows and row < leaves * self.block_size + self._tail_rows:
+                offset = self._tail_offset
+            else:
+                return None
+        return int(offset) if offset >= 0 else None
+
+    def total(self):
+        """Summary of the whole session (see query)."""
+        return self.query()
+
+    def save(self, session_path):
+        """Write the index next to the session, replacing the old one atomically."""
+        path = index_path(session_path)
+        with self._lock:
+            leaves = self._nodes(0).copy() if self._counts else np.empty(0, self.dtype)
+            tail = self._tail[:self._tail_rows].copy()
+            offsets = self._offsets[:len(leaves)].copy()
+            tail_offset = np.array([self._tail_offset if self._tail_rows else -1], dtype=np.int64)
+            self.session_size = session_size(session_path)
+        info = np.array([self.block_size, self.num_channels, self.session_size], dtype=np.int64)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, info=info, leaves=leaves, tail=tail, offsets=offsets, tail_offset=tail_offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, reader=None):
+        with np.load(path) as data:
+            block_size, num_channels, size = (int(x) for x in data['info'])
+            index = cls(num_channels, block_size, reader)
+            leaves = data['leaves']
+            tail = data['tail']
+            # Indexes saved without offsets read their edge blocks by position
+            offsets = data['offsets'] if 'offsets' in data else None
+            tail_offset = int(data['tail_offset'][0]) if 'tail_offset' in data else -1
+        if len(leaves):
+            index._append_leaves(leaves.astype(index.dtype), offsets)
+        index._tail[:len(tail)] = tail
+        index._tail_rows = len(tail)
+        index._tail_offset = tail_offset
+        index.session_size = size
+        return index
+
+
+def open_summary_index(session_path, num_channels, block_size=BLOCK_SIZE):
+    """Load a session's summary index, bringing it up to date; build it if there is none.
+
+    Rows recorded since the index was saved are read from the session and
+    added, then the index is saved; in a CSV they are parsed block by block
+    from where the index left off. A saved index covering more data than
+    the session now holds (or other channels) is rebuilt from scratch.
+    """
+    reader = session_reader(session_path, num_channels)
+    size = session_size(session_path)
+    index = None
+    try:
+        index = SummaryIndex.load(index_path(session_path), reader)
+    except (OSError, ValueError, KeyError):
+        pass
+    if index is None or index.num_channels != num_channels or index.session_size > size:
+        index = SummaryIndex(num_channels, block_size, reader)
+    if index.session_size != size:
+        if is_csv_session(session_path):
+            # The saved size is where the indexed rows end
+            for times, values, offsets in csv_row_blocks(session_path, num_channels, index.session_size or None):
+                index.extend(times, values, offsets)
+        else:
+            times, values = reader(index.rows, None)
+            index.extend(times, values)
+        index.save(session_path)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Max amplitude and total activity of a session, "
+                                                 "or of a time range, from its summary index.")
+    parser.add_argument('session')
+    parser.add_argument('--start', type=float, default=None, help='range start (s)')
+    parser.add_argument('--end', type=float, default=None, help='range end (s)')
+    args = parser.parse_args(argv)
+
+    labels = session_channels(args.session)
+    index = open_summary_index(args.session, len(labels))
+    summary = index.query(args.start, args.end)
+    if not summary["rows"]:
+        print("No samples in range")
+        return 1
+    print(f"{summary['rows']} samples, {summary['t_start']:.3f} s to {summary['t_end']:.3f} s")
+    for i, label in enumerate(labels):
+        print(f"{i + 1:3d} {label:12s} max {summary['max'][i]:10.2f}  mean {summary['mean'][i]:10.2f}  "
+              f"activity {summary['integral'][i]:12.2f}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
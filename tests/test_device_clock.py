@@ -0,0 +1,85 @@
+import numpy as np
+from device_clock import DeviceClock
+
+RATE = 200.0
+
+
+def _stream(clock, seconds, drift_ppm=0.0, start=0, backlog=0.0, latency=0.004, seed=0):
+    """Feed `seconds` of samples through the clock; return (device times, host times).
+
+    The first `backlog` seconds of samples were sent before anyone read
+    them; they are read in pieces once the reader starts at t = backlog.
+    The rest arrive in reads every 20 ms, `latency` plus jitter after the
+    last sample of the read was sent.
+    """
+    rng = np.random.default_rng(seed)
+    index = start + np.arange(int(seconds * RATE))
+    sent = index / RATE
+    ticks = np.round(sent * 1e6 * (1 + drift_ppm * 1e-6)).astype(np.int64) % 2 ** 32
+    hosts = []
+    pos = 0
+    now = backlog
+    while pos < len(index) and sent[pos] < backlog:
+        # The OS buffer drains a piece per read, as fast as it is read
+        end = min(pos + 64, len(index))
+        hosts.append(clock.to_host(ticks[pos:end], now))
+        now += 0.001
+        pos = end
+    while pos < len(index):
+        end = pos + 1
+        while end < len(index) and sent[end] < sent[pos] + 0.02:
+            end += 1
+        arrival = max(now, sent[end - 1] + latency + rng.uniform(0, 0.003))
+        hosts.append(clock.to_host(ticks[pos:end], arrival))
+        now = arrival
+        pos = end
+    return sent, np.concatenate(hosts)
+
+
+def test_steady_stream_keeps_device_spacing():
+    clock = DeviceClock()
+    sent, host = _stream(clock, 30)
+    assert abs(clock.drift_ppm) < 100
+    assert np.all(np.diff(host) >= 0)
+    # Offset by the shortest latency, no more
+    assert np.all(np.abs(host - sent - 0.004) < 0.002)
+
+
+def test_follows_crystal_drift():
+    clock = DeviceClock()
+    _stream(clock, 120, drift_ppm=50.0)
+    assert abs(clock.drift_ppm - 50.0) < 20
+
+
+def test_backlog_read_after_opening_does_not_set_the_slope():
+    clock = DeviceClock()
+    sent, host = _stream(clock, 2.0, backlog=2.0)
+    # However few windows there are, the rate stays within crystal tolerance
+    assert abs(clock.drift_ppm) <= 1001
+    sent, host = _stream(clock, 8.0, start=len(sent))
+    assert abs(clock.drift_ppm) < 100
+    # Live samples sit at their send time plus the shortest latency, off by
+    # milliseconds at first and not at all once the backlog's window is outvoted
+    error = host - sent - 0.004
+    assert np.all(np.abs(error) < 0.004)
+    assert np.all(np.abs(error[sent > 6.0]) < 0.001)
+
+
+def test_board_reset_starts_a_new_model():
+    clock = DeviceClock()
+    _stream(clock, 5)
+    # Ticks restart from 0, host time carries on
+    ticks = np.arange(100) * 5000
+    host = clock.to_host(ticks, 5.6)
+    assert clock.resets == 1
+    assert np.all(host <= 5.6) and np.all(np.diff(host) >= 0)
+
+
+def test_micros_wraparound():
+    clock = DeviceClock()
+    # Start 3 s before micros() wraps at 2**32
+    start = int((2 ** 32 / 1e6 - 3) * RATE)
+    sent, host = _stream(clock, 10, start=start)
+    assert clock.resets == 0
+    assert np.all(np.diff(host) >= 0)
+    assert np.allclose(np.diff(host), 1 / RATE, atol=0.003)
@@ -0,0 +1,57 @@
+import numpy as np
+from plot_decimation import MinMaxPyramid
+
+
+def _check_envelope(x, y, times, values, channel, lo, hi, columns):
+    # Every point is a real sample of the range, in time order
+    index = np.searchsorted(times, x)
+    assert np.all((index >= lo) & (index < hi))
+    assert np.all(np.diff(x) >= 0)
+    assert np.array_equal(y, values[index, channel])
+    # and no spike is lost
+    assert y.max() == values[lo:hi, channel].max()
+    assert y.min() == values[lo:hi, channel].min()
+    # about two points per column, plus raw samples at the edges
+    assert len(x) <= 2 * columns + 64
+
+
+def test_envelope_keeps_extremes_of_any_range():
+    rng = np.random.default_rng(0)
+    count = 100000
+    times = np.arange(count) * 0.001
+    values = rng.normal(size=(count, 2))
+    values[54321, 1] = 50.0
+    pyramid = MinMaxPyramid(2)
+    # Built incrementally, from blocks of uneven size
+    added = 0
+    for size in rng.integers(1, 5000, 100):
+        added = min(added + int(size), count)
+        pyramid.update(values[:added])
+    pyramid.update(values)
+    for _ in range(200):
+        lo, hi = np.sort(rng.integers(0, count + 1, 2))
+        if hi - lo < 2:
+            continue
+        channel = int(rng.integers(2))
+        columns = int(rng.integers(50, 2000))
+        x, y = pyramid.envelope(times, values, channel, lo, hi, columns)
+        _check_envelope(x, y, times, values, channel, lo, hi, columns)
+
+
+def test_envelope_of_bounded_store():
+    rng = np.random.default_rng(1)
+    count, kept = 60000, 20000
+    times = np.arange(count) * 0.001
+    values = rng.normal(size=(count, 1))
+    pyramid = MinMaxPyramid(1)
+    # A store keeping the last `kept` rows: indices into it start at `offset`
+    for end in range(1000, count + 1, 1000):
+        offset = max(end - kept, 0)
+        pyramid.update(values[offset:end], offset)
+    window_times, window_values = times[offset:], values[offset:]
+    for _ in range(100):
+        lo, hi = np.sort(rng.integers(0, kept + 1, 2))
+        if hi - lo < 2:
+            continue
+        x, y = pyramid.envelope(window_times, window_values, 0, lo, hi, 300, offset)
+        _check_envelope(x, y, window_times, window_values, 0, lo, hi, 300)
@@ -0,0 +1,105 @@
+import os
+import json
+import numpy as np
+from session_binary import record_dtype, pack_records
+from session_store import (
+    ACTIVE_FILE, INDEX_FILE, create_store, recover, read_index, open_store, read_rows,
+    session_summary, ChunkedSessionWriter,
+)
+
+CHANNELS = ['RVL', 'RVM', 'LVM', 'LVL']
+
+
+def _rows(count, start=0):
+    rng = np.random.default_rng(start)
+    times = (start + np.arange(count)) * 0.001
+    # float32-exact values, so sums match what the store keeps
+    values = rng.uniform(0, 5, (count, 4)).astype(np.float32).astype(np.float64)
+    return np.column_stack((times, values))
+
+
+def _record(path, rows, chunk_bytes=4096):
+    # Small blocks, so the chunk size is checked often
+    writer = ChunkedSessionWriter(path, chunk_bytes=chunk_bytes, flush_bytes=1024)
+    writer.start()
+    for i in range(0, len(rows), 100):
+        writer.write_rows(rows[i:i + 100])
+    writer.close()
+
+
+def _check_summary(path, rows):
+    summary = session_summary(path)
+    assert summary["rows"] == len(rows)
+    assert summary["t_start"] == rows[0, 0] and summary["t_end"] == rows[-1, 0]
+    assert np.allclose(summary["max"], rows[:, 1:].max(axis=0))
+    assert np.allclose(summary["integral"], np.trapezoid(rows[:, 1:], rows[:, 0], axis=0))
+
+
+def test_recorded_session_round_trip(tmp_path):
+    path = str(tmp_path / 'TestSubject_T.skchunks')
+    create_store(path, CHANNELS, 'Quad')
+    rows = _rows(2000)
+    _record(path, rows)
+    assert len(read_index(path)) > 1
+    assert not os.path.exists(os.path.join(path, ACTIVE_FILE))
+    meta, times, values = open_store(path)
+    assert meta["channels"] == CHANNELS
+    assert np.array_equal(times, rows[:, 0])
+    assert np.array_equal(values, rows[:, 1:])
+    t, v = read_rows(path, 777, 1555)
+    assert np.array_equal(t, rows[777:1555, 0])
+    _check_summary(path, rows)
+
+
+def test_recover_cuts_torn_record_off_active_part(tmp_path):
+    path = str(tmp_path / 'TestSubject_T.skchunks')
+    create_store(path, CHANNELS, 'Quad')
+    rows = _rows(1000)
+    _record(path, rows)
+    # A crash mid-write: 50 whole records and half of the next
+    extra = _rows(51, start=1000)
+    data = pack_records(extra, 4, '<f4')
+    size = record_dtype(4, '<f4').itemsize
+    with open(os.path.join(path, ACTIVE_FILE), 'wb') as f:
+        f.write(data[:50 * size + size // 2])
+    entries = recover(path)
+    assert not os.path.exists(os.path.join(path, ACTIVE_FILE))
+    assert sum(e["rows"] for e in entries) == 1050
+    assert entries[-1]["t_end"] == extra[49, 0]
+    meta, times, values = open_store(path)
+    expected = np.concatenate((rows, extra[:50]))
+    assert np.array_equal(times, expected[:, 0])
+    assert np.array_equal(values, expected[:, 1:])
+    _check_summary(path, expected)
+    # Recovering again finds nothing left to do
+    assert recover(path) == entries
+
+
+def test_recover_indexes_chunk_renamed_before_index_update(tmp_path):
+    path = str(tmp_path / 'TestSubject_T.skchunks')
+    create_store(path, CHANNELS, 'Quad')
+    rows = _rows(1500)
+    _record(path, rows)
+    # Drop the last chunk from the index, as if the crash came just after the rename
+    index_file = os.path.join(path, INDEX_FILE)
+    with open(index_file) as f:
+        chunks = json.load(f)["chunks"]
+    with open(index_file, 'w') as f:
+        json.dump({"chunks": chunks[:-1]}, f)
+    entries = recover(path)
+    assert [e["file"] for e in entries] == [c["file"] for c in chunks]
+    assert [e["rows"] for e in entries] == [c["rows"] for c in chunks]
+    assert np.allclose(entries[-1]["integral"], chunks[-1]["integral"])
+    _check_summary(path, rows)
+
+
+def test_recover_removes_active_part_without_whole_records(tmp_path):
+    path = str(tmp_path / 'TestSubject_T.skchunks')
+    create_store(path, CHANNELS, 'Quad')
+    rows = _rows(300)
+    _record(path, rows)
+    with open(os.path.join(path, ACTIVE_FILE), 'wb') as f:
+        f.write(b'\x01\x02\x03')
+    entries = recover(path)
+    assert not os.path.exists(os.path.join(path, ACTIVE_FILE))
+    assert sum(e["rows"] for e in entries) == 300
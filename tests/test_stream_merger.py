@@ -0,0 +1,51 @@
+import threading
+import numpy as np
+from stream_merger import StreamMerger
+
+
+def _produce(merger, device, channels, batches, rate):
+    for batch in range(batches):
+        times = (batch * 10 + np.arange(10)) / rate
+        values = np.column_stack([times * (channel + 1) + device for channel in range(channels)])
+        merger.add(device, times, values)
+
+
+def test_merge_holds_last_values():
+    blocks = []
+    merger = StreamMerger([1, 1], listener=blocks.append, hold_seconds=10.0)
+    merger.add(0, np.array([0.0, 2.0]), np.array([[1.0], [3.0]]))
+    assert not blocks
+    merger.add(1, np.array([1.0, 3.0]), np.array([[10.0], [30.0]]))
+    merger.flush()
+    rows = np.concatenate(blocks)
+    np.testing.assert_array_equal(rows[:, 0], [0.0, 1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(rows[1:, 1], [1.0, 3.0, 3.0])
+    np.testing.assert_array_equal(rows[1:, 2], [10.0, 10.0, 30.0])
+    # A device that has not reported yet reads as zero
+    assert rows[0, 2] == 0.0
+
+
+def test_threaded_producers_deliver_in_order():
+    blocks = []
+
+    def listener(rows):
+        # Give the other producer a chance to release while this block is out
+        threading.Event().wait(0.0001)
+        blocks.append(rows)
+
+    merger = StreamMerger([1, 2], listener=listener, hold_seconds=10.0)
+    threads = [
+        threading.Thread(target=_produce, args=(merger, 0, 1, 200, 1000.0)),
+        threading.Thread(target=_produce, args=(merger, 1, 2, 100, 500.0)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    merger.flush()
+
+    rows = np.concatenate(blocks)
+    assert len(rows) == 2000 + 1000
+    assert np.all(np.diff(rows[:, 0]) >= 0)
+    # Each column ends on its device's last sample
+    np.testing.assert_allclose(rows[-1, 1:], [1.999, 1.998 + 1, 1.998 * 2 + 1])
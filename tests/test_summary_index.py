@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from buffered_csv_writer import BufferedCsvWriter
+from acquisition import create_session_file
+from session_loader import load_session
+from summary_index import SummaryIndex, open_summary_index, index_path
+
+
+def _session(count, channels=3, seed=0):
+    rng = np.random.default_rng(seed)
+    times = np.round(np.cumsum(rng.uniform(0.0005, 0.0015, count)), 3)
+    return times, np.round(rng.uniform(0, 5, (count, channels)), 3)
+
+
+def _brute(times, values, start, end):
+    keep = (times >= (-np.inf if start is None else start)) & (times <= (np.inf if end is None else end))
+    return times[keep], values[keep]
+
+
+def _check(summary, times, values):
+    assert summary["rows"] == len(times)
+    assert summary["t_start"] == times[0] and summary["t_end"] == times[-1]
+    assert np.allclose(summary["max"], values.max(axis=0))
+    assert np.allclose(summary["min"], values.min(axis=0))
+    assert np.allclose(summary["mean"], values.mean(axis=0))
+    assert np.allclose(summary["integral"], np.trapezoid(values, times, axis=0))
+    assert np.array_equal(summary["last"], values[-1])
+
+
+def _ranges(times, count=40, seed=1):
+    rng = np.random.default_rng(seed)
+    ranges = [(None, None), (None, times[300]), (times[10], None), (times[5], times[6])]
+    for _ in range(count):
+        lo, hi = np.sort(rng.uniform(times[0] - 0.1, times[-1] + 0.1, 2))
+        ranges.append((lo, hi))
+    return ranges
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 256])
+def test_query_matches_brute_force(block_size):
+    times, values = _session(5000)
+    index = SummaryIndex(3, block_size, reader=lambda a, b, offset=None: (times[a:b], values[a:b]))
+    # Rows arrive in uneven blocks, as from the writer
+    for a, b in zip([0, 1, 500, 501, 3333], [1, 500, 501, 3333, 5000]):
+        index.extend(times[a:b], values[a:b])
+    assert index.rows == 5000
+    for start, end in _ranges(times):
+        t, v = _brute(times, values, start, end)
+        summary = index.query(start, end)
+        if len(t):
+            _check(summary, t, v)
+        else:
+            assert summary["rows"] == 0 and summary["t_start"] is None
+
+
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / 'TestSubject_S.csv')
+    times, values = _session(3000)
+    with open(path, 'w', newline='') as f:
+        f.write('Timestamp,A,B,C\r\n')
+    reader = lambda a, b, offset=None: (times[a:b], values[a:b])
+    index = SummaryIndex(3, 64, reader)
+    index.extend(times, values)
+    index.save(path)
+    loaded = SummaryIndex.load(index_path(path), reader)
+    assert loaded.rows == index.rows == 3000
+    for start, end in _ranges(times, 10):
+        a, b = index.query(start, end), loaded.query(start, end)
+        assert a["rows"] == b["rows"]
+        assert np.allclose(a["integral"], b["integral"])
+
+
+def test_csv_edge_blocks_read_by_offset(tmp_path):
+    path = str(tmp_path / 'TestSubject_S.csv')
+    create_session_file(path, ['RVL', 'RVM', 'LVM'], 'Quad')
+    times, values = _session(4000)
+    index = open_summary_index(path, 3, block_size=100)
+    writer = BufferedCsvWriter(path, summary=index)
+    writer.start()
+    rows = np.column_stack((times, values))
+    for i in range(0, len(rows), 333):
+        writer.write_rows(rows[i:i + 333])
+    writer.close()
+    times, values = load_session(path, 3)
+    with open(path, 'rb') as f:
+        data = f.read()
+    row_starts = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == 10)[:-1] + 1
+    # Reopened from the saved index: every block remembers where its first row starts
+    index = open_summary_index(path, 3, block_size=100)
+    for row in (0, 99, 100, 3999):
+        assert index.row_offset(row) == row_starts[row // 100 * 100]
+    calls = []
+    session_read = index.reader
+
+    def reader(start, stop, offset=None):
+        calls.append(offset)
+        return session_read(start, stop, offset)
+    index.reader = reader
+    for start, end in _ranges(times, 20):
+        t, v = _brute(times, values, start, end)
+        if len(t):
+            _check(index.query(start, end), t, v)
+    assert calls and None not in calls
+
+
+def test_open_catches_up_rows_recorded_after_save(tmp_path):
+    path = str(tmp_path / 'TestSubject_S.csv')
+    create_session_file(path, ['RVL', 'RVM', 'LVM'], 'Quad')
+    times, values = _session(2500)
+    rows = np.column_stack((times, values))
+    index = open_summary_index(path, 3, block_size=64)
+    writer = BufferedCsvWriter(path, summary=index)
+    writer.start()
+    writer.write_rows(rows[:1000])
+    writer.close()
+    # Appended without the index, as by a recording that crashed before saving it
+    writer = BufferedCsvWriter(path)
+    writer.start()
+    writer.write_rows(rows[1000:])
+    writer.close()
+    index = open_summary_index(path, 3, block_size=64)
+    times, values = load_session(path, 3)
+    assert index.rows == len(times) == 2500
+    for start, end in _ranges(times, 20):
+        t, v = _brute(times, values, start, end)
+        if len(t):
+            _check(index.query(start, end), t, v)
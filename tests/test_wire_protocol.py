@@ -0,0 +1,81 @@
+import numpy as np
+from wire_protocol import FrameDecoder, encode_frames, LEVEL_SCALE
+
+
+def _values(count, channels=4, seed=0):
+    rng = np.random.default_rng(seed)
+    # Exactly representable after the int16 round trip
+    return np.round(rng.uniform(-300, 300, (count, channels)) * LEVEL_SCALE) / LEVEL_SCALE
+
+
+def _decode_all(decoder, data, chunk):
+    parts = [decoder.feed(data[i:i + chunk]) for i in range(0, len(data), chunk)]
+    return (np.concatenate([p.seq for p in parts]),
+            np.concatenate([p.values for p in parts]),
+            np.concatenate([p.missing for p in parts]))
+
+
+def test_clean_stream_in_any_chunking():
+    values = _values(500)
+    data = encode_frames(values, seq_start=65500, times_us=np.arange(500) * 1000)
+    for chunk in (1, 7, 13, 4096, len(data)):
+        decoder = FrameDecoder(4)
+        seq, decoded, missing = _decode_all(decoder, data, chunk)
+        assert np.array_equal(decoded, values)
+        # Sequence numbers wrap at 16 bits without counting as lost frames
+        assert np.array_equal(seq, (65500 + np.arange(500)) & 0xFFFF)
+        assert not missing.any()
+        assert decoder.frames == 500
+        assert decoder.missing == decoder.bad_frames == decoder.skipped_bytes == 0
+
+
+def test_resync_past_noise_and_text():
+    values = _values(60)
+    size = FrameDecoder(4).frame_size
+    frames = encode_frames(values)
+    noise = b'\x00\xa5\xff\x5a\xa5' + b'Status: calibrating\r\n'
+    data = noise + frames[:20 * size] + noise + frames[20 * size:]
+    decoder = FrameDecoder(4)
+    seq, decoded, missing = _decode_all(decoder, data, 64)
+    assert np.array_equal(decoded, values)
+    assert np.array_equal(seq, np.arange(60))
+    assert decoder.missing == 0
+    assert decoder.skipped_bytes == 2 * len(noise)
+
+
+def test_corrupt_frame_dropped_and_counted_as_missing():
+    values = _values(40)
+    size = FrameDecoder(4).frame_size
+    data = bytearray(encode_frames(values))
+    # Flip a level byte of frame 10: its CRC no longer matches
+    data[10 * size + 9] ^= 0xFF
+    decoder = FrameDecoder(4)
+    seq, decoded, missing = _decode_all(decoder, bytes(data), 100)
+    keep = np.arange(40) != 10
+    assert np.array_equal(decoded, values[keep])
+    assert np.array_equal(seq, np.arange(40)[keep])
+    assert decoder.bad_frames >= 1
+    assert decoder.skipped_bytes == size
+    assert decoder.missing == 1
+    assert missing.tolist() == [1 if s == 11 else 0 for s in seq]
+
+
+def test_gaps_counted_across_feeds():
+    values = _values(30)
+    seqs = [0, 1, 2, 5, 6, 10]
+    data = b''.join(encode_frames(values[i:i + 1], seq_start=s) for i, s in enumerate(seqs))
+    decoder = FrameDecoder(4)
+    seq, decoded, missing = _decode_all(decoder, data, decoder.frame_size)
+    assert seq.tolist() == seqs
+    assert missing.tolist() == [0, 0, 0, 2, 0, 3]
+    assert decoder.missing == 5
+
+
+def test_other_channel_count_ignored():
+    decoder = FrameDecoder(4)
+    other = encode_frames(_values(5, channels=2))
+    mine = encode_frames(_values(5))
+    decoded = decoder.feed(other + mine)
+    decoded2 = decoder.feed(b'')
+    assert len(decoded.seq) + len(decoded2.seq) == 5
+    assert decoder.skipped_bytes == len(other)
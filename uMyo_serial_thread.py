@@ -1,82 +1,80 @@
-import time
-import serial
-import csv
-from PyQt5.QtCore import QThread, pyqtSignal
-
-color_red = "\u001b[31m"
-color_magenta = "\u001b[35m"
-color_reset = "\u001b[0m"
-
-
-def get_new_filename(subject="A0"):
-    """Generate a new CSV filename based on subject ID."""
-    return f"TestSubject_{subject}.csv"
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from acquisition import SerialAcquisition, color_red, color_magenta, color_reset
+from session_export import export_session
 
 
 class SerialReaderFromUMyo(QThread):
+    """Qt front end of SerialAcquisition: runs it in a QThread and emits signals.
+
+    Takes the same arguments as SerialAcquisition; reader settings
+    (read_timeout, flush_interval, ...) live on ``self.core``. The GUI
+    records through acquisition.Recorder and RecorderSignals instead; this
+    single-port wrapper is kept for benchmarks/bench_ingest.py and scripts
+    written against the original reader thread.
+    """
     # Emits elapsed timestamp and sensor values list
     data_received = pyqtSignal(float, list)
+    # Batched mode: emits an (n, 1 + num_sensors) array, column 0 is the timestamp
+    batch_received = pyqtSignal(object)
 
-    def __init__(self, csv_file, serial_port, baud_rate, num_sensors, parent=None):
+    def __init__(self, csv_file, serial_port, baud_rate, num_sensors, store=None,
+                 batch_size=None, max_latency=0.05, pipeline=None, merger=None,
+                 device_index=0, start_time=None, protocol="auto", time_offset=0.0,
+                 summary_index=None, parent=None):
         super().__init__(parent)
         self.csv_file = csv_file
         self.serial_port = serial_port
         self.baud_rate = baud_rate
         self.num_sensors = num_sensors
         self._running = False
-        self.ser = None
-        self.start_time = None
+        self.core = SerialAcquisition(
+            csv_file, serial_port, baud_rate, num_sensors, store=store,
+            batch_size=batch_size, max_latency=max_latency, pipeline=pipeline,
+            merger=merger, device_index=device_index, start_time=start_time,
+            on_sample=self.data_received.emit, on_batch=self.batch_received.emit,
+            protocol=protocol, time_offset=time_offset, summary_index=summary_index
+        )
 
     def run(self):
-        # Open serial port
-        try:
-            self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=0.1)
-            time.sleep(2)
-        except Exception as e:
-            print(f"{color_magenta}Could not open port {color_red}{self.serial_port}{color_magenta}:{color_reset} {e}\n")
-            return
-
-        # Prepare CSV file for appending data
-        try:
-            csvfile = open(self.csv_file, 'a', newline='')
-            writer = csv.writer(csvfile)
-        except Exception as e:
-            print(f"{color_magenta}Could not open CSV {color_red}{self.csv_file}{color_magenta}:{color_reset} {e}\n")
-            if self.ser and self.ser.is_open:
-                self.ser.close()
-            return
-
         self._running = True
-        self.start_time = time.time()
-        buffer = ""
-
-        while self._running:
-            try:
-                if self.ser.in_waiting:
-                    chunk = self.ser.read(self.ser.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += chunk
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        parts = line.strip().split()
-                        if len(parts) == self.num_sensors:
-                            try:
-                                vals = [float(p) for p in parts]
-                            except ValueError:
-                                continue
-                            elapsed = round(time.time() - self.start_time, 3)
-                            writer.writerow([elapsed] + vals)
-                            csvfile.flush()
-                            self.data_received.emit(elapsed, vals)
-            except Exception as e:
-                print(f"{color_magenta}Serial read error:{color_red} {e}{color_reset}\n")
-            time.sleep(0.03)
-
-        # Cleanup
-        csvfile.close()
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        self.core.run()
 
     def stop(self):
         """Stop the reading loop and close thread."""
         self._running = False
+        self.core.stop()
         self.wait()
+
+
+class RecorderSignals(QObject):
+    """Delivers a Recorder's sample blocks to the GUI thread as a Qt signal."""
+    # (n, 1 + channels) array, column 0 is the timestamp
+    batch_received = pyqtSignal(object)
+
+    def __init__(self, recorder, parent=None):
+        super().__init__(parent)
+        recorder.add_listener(self.batch_received.emit)
+
+
+class SessionExportThread(QThread):
+    """Runs session_export.export_session off the GUI thread and reports through signals."""
+    # Rows written so far
+    progress = pyqtSignal(int)
+    # Destination path and row count, once the export is complete
+    exported = pyqtSignal(str, int)
+    failed = pyqtSignal(str)
+
+    def __init__(self, src, dst, muscle_group=None, parent=None):
+        super().__init__(parent)
+        self.src = src
+        self.dst = dst
+        self.muscle_group = muscle_group
+
+    def run(self):
+        try:
+            count = export_session(self.src, self.dst, self.muscle_group, progress=self.progress.emit)
+        except Exception as e:
+            print(f"{color_magenta}Could not export {color_red}{self.src}{color_magenta}:{color_reset} {e}\n")
+            self.failed.emit(str(e))
+            return
+        self.exported.emit(self.dst, count)
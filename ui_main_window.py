@@ -1,22 +1,27 @@
+import os
 import warnings
 
-from PyQt5.QtWidgets import QInputDialog, QMessageBox
+from PyQt5.QtWidgets import QInputDialog, QMessageBox, QFileDialog
 
 warnings.filterwarnings(
     "ignore",
     message="Unable to import Axes3D.*",
     module="matplotlib.projections"
 )
-import os
-import csv
 import numpy as np
-import matplotlib.pyplot as plt
-from io import BytesIO
 from PyQt5 import QtCore, QtGui, QtWidgets
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import QTimer
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from uMyo_serial_thread import SerialReaderFromUMyo
+from live_plot import LivePlotCanvas
+from uMyo_serial_thread import RecorderSignals, SessionExportThread
+from acquisition import Recorder, channel_labels, create_session_file, session_exists, resume_session, export_recording
+from emg_stats import RunningStats
+from sample_store import SampleStore
+from render_scheduler import RenderScheduler
+from session_loader import load_session_tail
+from summary_index import open_summary_index
+from session_columnar import PARQUET_EXTENSION, HDF5_EXTENSION, is_columnar_session
+from plot_decimation import MinMaxPyramid
+from emg_dsp import EMGPipeline
+from perf_metrics import PerfMonitor, MetricsLog, format_summary
 
 color_red = "\u001b[31m"
 color_magenta = "\u001b[35m"
@@ -24,277 +29,370 @@ color_reset = "\u001b[0m"
 
 
 class ui_main_window(object):
-    def __init__(self, csv_file, serial_port, baud_rate, num_sensors):
+    def __init__(self, csv_file, serial_port, baud_rate, num_sensors, max_samples=None, muscle_group=None,
+                 metrics_file=None, protocol="auto", export_path=None):
         self.csv_file = csv_file
-        self.serial_port = serial_port
+        # Parquet / HDF5 file the session is converted to when recording stops (main.py --format)
+        self.export_path = export_path
+        # Quad or Hamstring; None asks in a dialog when the UI is set up
+        self.muscle_group = muscle_group
+        # One port, or a list of ports recorded together (one reader each).
+        # num_sensors is the channel count per port, or a list with one per port.
+        self.serial_ports = [serial_port] if isinstance(serial_port, str) else list(serial_port)
+        if isinstance(num_sensors, int):
+            num_sensors = [num_sensors] * len(self.serial_ports)
+        self.port_sensors = list(num_sensors)
+        self.serial_port = self.serial_ports[0]
         self.baud_rate = baud_rate
-        self.num_sensors = num_sensors
-        self.timer_interval = 1000
-        self.serial_thread = None
+        # Serial format: "ascii", "binary" (see wire_protocol) or "auto"
+        self.protocol = protocol
+        # Channels of all ports side by side, in port order
+        self.num_sensors = num_sensors = sum(self.port_sensors)
+        # Redraw rate of the graphs and metrics, independent of the sample rate
+        self.render_fps = 30
+        # Graphs show the last window_seconds (None = whole session); while
+        # paused they show the window ending at scrub_time
+        self.window_seconds = 10.0
+        self.paused = False
+        self.scrub_time = None
+        # Samples per signal emitted by the serial thread (None = one per sample)
+        self.batch_size = 64
+        # Acquisition core (see acquisition.Recorder), started by setup_ui
+        self.recorder = None
         self.timer = None
-        self.is_existing_data = os.path.exists(csv_file) and os.path.getsize(csv_file) > 0
+        # Hot-path counters sampled once a second; shown in the status bar
+        # when enabled and appended to metrics_file (.csv or JSON lines) if set
+        self.monitor = None
+        self.metrics_timer = None
+        self.metrics_log = MetricsLog(metrics_file) if metrics_file else None
+        self.stats = RunningStats(num_sensors)
+        # Live samples shared with the serial thread; max_samples bounds memory
+        self.store = SampleStore(num_sensors, max_samples=max_samples)
+        # Min/max envelopes so plot cost is bounded by the plot width
+        self.lod = MinMaxPyramid(num_sensors)
+        # Streaming envelope / RMS / spectral stats, run on the serial thread
+        self.dsp = EMGPipeline(num_sensors, max_samples=max_samples)
+        self.is_existing_data = session_exists(csv_file)
+        # Last timestamp of the session being appended to; new samples continue from it
+        self.time_offset = 0.0
+        # Per-block summaries of the whole session, updated by the session writer
+        self.summary_index = None
+        # Background export to Parquet / HDF5 (one at a time)
+        self.export_thread = None
 
     def setup_ui(self, MainWindow):
         # Keep a reference to the parent widget
         self.main_window = MainWindow
 
         # Ask user for muscle group type (Quad or Hamstring)
-        muscle_group = self.ask_for_muscle_group(self.main_window)
-        self.muscle_group_labels = self.get_muscle_labels(muscle_group)
+        if self.muscle_group is None:
+            self.muscle_group = self.ask_for_muscle_group(self.main_window)
+        self.muscle_group_labels = self.get_muscle_labels(self.muscle_group)
+        self.channel_labels = channel_labels(self.muscle_group_labels, self.port_sensors)
 
         # Set window dimensions
         MainWindow.resize(1800, 950)
         self.centralwidget = QtWidgets.QWidget(MainWindow)
-
-        # Screen Title
+        self.main_layout = QtWidgets.QVBoxLayout(self.centralwidget)
+        self.main_layout.setContentsMargins(10, 10, 10, 10)
+        self.main_layout.setObjectName("main_layout")
+
+        # Title row: screen title centred, time window controls on the right
+        self.title_layout = QtWidgets.QHBoxLayout()
+        self.title_layout.setObjectName("title_layout")
+        self.title_layout.addStretch(1)
         self.screen_title = QtWidgets.QLabel(self.centralwidget)
-        self.screen_title.setGeometry(QtCore.QRect(715, 40, 361, 42))
-        sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Preferred, QtWidgets.QSizePolicy.Preferred)
-        sizePolicy.setHorizontalStretch(0)
-        sizePolicy.setVerticalStretch(0)
-        sizePolicy.setHeightForWidth(self.screen_title.sizePolicy().hasHeightForWidth())
-        self.screen_title.setSizePolicy(sizePolicy)
-        self.screen_title.setBaseSize(QtCore.QSize(7, 0))
         font = QtGui.QFont()
         font.setPointSize(18)
         self.screen_title.setFont(font)
         self.screen_title.setObjectName("screen_title")
+        self.title_layout.addWidget(self.screen_title)
+        self.title_layout.addStretch(1)
+
+        # Time window controls: window length, pause and scrub through history
+        self.window_controls = QtWidgets.QGridLayout()
+        self.window_controls.setObjectName("window_controls")
+        self.window_label = QtWidgets.QLabel(self.centralwidget)
+        self.window_label.setObjectName("window_label")
+        self.window_controls.addWidget(self.window_label, 0, 0)
+        self.window_spin = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.window_spin.setRange(0, 3600)
+        self.window_spin.setSingleStep(5)
+        self.window_spin.setValue(self.window_seconds or 0)
+        self.window_spin.setObjectName("window_spin")
+        self.window_spin.valueChanged.connect(self.on_window_changed)
+        self.window_controls.addWidget(self.window_spin, 0, 1)
+        self.pause_checkbox = QtWidgets.QCheckBox(self.centralwidget)
+        self.pause_checkbox.setObjectName("pause_checkbox")
+        self.pause_checkbox.toggled.connect(self.on_pause_toggled)
+        self.window_controls.addWidget(self.pause_checkbox, 1, 0, 1, 2)
+        self.scrub_slider = QtWidgets.QSlider(QtCore.Qt.Horizontal, self.centralwidget)
+        self.scrub_slider.setMinimumWidth(230)
+        self.scrub_slider.setRange(0, 1000)
+        self.scrub_slider.setValue(1000)
+        self.scrub_slider.setEnabled(False)
+        self.scrub_slider.setObjectName("scrub_slider")
+        self.scrub_slider.valueChanged.connect(self.on_scrub)
+        self.window_controls.addWidget(self.scrub_slider, 2, 0, 1, 2)
+        self.perf_checkbox = QtWidgets.QCheckBox(self.centralwidget)
+        self.perf_checkbox.setObjectName("perf_checkbox")
+        self.perf_checkbox.toggled.connect(self.on_perf_toggled)
+        self.window_controls.addWidget(self.perf_checkbox, 3, 0, 1, 2)
+        self.export_button = QtWidgets.QPushButton(self.centralwidget)
+        self.export_button.setObjectName("export_button")
+        self.export_button.clicked.connect(self.on_export_clicked)
+        self.window_controls.addWidget(self.export_button, 4, 0, 1, 2)
+        self.title_layout.addLayout(self.window_controls)
+        self.main_layout.addLayout(self.title_layout)
 
         # Horizontal line
         self.line = QtWidgets.QFrame(self.centralwidget)
-        self.line.setGeometry(QtCore.QRect(70, 70, 1660, 20))
         self.line.setFrameShape(QtWidgets.QFrame.HLine)
         self.line.setFrameShadow(QtWidgets.QFrame.Sunken)
         self.line.setObjectName("line")
-
-        # Muscle header labels and other interface elements …
-        # (The following UI code remains unchanged. For brevity, only key elements are shown.)
-        self.muscle_h1 = QtWidgets.QLabel(self.centralwidget)
-        self.muscle_h1.setGeometry(QtCore.QRect(100, 115, 125, 30))
-        font = QtGui.QFont()
-        font.setPointSize(16)
-        self.muscle_h1.setFont(font)
-        self.muscle_h1.setObjectName("muscle_h1")
-        self.muscle_h2 = QtWidgets.QLabel(self.centralwidget)
-        self.muscle_h2.setGeometry(QtCore.QRect(950, 115, 125, 30))
-        font = QtGui.QFont()
-        font.setPointSize(16)
-        self.muscle_h2.setFont(font)
-        self.muscle_h2.setObjectName("muscle_h2")
-        self.muscle_h3 = QtWidgets.QLabel(self.centralwidget)
-        self.muscle_h3.setGeometry(QtCore.QRect(100, 542, 125, 30))
-        font = QtGui.QFont()
-        font.setPointSize(16)
-        self.muscle_h3.setFont(font)
-        self.muscle_h3.setObjectName("muscle_h3")
-        self.muscle_h4 = QtWidgets.QLabel(self.centralwidget)
-        self.muscle_h4.setGeometry(QtCore.QRect(950, 542, 125, 30))
-        font = QtGui.QFont()
-        font.setPointSize(16)
-        self.muscle_h4.setFont(font)
-        self.muscle_h4.setObjectName("muscle_h4")
+        self.main_layout.addWidget(self.line)
+
+        # One panel per channel, two per row; scrolls when they don't fit
+        self.scroll_area = QtWidgets.QScrollArea(self.centralwidget)
+        self.scroll_area.setWidgetResizable(True)
+        self.scroll_area.setFrameShape(QtWidgets.QFrame.NoFrame)
+        self.scroll_area.setObjectName("scroll_area")
+        self.panels_widget = QtWidgets.QWidget()
+        self.panels_layout = QtWidgets.QGridLayout(self.panels_widget)
+        self.panels_layout.setObjectName("panels_layout")
+        self.muscle_headers = []
+        self.amp_labels = []
+        self.tma_labels = []
+        self.amp_boxes = []
+        self.tma_boxes = []
+        self.dsp_labels = []
+        self.graphs = []
+        graph_height = 350 if self.num_sensors <= 4 else 220
+        for col in range(self.num_sensors):
+            self.add_channel_panel(col, graph_height)
+        self.scroll_area.setWidget(self.panels_widget)
+        self.main_layout.addWidget(self.scroll_area)
         MainWindow.setCentralWidget(self.centralwidget)
-
-        # Layouts for labels and data boxes
-        # (Layouts for a1, tma1, a2, tma2, etc. remain unchanged)
-        self.verticalLayoutWidget_1 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_1.setGeometry(QtCore.QRect(300, 70, 251, 110))
-        self.vtag_1 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_1)
-        self.vtag_1.setContentsMargins(0, 0, 0, 0)
-        self.a1_label = QtWidgets.QLabel(self.verticalLayoutWidget_1)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.a1_label.setFont(font)
-        self.vtag_1.addWidget(self.a1_label)
-        self.tma1_label = QtWidgets.QLabel(self.verticalLayoutWidget_1)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.tma1_label.setFont(font)
-        self.tma1_label.setObjectName("tma1_label")
-        self.vtag_1.addWidget(self.tma1_label)
-
-        # (Other layouts for a2, tma2, a3, tma3, a4, tma4 are built similarly.)
-        # …
-        # Layout for box 1
-        self.verticalLayoutWidget_5 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_5.setGeometry(QtCore.QRect(500, 70, 121, 111))
-        self.verticalLayoutWidget_5.setObjectName("verticalLayoutWidget_5")
-        self.vdata_3 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_5)
-        self.vdata_3.setContentsMargins(0, 0, 0, 0)
-        self.vdata_3.setObjectName("vdata_3")
-        self.a1 = QtWidgets.QLabel(self.verticalLayoutWidget_5)
-        self.a1.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.a1.setText("")
-        self.a1.setObjectName("a1")
-        self.vdata_3.addWidget(self.a1)
-        self.tma1 = QtWidgets.QLabel(self.verticalLayoutWidget_5)
-        self.tma1.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.tma1.setText("")
-        self.tma1.setObjectName("tma1")
-        self.vdata_3.addWidget(self.tma1)
-
-        # Layout for label 2
-        self.verticalLayoutWidget_4 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_4.setGeometry(QtCore.QRect(1150, 70, 241, 111))
-        self.verticalLayoutWidget_4.setObjectName("verticalLayoutWidget_4")
-        self.vtag_11 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_4)
-        self.vtag_11.setContentsMargins(0, 0, 0, 0)
-        self.vtag_11.setObjectName("vtag_11")
-        self.a2_label = QtWidgets.QLabel(self.verticalLayoutWidget_4)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.a2_label.setFont(font)
-        self.a2_label.setObjectName("a2_label")
-        self.vtag_11.addWidget(self.a2_label)
-        self.tma2_label = QtWidgets.QLabel(self.verticalLayoutWidget_4)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.tma2_label.setFont(font)
-        self.tma2_label.setObjectName("tma2_label")
-        self.vtag_11.addWidget(self.tma2_label)
-
-        # Layout for box 2
-        self.verticalLayoutWidget_6 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_6.setGeometry(QtCore.QRect(1350, 70, 121, 111))
-        self.verticalLayoutWidget_6.setObjectName("verticalLayoutWidget_6")
-        self.vdata2_3 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_6)
-        self.vdata2_3.setContentsMargins(0, 0, 0, 0)
-        self.vdata2_3.setObjectName("vdata2_3")
-        self.a2 = QtWidgets.QLabel(self.verticalLayoutWidget_6)
-        self.a2.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.a2.setText("")
-        self.a2.setObjectName("a2")
-        self.vdata2_3.addWidget(self.a2)
-        self.tma2 = QtWidgets.QLabel(self.verticalLayoutWidget_6)
-        self.tma2.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.tma2.setText("")
-        self.tma2.setObjectName("tma2")
-        self.vdata2_3.addWidget(self.tma2)
-
-        # Layout for label 3
-        self.verticalLayoutWidget_3 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_3.setGeometry(QtCore.QRect(300, 515, 251, 81))
-        self.verticalLayoutWidget_3.setObjectName("verticalLayoutWidget_7")
-        self.vtag_10 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_3)
-        self.vtag_10.setContentsMargins(0, 0, 0, 0)
-        self.vtag_10.setObjectName("vtag_10")
-        self.a3_label = QtWidgets.QLabel(self.verticalLayoutWidget_3)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.a3_label.setFont(font)
-        self.a3_label.setObjectName("a3_label")
-        self.vtag_10.addWidget(self.a3_label)
-        self.tma3_label = QtWidgets.QLabel(self.verticalLayoutWidget_3)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.tma3_label.setFont(font)
-        self.tma3_label.setObjectName("tma3_label")
-        self.vtag_10.addWidget(self.tma3_label)
-
-        # Layout for box 3
-        self.verticalLayoutWidget_8 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_8.setGeometry(QtCore.QRect(500, 515, 121, 81))
-        self.verticalLayoutWidget_8.setObjectName("verticalLayoutWidget_8")
-        self.vdata3_3 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_8)
-        self.vdata3_3.setContentsMargins(0, 0, 0, 0)
-        self.vdata3_3.setObjectName("vdata3_3")
-        self.a3 = QtWidgets.QLabel(self.verticalLayoutWidget_8)
-        self.a3.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.a3.setText("")
-        self.a3.setObjectName("a3")
-        self.vdata3_3.addWidget(self.a3)
-        self.tma3 = QtWidgets.QLabel(self.verticalLayoutWidget_8)
-        self.tma3.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.tma3.setText("")
-        self.tma3.setObjectName("tma3")
-        self.vdata3_3.addWidget(self.tma3)
-
-        # Layout for label 4
-        self.verticalLayoutWidget_9 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_9.setGeometry(QtCore.QRect(1150, 515, 241, 81))
-        self.verticalLayoutWidget_9.setObjectName("verticalLayoutWidget_9")
-        self.vtag_12 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_9)
-        self.vtag_12.setContentsMargins(0, 0, 0, 0)
-        self.vtag_12.setObjectName("vtag_12")
-        self.a4_label = QtWidgets.QLabel(self.verticalLayoutWidget_9)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.a4_label.setFont(font)
-        self.a4_label.setObjectName("a4_label")
-        self.vtag_12.addWidget(self.a4_label)
-        self.tma4_label = QtWidgets.QLabel(self.verticalLayoutWidget_9)
-        font = QtGui.QFont()
-        font.setPointSize(12)
-        self.tma4_label.setFont(font)
-        self.tma4_label.setObjectName("tma4_label")
-        self.vtag_12.addWidget(self.tma4_label)
-
-        # Layout for box 4
-        self.verticalLayoutWidget_10 = QtWidgets.QWidget(self.centralwidget)
-        self.verticalLayoutWidget_10.setGeometry(QtCore.QRect(1350, 515, 121, 81))
-        self.verticalLayoutWidget_10.setObjectName("verticalLayoutWidget_10")
-        self.vdata4_3 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_10)
-        self.vdata4_3.setContentsMargins(0, 0, 0, 0)
-        self.vdata4_3.setObjectName("vdata4_3")
-        self.a4 = QtWidgets.QLabel(self.verticalLayoutWidget_10)
-        self.a4.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.a4.setText("")
-        self.a4.setObjectName("a4")
-        self.vdata4_3.addWidget(self.a4)
-        self.tma4 = QtWidgets.QLabel(self.verticalLayoutWidget_10)
-        self.tma4.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.tma4.setText("")
-        self.tma4.setObjectName("tma4")
-        self.vdata4_3.addWidget(self.tma4)
-
-        # Graph display widgets on QLabel
-        self.graph_1 = QtWidgets.QLabel(self.centralwidget)
-        self.graph_1.setGeometry(QtCore.QRect(10, 170, 850, 350))
-        self.graph_1.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.graph_1.setText("")
-        self.graph_1.setObjectName("graph_1")
-        self.graph_2 = QtWidgets.QLabel(self.centralwidget)
-        self.graph_2.setGeometry(QtCore.QRect(900, 170, 850, 350))
-        self.graph_2.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.graph_2.setText("")
-        self.graph_2.setObjectName("graph_2")
-        self.graph_3 = QtWidgets.QLabel(self.centralwidget)
-        self.graph_3.setGeometry(QtCore.QRect(10, 590, 850, 350))
-        self.graph_3.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.graph_3.setText("")
-        self.graph_3.setObjectName("graph_3")
-        self.graph_4 = QtWidgets.QLabel(self.centralwidget)
-        self.graph_4.setGeometry(QtCore.QRect(900, 590, 850, 350))
-        self.graph_4.setStyleSheet("background-color: rgb(255, 255, 255);")
-        self.graph_4.setText("")
-        self.graph_4.setObjectName("graph_4")
+        # Performance overlay, permanent so status messages don't hide it
+        self.perf_label = QtWidgets.QLabel(MainWindow)
+        self.perf_label.setObjectName("perf_label")
+        self.perf_label.setVisible(False)
+        MainWindow.statusBar().addPermanentWidget(self.perf_label)
+        for graph in self.graphs:
+            graph.set_overlays(self.dsp.trace_names)
 
         self.retranslate_ui(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
 
-        # Initialize CSV on first run
+        # Initialize CSV (or binary session header) on first run
         if not self.is_existing_data:
-            with open(self.csv_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(
-                    ['Timestamp'] +
-                    [f"Muscle{i + 1} - {self.muscle_group_labels[i]}" for i in range(self.num_sensors)]
-                )
+            create_session_file(self.csv_file, self.channel_labels, self.muscle_group)
+        else:
+            # Repairs a torn tail left by a crash before anything reads the session
+            self.time_offset = resume_session(self.csv_file) or 0.0
         self.process_existing_data()
 
-        # Start serial reader thread
-        self.serial_thread = SerialReaderFromUMyo(
+        # Coalesce incoming samples into one redraw per frame
+        self.timer = RenderScheduler(self.update_data, self.render_fps, MainWindow)
+        self.timer.frames_dropped.connect(self.on_frames_dropped)
+        self.timer.start()
+        # Graphs scrolled out of view are skipped, so redraw when they come back
+        self.scroll_area.verticalScrollBar().valueChanged.connect(lambda _: self.timer.request_frame())
+
+        # Start recording: one reader thread per port, the GUI is one listener
+        self.recorder = Recorder(
             self.csv_file,
-            self.serial_port,
+            self.serial_ports,
             self.baud_rate,
-            self.num_sensors
+            self.port_sensors,
+            store=self.store,
+            pipeline=self.dsp,
+            batch_size=self.batch_size,
+            protocol=self.protocol,
+            time_offset=self.time_offset,
+            summary_index=self.summary_index
         )
-        self.serial_thread.data_received.connect(self.on_new_data)
-        self.serial_thread.start()
-
-    def on_new_data(self, elapsed, values):
-        # New sample arrived; refresh UI
-        self.update_data()
+        self.recorder_signals = RecorderSignals(self.recorder, MainWindow)
+        self.recorder_signals.batch_received.connect(self.on_new_batch)
+        try:
+            self.recorder.start()
+        except Exception as e:
+            print(f"{color_magenta}Could not start recording to {color_red}{self.csv_file}{color_magenta}:{color_reset} {e}\n")
+
+        self.monitor = PerfMonitor(self.recorder, self.timer)
+        self.metrics_timer = QtCore.QTimer(MainWindow)
+        self.metrics_timer.timeout.connect(self.on_metrics_tick)
+        self.metrics_timer.start(1000)
+
+    def add_channel_panel(self, col, graph_height):
+        """Build the header, metric boxes and graph of one channel.
+
+        Widgets are also kept under their numbered names (muscle_h1, a1,
+        tma1, graph_1, ...) as in the fixed four-channel layout.
+        """
+        n = col + 1
+        panel = QtWidgets.QWidget(self.panels_widget)
+        panel.setObjectName(f"panel_{n}")
+        layout = QtWidgets.QVBoxLayout(panel)
+        layout.setContentsMargins(0, 0, 0, 0)
+        header_layout = QtWidgets.QHBoxLayout()
+
+        titles = QtWidgets.QVBoxLayout()
+        header = QtWidgets.QLabel(panel)
+        font = QtGui.QFont()
+        font.setPointSize(16)
+        header.setFont(font)
+        header.setObjectName(f"muscle_h{n}")
+        titles.addWidget(header)
+        dsp_label = QtWidgets.QLabel(panel)
+        font = QtGui.QFont()
+        font.setPointSize(10)
+        dsp_label.setFont(font)
+        dsp_label.setObjectName(f"dsp{n}")
+        titles.addWidget(dsp_label)
+        header_layout.addLayout(titles)
+        header_layout.addStretch(1)
+
+        # Labels and data boxes
+        metrics = QtWidgets.QGridLayout()
+        amp_label = QtWidgets.QLabel(panel)
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        amp_label.setFont(font)
+        amp_label.setObjectName(f"a{n}_label")
+        metrics.addWidget(amp_label, 0, 0)
+        tma_label = QtWidgets.QLabel(panel)
+        font = QtGui.QFont()
+        font.setPointSize(12)
+        tma_label.setFont(font)
+        tma_label.setObjectName(f"tma{n}_label")
+        metrics.addWidget(tma_label, 1, 0)
+        amp_box = QtWidgets.QLabel(panel)
+        amp_box.setStyleSheet("background-color: rgb(255, 255, 255);")
+        amp_box.setMinimumWidth(121)
+        amp_box.setObjectName(f"a{n}")
+        metrics.addWidget(amp_box, 0, 1)
+        tma_box = QtWidgets.QLabel(panel)
+        tma_box.setStyleSheet("background-color: rgb(255, 255, 255);")
+        tma_box.setMinimumWidth(121)
+        tma_box.setObjectName(f"tma{n}")
+        metrics.addWidget(tma_box, 1, 1)
+        header_layout.addLayout(metrics)
+        header_layout.addStretch(1)
+        layout.addLayout(header_layout)
+
+        # Persistent graph canvas, updated in place as data arrives
+        graph = LivePlotCanvas(panel)
+        graph.setMinimumHeight(graph_height)
+        graph.setObjectName(f"graph_{n}")
+        layout.addWidget(graph)
+        self.panels_layout.addWidget(panel, col // 2, col % 2)
+
+        self.muscle_headers.append(header)
+        self.dsp_labels.append(dsp_label)
+        self.amp_labels.append(amp_label)
+        self.tma_labels.append(tma_label)
+        self.amp_boxes.append(amp_box)
+        self.tma_boxes.append(tma_box)
+        self.graphs.append(graph)
+        for name, widget in ((f"muscle_h{n}", header), (f"a{n}_label", amp_label),
+                             (f"tma{n}_label", tma_label), (f"a{n}", amp_box),
+                             (f"tma{n}", tma_box), (f"graph_{n}", graph)):
+            setattr(self, name, widget)
+
+    def on_new_batch(self, batch):
+        # Block of samples arrived (column 0 = timestamps); redraw on the next frame
+        self.stats.update_batch(batch[:, 0], batch[:, 1:])
+        self.timer.request_frame()
+
+    def on_window_changed(self, seconds):
+        # 0 shows the whole session
+        self.window_seconds = seconds or None
+        self.timer.request_frame()
+
+    def on_pause_toggled(self, paused):
+        # Freeze the view on the current window; acquisition keeps running
+        self.paused = paused
+        self.scrub_time = self.store.last_time() if paused else None
+        self.scrub_slider.blockSignals(True)
+        self.scrub_slider.setValue(1000)
+        self.scrub_slider.blockSignals(False)
+        self.scrub_slider.setEnabled(paused)
+        self.timer.request_frame()
+
+    def on_scrub(self, position):
+        # Slider spans the recorded session; its position is the window end
+        times, _ = self.store.data()
+        if len(times):
+            self.scrub_time = times[0] + (times[-1] - times[0]) * position / 1000.0
+            self.timer.request_frame()
+
+    def visible_range(self, times):
+        """Return (lo, hi, t_end): rows of `times` shown in the graphs.
+
+        t_end is the end of the time window, or None when the whole session
+        is shown. Uses a binary search, so the cost does not depend on the
+        session length.
+        """
+        if self.window_seconds is None or not len(times):
+            return 0, len(times), None
+        t_end = self.scrub_time if self.paused and self.scrub_time is not None else times[-1]
+        lo = np.searchsorted(times, t_end - self.window_seconds, side='left')
+        hi = np.searchsorted(times, t_end, side='right')
+        return lo, hi, t_end
+
+    def on_perf_toggled(self, shown):
+        self.perf_label.setVisible(shown)
+        if shown:
+            self.perf_label.setText("Collecting...")
+
+    def on_metrics_tick(self):
+        sample = self.monitor.sample()
+        if self.perf_checkbox.isChecked():
+            self.perf_label.setText(format_summary(sample))
+        if self.metrics_log is not None:
+            try:
+                self.metrics_log.write(sample)
+            except OSError as e:
+                print(f"{color_magenta}Metrics log error {color_red}{self.metrics_log.path}{color_magenta}:{color_reset} {e}\n")
+                self.metrics_log = None
+
+    def on_export_clicked(self):
+        """Export what has been recorded so far to Parquet or HDF5, on a background thread."""
+        stem = os.path.splitext(self.csv_file.rstrip('/\\'))[0]
+        path, chosen = QFileDialog.getSaveFileName(
+            self.main_window,
+            "Export Session",
+            stem + PARQUET_EXTENSION,
+            "Parquet (*.parquet);;HDF5 (*.h5 *.hdf5)"
+        )
+        if not path:
+            return
+        if not is_columnar_session(path):
+            path += HDF5_EXTENSION if chosen.startswith("HDF5") else PARQUET_EXTENSION
+        if os.path.abspath(path) == os.path.abspath(self.csv_file):
+            QMessageBox.warning(self.main_window, "Error", "The session is already recorded to that file.")
+            return
+        self.export_button.setEnabled(False)
+        self.export_thread = SessionExportThread(self.csv_file, path, self.muscle_group, self.main_window)
+        self.export_thread.progress.connect(
+            lambda rows: self.main_window.statusBar().showMessage(f"Exporting to {path}: {rows} rows"))
+        self.export_thread.exported.connect(self.on_exported)
+        self.export_thread.failed.connect(self.on_export_failed)
+        self.export_thread.start()
+
+    def on_exported(self, path, rows):
+        self.export_button.setEnabled(True)
+        self.main_window.statusBar().showMessage(f"Exported {rows} rows to {path}")
+
+    def on_export_failed(self, error):
+        self.export_button.setEnabled(True)
+        self.main_window.statusBar().clearMessage()
+        QMessageBox.warning(self.main_window, "Error", f"Export failed: {error}")
+
+    def on_frames_dropped(self, dropped):
+        # Frames skipped because redraws ran over their budget
+        self.main_window.statusBar().showMessage(f"Dropped frames: {dropped}")
 
     def ask_for_muscle_group(self, parent):
         # Use the actual MainWindow as parent for dialogs
@@ -317,7 +415,8 @@ class ui_main_window(object):
             )
             return "Quad"
 
-    def get_muscle_labels(self, muscle_group):
+    @staticmethod
+    def get_muscle_labels(muscle_group):
         if muscle_group == "Quad":
             return ["RVL", "RVM", "LVM", "LVL"]
         elif muscle_group == "Hamstring":
@@ -329,157 +428,130 @@ class ui_main_window(object):
 
         _translate = QtCore.QCoreApplication.translate
         MainWindow.setWindowTitle(_translate("MainWindow", "StabiliKnee EMG Readings"))
-        self.a1_label.setText(_translate("MainWindow", "Max Amplitude :"))
-        self.tma1_label.setText(_translate("MainWindow", "Total Muscle Activity :"))
-        self.muscle_h1.setText(_translate("MainWindow", "Muscle #1"))
-        self.a2_label.setText(_translate("MainWindow", "Max Amplitude :"))
-        self.tma2_label.setText(_translate("MainWindow", "Total Muscle Activity :"))
-        self.muscle_h2.setText(_translate("MainWindow", "Muscle #2"))
-        self.a3_label.setText(_translate("MainWindow", "Max Amplitude :"))
-        self.tma3_label.setText(_translate("MainWindow", "Total Muscle Activity :"))
-        self.muscle_h3.setText(_translate("MainWindow", "Muscle #3"))
-        self.a4_label.setText(_translate("MainWindow", "Max Amplitude :"))
-        self.tma4_label.setText(_translate("MainWindow", "Total Muscle Activity :"))
+        for i, header in enumerate(self.muscle_headers):
+            header.setText(_translate("MainWindow", "Muscle #%d") % (i + 1))
+            self.amp_labels[i].setText(_translate("MainWindow", "Max Amplitude :"))
+            self.tma_labels[i].setText(_translate("MainWindow", "Total Muscle Activity :"))
         self.screen_title.setText(_translate("MainWindow", "StabiliKnee EMG Readings"))
-        self.muscle_h4.setText(_translate("MainWindow", "Muscle #4"))
+        self.window_label.setText(_translate("MainWindow", "Window (s) :"))
+        self.window_spin.setSpecialValueText(_translate("MainWindow", "All"))
+        self.pause_checkbox.setText(_translate("MainWindow", "Pause view (keeps recording)"))
+        self.perf_checkbox.setText(_translate("MainWindow", "Show performance"))
+        self.export_button.setText(_translate("MainWindow", "Export session..."))
         # (Add other translations as needed)
 
     def update_data(self):
-        # open once and count rows
-        with open(self.csv_file) as f:
-            rows = sum(1 for _ in f)
-        # if only header, still run compute/show so you get zeros
-        if rows <= 1:
-            # optional: explicitly zero out labels/graphs
-            self.compute_max_amplitude()
-            self.compute_total_muscle_activity()
-            self.show_graphs()
-            return
-
-        # otherwise run normally
+        # Metrics come from the in-memory stats, so no CSV rescans here
         self.compute_max_amplitude()
         self.compute_total_muscle_activity()
+        self.show_dsp_summary()
         self.show_graphs()
 
     def process_existing_data(self):
-        """Process and display historical CSV data."""
-        self.compute_max_amplitude()
-        self.compute_total_muscle_activity()
-        self.show_graphs()
-
-    def compute_max_amplitude(self):
-        """Compute maximum amplitude per muscle from CSV data."""
+        """Load historical session data into the running stats and display it."""
         try:
-            with open(self.csv_file, mode='r') as file:
-                csvFile = csv.reader(file)
-                next(csvFile)  # Skip header
-                columns = [1, 2, 3, 4]
-                max_values = {col: float('-inf') for col in columns}
-                for row in csvFile:
-                    for col in columns:
-                        try:
-                            value = float(row[col])
-                            max_values[col] = max(max_values[col], value)
-                        except (ValueError, IndexError):
-                            pass
-                for col in columns:
-                    if max_values[col] == float('-inf'):
-                        max_values[col] = 0
-                # Update amplitude labels
-                self.a1.setText(f"{max_values[1]:.2f} V")
-                self.a2.setText(f"{max_values[2]:.2f} V")
-                self.a3.setText(f"{max_values[3]:.2f} V")
-                self.a4.setText(f"{max_values[4]:.2f} V")
-                self.a1.setStyleSheet("font-size: 20px;")
-                self.a2.setStyleSheet("font-size: 20px;")
-                self.a3.setStyleSheet("font-size: 20px;")
-                self.a4.setStyleSheet("font-size: 20px;")
-            # (Add error handling or logging as needed)
+            # Totals come from the summary index; only the samples the store keeps are read
+            self.summary_index = open_summary_index(self.csv_file, self.num_sensors)
+            total = self.summary_index.total()
+            if total["rows"]:
+                self.stats.restore(total["rows"], total["max"], total["integral"],
+                                   total["t_end"], total["last"])
+            rows = self.store.max_samples
+            # A CSV is parsed only from the block holding the first sample kept
+            offset = self.summary_index.row_offset(max(total["rows"] - rows, 0)) if rows else None
+            times, values = load_session_tail(self.csv_file, self.num_sensors, rows, offset)
+            self.store.extend(times, values)
+            self.dsp.process_history(times, values)
         except Exception as e:
-            print(f"{color_magenta}Error computing max amplitude: {color_red}{e}{color_reset}")
+            print(f"{color_magenta}Error loading existing data: {color_red}{e}{color_reset}")
+        self.update_data()
+
+    def compute_max_amplitude(self):
+        """Update the max amplitude labels from the running stats."""
+        max_values = self.stats.max_amplitude()
+        for box, value in zip(self.amp_boxes, max_values):
+            box.setText(f"{value:.2f} V")
+            box.setStyleSheet("font-size: 20px;")
 
     def compute_total_muscle_activity(self):
-        """Compute total muscle activity (integral) per muscle from CSV data."""
-        try:
-            with open(self.csv_file, mode='r') as file:
-                csvFile = csv.reader(file)
-                next(csvFile)  # Skip header
-                time_vals = []
-                columns = {1: [], 2: [], 3: [], 4: []}
-                for row in csvFile:
-                    # Convert values; fill missing with 0.0
-                    row_data = [float(value) if value else 0.0 for value in row]
-                    while len(row_data) < 5:
-                        row_data.append(0.0)
-                    time_vals.append(round(row_data[0], 3))
-                    for col in range(1, 5):
-                        columns[col].append(row_data[col] if col < len(row_data) else 0.0)
-                time_arr = np.array(time_vals)
-                integrals = {}
-                for col, values in columns.items():
-                    if len(time_arr) == len(values) and len(time_arr) > 1:
-                        integrals[col] = np.trapz(values, time_arr)
-                    else:
-                        integrals[col] = 0.0
-                # Update total muscle activity labels
-                self.tma1.setText(f"{integrals[1]:.2f} V")
-                self.tma2.setText(f"{integrals[2]:.2f} V")
-                self.tma3.setText(f"{integrals[3]:.2f} V")
-                self.tma4.setText(f"{integrals[4]:.2f} V")
-                self.tma1.setStyleSheet("font-size: 20px;")
-                self.tma2.setStyleSheet("font-size: 20px;")
-                self.tma3.setStyleSheet("font-size: 20px;")
-                self.tma4.setStyleSheet("font-size: 20px;")
-        except Exception as e:
-            print(f"{color_magenta}Error computing total muscle activity: {color_red}{e}{color_reset}")
+        """Update the total muscle activity (integral) labels from the running stats."""
+        integrals = self.stats.total_activity()
+        for box, value in zip(self.tma_boxes, integrals):
+            box.setText(f"{value:.2f} V")
+            box.setStyleSheet("font-size: 20px;")
+
+    def show_dsp_summary(self):
+        """Update the RMS / mean / median frequency labels from the DSP stage."""
+        summary = self.dsp.summary
+        if not summary:
+            return
+        for col, label in enumerate(self.dsp_labels[:self.num_sensors]):
+            label.setText(
+                f"RMS {summary['rms'][col]:.1f}   "
+                f"MNF {summary['mnf'][col]:.1f} Hz   "
+                f"MDF {summary['mdf'][col]:.1f} Hz"
+            )
+
+    def dsp_traces(self, t_start, t_end, col, columns):
+        """Envelope/RMS traces of one channel between two times, as (x, y) pairs.
+
+        The traces are low-pass signals, so plain striding to ~2 points per
+        pixel column is enough to decimate them.
+        """
+        times, traces = self.dsp.store.window(t_start, t_end)
+        step = max(1, len(times) // (2 * columns))
+        return [
+            (times[::step], traces[::step, self.dsp.trace_columns(name)][:, col])
+            for name in self.dsp.trace_names
+        ]
 
     def show_graphs(self):
-        """Read CSV data and update the graphs displayed on QLabel widgets."""
+        """Update the live graph canvases from the sample store."""
         try:
-            with open(self.csv_file, mode='r') as file:
-                csvFile = csv.reader(file)
-                next(csvFile)  # Skip header
-                time_vals = []
-                columns = {1: [], 2: [], 3: [], 4: []}
-                for row in csvFile:
-                    row_data = [float(value) if value else 0.0 for value in row]
-                    while len(row_data) < 5:
-                        row_data.append(0.0)
-                    time_vals.append(round(row_data[0], 3))
-                    for col in range(1, 5):
-                        columns[col].append(row_data[col] if col < len(row_data) else 0.0)
-                # Plot graphs for each muscle and update the corresponding QLabel.
-                self.plot_graph(columns[1], time_vals, self.graph_1)
-                self.plot_graph(columns[2], time_vals, self.graph_2)
-                self.plot_graph(columns[3], time_vals, self.graph_3)
-                self.plot_graph(columns[4], time_vals, self.graph_4)
+            time_vals, values, offset = self.store.snapshot()
+            self.lod.update(values, offset)
+            lo, hi, t_end = self.visible_range(time_vals)
+            for col, graph in enumerate(self.graphs):
+                if graph.visibleRegion().isEmpty():
+                    # Scrolled out of view; redrawn once it is visible again
+                    continue
+                # At most ~2 points per pixel column; raw samples while they fit
+                columns = graph.width()
+                x, y = self.lod.envelope(time_vals, values, col, lo, hi, columns, offset)
+                if t_end is None:
+                    overlays = self.dsp_traces(None, None, col, columns)
+                    graph.set_x_window()
+                    graph.update_data(x, y, append=hi - lo <= 2 * columns, overlays=overlays)
+                elif self.paused:
+                    overlays = self.dsp_traces(t_end - self.window_seconds, t_end, col, columns)
+                    graph.set_x_window(t_end - self.window_seconds, t_end)
+                    graph.update_data(x, y, append=False, overlays=overlays)
+                else:
+                    # Live window: fixed axis in seconds before now, so the
+                    # cached background stays valid while the data scrolls
+                    overlays = [
+                        (ox - t_end, oy)
+                        for ox, oy in self.dsp_traces(t_end - self.window_seconds, t_end, col, columns)
+                    ]
+                    graph.set_x_window(-self.window_seconds, 0)
+                    graph.update_data(x - t_end, y, append=False, overlays=overlays)
         except Exception as e:
             print(f"{color_magenta} displaying graphs: {color_red}{e}{color_reset}")
 
-    def plot_graph(self, data, time_vals, graph_label):
-        """Plot a matplotlib graph and set it as the pixmap of a QLabel."""
-        fig, ax = plt.subplots(figsize=(9, 2.7))
-        ax.plot(time_vals, data)
-        ax.set_xlabel('Time (s)')
-        ax.set_ylabel('Amplitude (mV)')
-        ax.set_title('Muscle Activity Over Time')
-        canvas = FigureCanvas(fig)
-        buf = BytesIO()
-        canvas.print_png(buf)
-        pixmap = QPixmap()
-        pixmap.loadFromData(buf.getvalue())
-        graph_label.setPixmap(pixmap)
-        plt.close(fig)
-
     def cleanup(self):
-        """Stop timer (if any) and serial thread during exit."""
+        """Stop render timer (if any) and the recorder during exit."""
         if self.timer is not None:
             self.timer.stop()
-
-        if self.serial_thread is not None:
-            try:
-                # Stops the thread loop; don't call wait() here or the C++ object may already be gone
-                self.serial_thread.stop()
-            except RuntimeError:
-                # If the thread object has already been deleted, just ignore
-                pass
+        if self.metrics_timer is not None:
+            self.metrics_timer.stop()
+        if self.export_thread is not None:
+            # Let a running export finish its file
+            self.export_thread.wait()
+
+        if self.recorder is not None:
+            # Joins the reader threads and writes out everything recorded
+            self.recorder.stop()
+            if self.export_path is not None:
+                export_recording(self.csv_file, self.export_path)
+        if self.metrics_log is not None:
+            self.metrics_log.close()
@@ -0,0 +1,151 @@
+"""Binary serial frames sent by the firmware when BINARY_PROTOCOL is set.
+
+One frame per sample, little-endian, no padding::
+
+    offset  size  field
+    0       2     sync bytes 0xA5 0x5A
+    2       1     channel count N
+    3       2     sequence number (uint16, wraps)
+    5       4     device time, micros() (uint32, wraps)
+    9       2N    muscle levels, int16 of level * LEVEL_SCALE
+    9 + 2N  2     CRC-16/CCITT-FALSE of bytes 2 .. 8 + 2N
+
+``FrameDecoder`` checks CRCs with ``binascii.crc_hqx`` (the same CRC, in
+C) and turns every run of valid frames into arrays with one
+``numpy.frombuffer``. It resynchronises past noise or text (the firmware's
+status messages) on its own; missing frames show up as jumps in the
+sequence numbers.
+"""
+from binascii import crc_hqx
+from collections import namedtuple
+import numpy as np
+
+SYNC = b'\xa5\x5a'
+HEADER_SIZE = 9
+# Levels travel as int16 of level * LEVEL_SCALE (0.1 resolution, +-3276.7)
+LEVEL_SCALE = 10.0
+
+# seq, device_time (micros, uint32), values (n, channels) and, per frame,
+# how many frames are missing just before it
+DecodedFrames = namedtuple('DecodedFrames', 'seq device_time values missing')
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (poly 0x1021, init 0xFFFF), as computed by the firmware."""
+    return crc_hqx(data, 0xFFFF)
+
+
+def frame_dtype(num_channels):
+    return np.dtype([('sync', 'u1', (2,)), ('count', 'u1'), ('seq', '<u2'), ('time', '<u4'),
+                     ('levels', '<i2', (num_channels,)), ('crc', '<u2')])
+
+
+def encode_frames(values, seq_start=0, times_us=None, scale=LEVEL_SCALE):
+    """Encode (n, channels) values as frames, as the firmware sends them."""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    frames = np.zeros(len(values), dtype=frame_dtype(values.shape[1]))
+    frames['sync'] = np.frombuffer(SYNC, dtype=np.uint8)
+    frames['count'] = values.shape[1]
+    frames['seq'] = (seq_start + np.arange(len(values))) & 0xFFFF
+    if times_us is not None:
+        frames['time'] = np.asarray(times_us, dtype=np.int64) & 0xFFFFFFFF
+    frames['levels'] = np.clip(np.round(values * scale), -32768, 32767)
+    raw = memoryview(frames.tobytes())
+    size = frames.dtype.itemsize
+    frames['crc'] = [crc16(raw[i:i + size - 4]) for i in range(2, len(raw), size)]
+    return frames.tobytes()
+
+
+class FrameDecoder(object):
+    """Turn a serial byte stream into decoded frames, a chunk at a time.
+
+    Frames with another channel count or a bad CRC are dropped, as are
+    bytes that belong to no frame; ``bad_frames``, ``skipped_bytes`` and
+    ``missing`` (frames lost according to the sequence numbers) count them.
+    """
+
+    def __init__(self, num_channels, scale=LEVEL_SCALE):
+        self.num_channels = num_channels
+        self.scale = scale
+        self.dtype = frame_dtype(num_channels)
+        self.frame_size = self.dtype.itemsize
+        self.buffer = bytearray()
+        self.frames = 0
+        self.bad_frames = 0
+        self.skipped_bytes = 0
+        self.missing = 0
+        self._marker = SYNC + bytes([num_channels])
+        self._last_seq = None
+
+    def _empty(self):
+        return DecodedFrames(np.empty(0, np.uint16), np.empty(0, np.uint32),
+                             np.empty((0, self.num_channels)), np.empty(0, np.int64))
+
+    def feed(self, chunk):
+        """Add raw bytes and return the frames they complete as DecodedFrames."""
+        buf = self.buffer
+        buf += chunk
+        size = self.frame_size
+        count = len(buf) // size
+        if not count:
+            return self._empty()
+        raw = bytes(buf[:count * size])
+        frames = np.frombuffer(raw, dtype=self.dtype)
+        # Fast path: the buffer is a clean run of frames, as it is unless bytes were lost
+        if self._is_clean_run(raw, frames):
+            del buf[:len(raw)]
+        else:
+            frames = self._resync()
+            if not len(frames):
+                return self._empty()
+
+        seq = frames['seq']
+        first, last = int(seq[0]), int(seq[-1])
+        previous = first - 1 if self._last_seq is None else self._last_seq
+        self._last_seq = last
+        if (last - previous - len(seq)) % 0x10000 == 0:
+            # Consecutive sequence numbers: nothing lost
+            missing = np.zeros(len(seq), dtype=np.int64)
+        else:
+            missing = np.empty(len(seq), dtype=np.int64)
+            missing[0] = first - previous
+            missing[1:] = np.diff(seq.astype(np.int64))
+            missing -= 1
+            missing %= 0x10000
+            self.missing += int(missing.sum())
+        self.frames += len(frames)
+        return DecodedFrames(seq, frames['time'], frames['levels'] / self.scale, missing)
+
+    def _is_clean_run(self, raw, frames):
+        size = self.frame_size
+        count = len(frames)
+        # Byte slices with a step pick one header byte of every frame, in C
+        for offset, value in enumerate(self._marker):
+            if raw[offset::size] != bytes([value]) * count:
+                return False
+        view = memoryview(raw)
+        return [crc16(view[i:i + size - 4]) for i in range(2, len(raw), size)] == frames['crc'].tolist()
+
+    def _resync(self):
+        """Scan the buffer frame by frame for valid frames, dropping the rest."""
+        buf = self.buffer
+        size = self.frame_size
+        last = len(buf) - size
+        starts = []
+        end = 0
+        pos = buf.find(self._marker)
+        while pos != -1 and pos <= last:
+            crc = buf[pos + size - 2] | buf[pos + size - 1] << 8
+            if crc16(buf[pos + 2:pos + size - 2]) == crc:
+                starts.append(pos)
+                end = pos + size
+                pos = buf.find(self._marker, end)
+            else:
+                self.bad_frames += 1
+                pos = buf.find(self._marker, pos + 1)
+        # Every position a complete frame could start at has been examined
+        consumed = max(end, last + 1)
+        raw = b''.join(buf[s:s + size] for s in starts)
+        self.skipped_bytes += consumed - len(raw)
+        del buf[:consumed]
+        return np.frombuffer(raw, dtype=self.dtype)